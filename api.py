@@ -0,0 +1,387 @@
+"""
+AI Business Plan Generator - Headless HTTP API
+
+An ASGI application for services that need plans programmatically. Plans are
+generated on the shared background job queue, so waiting and streaming
+clients are served from a single event loop without holding a thread each.
+
+Endpoints:
+    POST /plans                           Submit {"form_data": {...}}; returns the job ID
+    GET  /plans/{id}                      Job status, or the plan once generated
+    GET  /plans/{id}/stream               The plan text, streamed as it is generated
+    GET  /plans/{id}/export?format=md|pdf Formatted Markdown or PDF download
+    GET  /healthz                         Job queue status
+    GET  /metrics                         Prometheus metrics
+
+``{id}`` is a job ID while the job is retained, or the plan ID returned once
+it finished. A Gemini API key can be sent in the ``X-Gemini-Api-Key`` header;
+otherwise the server's GEMINI_API_KEY is used.
+PDF exports use the PDF_EXPORT_PROFILE render profile unless ``profile=``
+names another one (e.g. ``draft`` for a quick preview).
+
+Usage:
+    python api.py
+    uvicorn api:app --host 0.0.0.0 --port 8000
+"""
+import asyncio
+import json
+import logging
+import re
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+from config import (
+    API_EXPORT_CACHE_SIZE,
+    API_HOST,
+    API_MAX_BODY_BYTES,
+    API_PORT,
+    API_STREAM_POLL_SECONDS,
+    ERROR_MESSAGES,
+    GEMINI_API_KEY,
+    PDF_EXPORT_PROFILE,
+    PDF_PROFILES,
+)
+from utils.form_validation import FormValidator
+from utils.job_queue import DONE, FINISHED_STATES, GenerationJob, JobQueueFull, get_job_queue
+from utils.llm_backend import backend_requires_api_key
+from utils.metrics import get_metrics
+from utils.pdf_pool import PDFPoolBusy, get_pdf_pool
+from utils.plan_artifacts import PlanArtifacts
+from utils.plan_store import get_plan_store
+
+logger = logging.getLogger(__name__)
+
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+Receive = Callable[[], Awaitable[Dict[str, Any]]]
+
+# Every form field the prompt uses; anything else in form_data is rejected.
+# Required fields are checked by FormValidator against REQUIRED_FIELDS.
+FORM_FIELDS = (
+    "company_name", "business_description", "mission", "target_market",
+    "marketing_strategy", "customer_acquisition", "marketing_channels", "budget_considerations",
+    "competitor_overview", "competitive_advantages", "market_positioning", "unique_value_prop",
+    "expected_costs", "financial_strategy", "projected_sales", "revenue_model", "funding_requirements",
+)
+
+
+class HTTPError(Exception):
+    """Ends a request with an error status and a JSON body"""
+
+    def __init__(self, status: int, message: str, details: Optional[Any] = None, headers: Optional[List[Tuple[bytes, bytes]]] = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.details = details
+        self.headers = headers or []
+
+
+class Request:
+    """The parts of an ASGI HTTP scope the handlers need"""
+
+    def __init__(self, scope: Dict[str, Any], receive: Receive):
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        self.headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope.get("headers", [])}
+        self.receive = receive
+
+    async def json(self) -> Any:
+        """
+        Read and parse the request body
+
+        Raises:
+            HTTPError: 413 if the body is too large, 400 if it is not JSON
+        """
+        chunks = []
+        size = 0
+        while True:
+            message = await self.receive()
+            if message["type"] == "http.disconnect":
+                raise HTTPError(400, "Client disconnected")
+            body = message.get("body", b"")
+            size += len(body)
+            if size > API_MAX_BODY_BYTES:
+                raise HTTPError(413, f"Request body larger than {API_MAX_BODY_BYTES} bytes")
+            chunks.append(body)
+            if not message.get("more_body"):
+                break
+        try:
+            return json.loads(b"".join(chunks) or b"null")
+        except ValueError:
+            raise HTTPError(400, "Request body must be JSON")
+
+
+class PlanAPI:
+    """ASGI application serving plan generation and export"""
+
+    def __init__(self):
+        self.validator = FormValidator()
+        # Formatted Markdown and PDF are built once per plan and reused by repeated exports
+        self._artifacts: "OrderedDict[str, PlanArtifacts]" = OrderedDict()
+        self._routes = [
+            ("POST", re.compile(r"^/plans$"), self.submit_plan),
+            ("GET", re.compile(r"^/plans/(?P<plan_id>[0-9a-f]{32})$"), self.get_plan),
+            ("GET", re.compile(r"^/plans/(?P<plan_id>[0-9a-f]{32})/stream$"), self.stream_plan),
+            ("GET", re.compile(r"^/plans/(?P<plan_id>[0-9a-f]{32})/export$"), self.export_plan),
+            ("GET", re.compile(r"^/healthz$"), self.health),
+            ("GET", re.compile(r"^/metrics$"), self.metrics),
+        ]
+
+    async def __call__(self, scope: Dict[str, Any], receive: Receive, send: Send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        request = Request(scope, receive)
+        try:
+            handler, params = self._route(request)
+            await handler(request, send, **params)
+        except HTTPError as e:
+            body = {"error": e.message}
+            if e.details is not None:
+                body["details"] = e.details
+            await _send_json(send, e.status, body, e.headers)
+        except Exception:
+            logger.exception("Unhandled error in %s %s", request.method, request.path)
+            await _send_json(send, 500, {"error": "Internal server error"})
+
+    def _route(self, request: Request) -> Tuple[Callable[..., Awaitable[None]], Dict[str, str]]:
+        allowed = []
+        for method, pattern, handler in self._routes:
+            match = pattern.match(request.path)
+            if match is None:
+                continue
+            if method == request.method:
+                return handler, match.groupdict()
+            allowed.append(method)
+        if allowed:
+            raise HTTPError(405, "Method not allowed", headers=[(b"allow", ", ".join(allowed).encode())])
+        raise HTTPError(404, "Not found")
+
+    async def submit_plan(self, request: Request, send: Send):
+        """Validate form data and queue its generation"""
+        payload = await request.json()
+        form_data = payload.get("form_data") if isinstance(payload, dict) else None
+        if not isinstance(form_data, dict):
+            raise HTTPError(400, 'Expected a JSON object like {"form_data": {...}}')
+        unknown = sorted(set(form_data) - set(FORM_FIELDS))
+        if unknown:
+            raise HTTPError(422, f"Unknown form fields: {', '.join(unknown)}")
+        if not all(isinstance(value, str) for value in form_data.values()):
+            raise HTTPError(422, "Form field values must be strings")
+        is_valid, errors = self.validator.validate_all_sections(form_data)
+        if not is_valid:
+            raise HTTPError(422, ERROR_MESSAGES["validation_error"], details=errors)
+
+        api_key = request.headers.get("x-gemini-api-key") or GEMINI_API_KEY
+        if not api_key and backend_requires_api_key():
+            raise HTTPError(401, ERROR_MESSAGES["api_key_missing"])
+
+        try:
+            job = get_job_queue().submit_generation(form_data, api_key, source="api")
+        except JobQueueFull as e:
+            raise HTTPError(503, str(e), headers=[(b"retry-after", b"10")])
+        await _send_json(send, 202, self._job_summary(job), [(b"location", f"/plans/{job.id}".encode())])
+
+    async def get_plan(self, request: Request, send: Send, plan_id: str):
+        """Report a job's status, or return the plan once it is available"""
+        job = get_job_queue().get(plan_id)
+        if job is not None:
+            summary = self._job_summary(job)
+            if job.status == DONE:
+                summary["content"] = job.result
+            await _send_json(send, 200, summary)
+            return
+
+        stored = await self._stored_plan(plan_id)
+        await _send_json(send, 200, {
+            "id": plan_id,
+            "status": DONE,
+            "plan_id": plan_id,
+            "company_name": stored["company_name"],
+            "created_at": stored["created_at"],
+            "content": stored["content"],
+        })
+
+    async def stream_plan(self, request: Request, send: Send, plan_id: str):
+        """
+        Stream the plan as chunked plain text while it is generated
+
+        Text already generated is sent immediately. In sectioned generation
+        mode nothing is streamed until the whole plan is assembled. If the job
+        fails after streaming started, the stream ends with an error line.
+        """
+        job = get_job_queue().get(plan_id)
+        if job is None:
+            stored = await self._stored_plan(plan_id)
+            await _send_bytes(send, 200, stored["content"].encode("utf-8"), "text/plain; charset=utf-8")
+            return
+
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"text/plain; charset=utf-8"), (b"cache-control", b"no-cache")],
+        })
+        disconnected = asyncio.Event()
+        watcher = asyncio.ensure_future(_watch_disconnect(request.receive, disconnected))
+        try:
+            sent = 0
+            while not disconnected.is_set():
+                # Read the state before the chunks, so no text emitted just before finishing is missed
+                finished = job.status in FINISHED_STATES
+                chunks = job.chunks_since(sent)
+                if chunks:
+                    sent += len(chunks)
+                    await send({"type": "http.response.body", "body": "".join(chunks).encode("utf-8"), "more_body": True})
+                if finished:
+                    break
+                await asyncio.sleep(API_STREAM_POLL_SECONDS)
+
+            if job.status == DONE and not sent and job.result:
+                # Sectioned and cached plans arrive whole rather than as chunks
+                await send({"type": "http.response.body", "body": job.result.encode("utf-8"), "more_body": True})
+            elif job.finished and job.status != DONE:
+                message = f"\n\n[generation {job.status}: {job.error or job.status}]\n"
+                await send({"type": "http.response.body", "body": message.encode("utf-8"), "more_body": True})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            watcher.cancel()
+
+    async def export_plan(self, request: Request, send: Send, plan_id: str):
+        """Return the formatted plan as Markdown or PDF"""
+        export_format = request.query.get("format", ["md"])[0]
+        if export_format not in ("md", "pdf"):
+            raise HTTPError(400, "format must be 'md' or 'pdf'")
+        profile = request.query.get("profile", [PDF_EXPORT_PROFILE])[0]
+        if profile not in PDF_PROFILES:
+            raise HTTPError(400, f"profile must be one of {', '.join(repr(name) for name in PDF_PROFILES)}")
+
+        artifacts = self._artifacts.get(plan_id)
+        if artifacts is None:
+            content, company_name = await self._plan_content(plan_id)
+            artifacts = PlanArtifacts(content, company_name)
+            self._artifacts[plan_id] = artifacts
+            while len(self._artifacts) > API_EXPORT_CACHE_SIZE:
+                self._artifacts.popitem(last=False)
+        self._artifacts.move_to_end(plan_id)
+
+        # Formatting and rendering are CPU-bound; keep them off the event loop
+        loop = asyncio.get_running_loop()
+        filename = _safe_filename(artifacts.company_name)
+        if export_format == "pdf":
+            try:
+                body = await loop.run_in_executor(None, artifacts.pdf_bytes, profile)
+            except PDFPoolBusy as e:
+                raise HTTPError(503, str(e), headers=[(b"retry-after", b"5")])
+            except TimeoutError as e:
+                raise HTTPError(504, str(e))
+            await _send_bytes(send, 200, body, "application/pdf", f"{filename}_Business_Plan.pdf")
+        else:
+            markdown = await loop.run_in_executor(None, artifacts.formatted_markdown)
+            await _send_bytes(send, 200, markdown.encode("utf-8"), "text/markdown; charset=utf-8", f"{filename}_Business_Plan.md")
+
+    async def health(self, request: Request, send: Send):
+        await _send_json(send, 200, {"status": "ok", "job_queue": get_job_queue().stats()})
+
+    async def metrics(self, request: Request, send: Send):
+        body = get_metrics().render_prometheus().encode("utf-8")
+        await _send_bytes(send, 200, body, "text/plain; version=0.0.4; charset=utf-8")
+
+    async def _plan_content(self, plan_id: str) -> Tuple[str, str]:
+        """
+        Plan text and company name for a finished job or a stored plan
+
+        Raises:
+            HTTPError: 409 while the job is still running, 404 if unknown
+        """
+        job = get_job_queue().get(plan_id)
+        if job is not None:
+            if job.status != DONE:
+                raise HTTPError(409, f"Plan is not ready (status: {job.status})", details=self._job_summary(job))
+            return job.result, job.company_name
+        stored = await self._stored_plan(plan_id)
+        return stored["content"], stored["company_name"]
+
+    async def _stored_plan(self, plan_id: str) -> Dict[str, Any]:
+        store = get_plan_store()
+        stored = None
+        if store is not None:
+            stored = await asyncio.get_running_loop().run_in_executor(None, store.get, plan_id)
+        if stored is None:
+            raise HTTPError(404, "No such plan or job")
+        return stored
+
+    @staticmethod
+    def _job_summary(job: GenerationJob) -> Dict[str, Any]:
+        summary = {
+            "id": job.id,
+            "status": job.status,
+            "progress": job.progress,
+            "plan_id": job.plan_id,
+        }
+        if job.error:
+            summary["error"] = job.error
+            summary["error_type"] = job.error_type
+        if job.timing:
+            summary["timing"] = job.timing
+        return summary
+
+    async def _lifespan(self, receive: Receive, send: Send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                # Create the shared queue and store, and warm the PDF workers, before the first request
+                get_job_queue()
+                get_plan_store()
+                get_pdf_pool()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                get_pdf_pool().shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+async def _watch_disconnect(receive: Receive, disconnected: asyncio.Event):
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            disconnected.set()
+            return
+
+
+async def _send_json(send: Send, status: int, payload: Any, headers: Optional[List[Tuple[bytes, bytes]]] = None):
+    body = json.dumps(payload).encode("utf-8")
+    await _send_bytes(send, status, body, "application/json", headers=headers)
+
+
+async def _send_bytes(
+    send: Send,
+    status: int,
+    body: bytes,
+    content_type: str,
+    filename: Optional[str] = None,
+    headers: Optional[List[Tuple[bytes, bytes]]] = None,
+):
+    response_headers = [(b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode())]
+    if filename:
+        response_headers.append((b"content-disposition", f'attachment; filename="{filename}"'.encode()))
+    response_headers.extend(headers or [])
+    await send({"type": "http.response.start", "status": status, "headers": response_headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+def _safe_filename(company_name: str) -> str:
+    safe = "".join(c for c in company_name if c.isalnum() or c in (" ", "-", "_")).strip()
+    return safe.replace(" ", "_") or "Business_Plan"
+
+
+app = PlanAPI()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    logging.basicConfig(level=logging.INFO)
+    uvicorn.run("api:app", host=API_HOST, port=API_PORT)
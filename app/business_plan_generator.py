@@ -2,53 +2,143 @@
 Business plan generation logic
 """
 import streamlit as st
-import time
-from utils.api_client import GeminiAPIClient
 from utils.business_plan_formatter import BusinessPlanFormatter
-from config import ERROR_MESSAGES
+from utils.job_queue import CANCELLED, DONE, QUEUED, JobQueueFull, get_job_queue
+from utils.llm_backend import backend_requires_api_key
+from utils.section_generator import reusable_sections
+from app.session import get_plan_artifacts, store_business_plan
+from config import ERROR_MESSAGES, GENERATION_MODE, JOB_POLL_INTERVAL_SECONDS, PLAN_SECTIONS
 
 def generate_business_plan():
-    """Generate the business plan using AI"""
+    """Queue generation of the business plan on the background job queue"""
     try:
         # Retrieve API key from session
         api_key = st.session_state.get('gemini_api_key', '')
-        if not api_key:
+        if not api_key and backend_requires_api_key():
             st.error("Please enter your Gemini API key in the sidebar to continue.")
             return
-        # Initialize API client
-        api_client = GeminiAPIClient(api_key=api_key)
-        
-        # Show progress
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        status_text.text("🤖 Generating your business plan...")
-        progress_bar.progress(25)
-        
-        # Generate business plan
-        business_plan = api_client.generate_business_plan(st.session_state.form_data)
-        
-        progress_bar.progress(75)
-        status_text.text("📝 Formatting your business plan...")
-        
-        if business_plan:
-            # Display the business plan
-            st.session_state.business_plan_generated = True
-            progress_bar.progress(100)
-            status_text.text("✅ Business plan generated successfully!")
-            
-            # Clear progress indicators
-            time.sleep(1)
-            progress_bar.empty()
-            status_text.empty()
-            
-            # Display the plan
-            formatter = BusinessPlanFormatter()
-            formatter.display_business_plan(business_plan, st.session_state.form_data.get('company_name', 'Your Company'))
-            
-        else:
-            st.error(ERROR_MESSAGES['api_error'])
-            
+
+        form_data = dict(st.session_state.form_data)
+        # Sections whose input fields are unchanged since the last plan are reused
+        completed = reusable_sections(st.session_state.get('plan_sections'), form_data)
+
+        job = get_job_queue().submit_generation(form_data, api_key, completed)
+        # The form can be edited while the job runs, so keep what it was started with
+        st.session_state.generation_job = {
+            'id': job.id,
+            'form_data': form_data,
+            'company_name': form_data.get('company_name', 'Your Company'),
+        }
+        st.session_state.generation_outcome = None
+
+    except JobQueueFull:
+        st.error("The server is busy generating other plans. Please try again in a minute.")
     except Exception as e:
         st.error(f"Error generating business plan: {str(e)}")
         st.info("Please check your API key and try again.")
+
+def cancel_generation():
+    """Cancel this session's running generation job, if any"""
+    job = _current_job()
+    if job is not None:
+        job.cancel()
+
+@st.fragment(run_every=JOB_POLL_INTERVAL_SECONDS)
+def render_generation_job():
+    """
+    Show progress of this session's generation job
+
+    Runs as a fragment polling the job, so only this block reruns while the
+    plan is generated on a worker thread. When the job finishes the whole app
+    reruns once to show the result.
+    """
+    job = _current_job()
+    if job is None or job.finished:
+        _finish_generation(job)
+        st.rerun()
+
+    if GENERATION_MODE == "sections" or job.reused_sections:
+        st.progress(job.progress)
+        st.text(job.message or "🤖 Generating your business plan section by section...")
+    else:
+        st.text("🤖 Generating your business plan..." if job.status != QUEUED else "⏳ Waiting for a free worker...")
+        preview = job.partial_text
+        if preview:
+            st.markdown(preview)
+
+    st.button("✖️ Cancel", on_click=cancel_generation, disabled=job.cancel_event.is_set())
+
+def display_saved_business_plan():
+    """Show the plan stored in this session, reusing its formatted Markdown and PDF"""
+    _show_generation_outcome()
+    saved = st.session_state.get('business_plan')
+    if not saved:
+        return
+    artifacts = get_plan_artifacts(saved['content'], saved['company_name'])
+    formatter = BusinessPlanFormatter()
+    formatter.display_business_plan(saved['content'], saved['company_name'], artifacts)
+
+def _current_job():
+    request = st.session_state.get('generation_job')
+    return get_job_queue().get(request['id']) if request else None
+
+def _finish_generation(job):
+    """Move a finished job's result into the session and remember what to tell the user"""
+    request = st.session_state.generation_job
+    st.session_state.generation_job = None
+    if job is None:
+        st.session_state.generation_outcome = {'error': "The generation job expired. Please generate again."}
+        return
+
+    if job.sections:
+        # Keep the plan per section, so a retry only redoes failed sections and
+        # a later edit only regenerates the sections depending on edited fields
+        st.session_state.plan_sections = {'form_data': request['form_data'], 'sections': job.sections}
+
+    if job.status == DONE and job.result:
+        store_business_plan(job.result, request['company_name'], job.plan_id)
+        _record_timing(job.timing)
+        st.session_state.generation_outcome = {'timing': job.timing, 'reused': len(job.reused_sections)}
+    elif job.status == CANCELLED:
+        st.session_state.generation_outcome = {'info': "Generation cancelled."}
+    elif job.failures:
+        failed = "\n".join(f"- **{title}**: {error}" for title, error in job.failures.items())
+        st.session_state.generation_outcome = {'warning': (
+            f"{len(job.failures)} section(s) could not be generated:\n\n{failed}\n\n"
+            "Click Generate again to retry only these sections."
+        )}
+    else:
+        st.session_state.generation_outcome = {'error': f"{ERROR_MESSAGES['api_error']}: {job.error}"}
+
+def _show_generation_outcome():
+    """Show the result message of the last generation once"""
+    outcome = st.session_state.get('generation_outcome')
+    if not outcome:
+        return
+    st.session_state.generation_outcome = None
+    if 'error' in outcome:
+        st.error(outcome['error'])
+        st.info("Please check your API key and try again.")
+    elif 'warning' in outcome:
+        st.warning(outcome['warning'])
+    elif 'info' in outcome:
+        st.info(outcome['info'])
+    elif outcome.get('timing'):
+        timing = outcome['timing']
+        if 0 < outcome.get('reused', 0) < len(PLAN_SECTIONS):
+            regenerated = len(PLAN_SECTIONS) - outcome['reused']
+            st.caption(f"♻️ Reused {outcome['reused']} unchanged section(s); regenerated {regenerated}")
+        if timing['cached']:
+            st.caption(f"⚡ Served from cache in {timing['total_seconds']:.2f}s")
+        elif timing.get('coalesced'):
+            st.caption(f"🔗 Shared with an identical request in progress · completed in {timing['total_seconds']:.1f}s")
+        else:
+            st.caption(
+                f"⏱️ First text after {timing['ttft_seconds']:.1f}s · "
+                f"completed in {timing['total_seconds']:.1f}s"
+            )
+
+def _record_timing(timing: dict):
+    """Keep per-request latency figures for this session"""
+    if timing:
+        st.session_state.setdefault('generation_timings', []).append(timing)
@@ -2,9 +2,16 @@
 Company overview form section
 """
 import streamlit as st
+from app.session import save_session_state
+from app.sidebar import sync_sidebar
 
+@st.fragment
 def render_company_overview():
-    """Render the company overview form section"""
+    """
+    Render the company overview form section
+    
+    Runs as a fragment, so editing a field reruns only this step.
+    """
     st.header("🏢 Company Overview")
     st.markdown("Tell us about your business and what makes it unique.")
     
@@ -50,5 +57,7 @@ def render_company_overview():
         'mission': mission,
         'target_market': target_market
     })
+    save_session_state()
+    sync_sidebar()
     
     return company_name, business_description, mission, target_market
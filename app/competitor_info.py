@@ -2,9 +2,16 @@
 Competitor information form section
 """
 import streamlit as st
+from app.session import save_session_state
+from app.sidebar import sync_sidebar
 
+@st.fragment
 def render_competitor_info():
-    """Render the competitor information form section"""
+    """
+    Render the competitor information form section
+    
+    Runs as a fragment, so editing a field reruns only this step.
+    """
     st.header("🏆 Competitor Information")
     st.markdown("Who are your competitors and what makes you different?")
     
@@ -51,5 +58,7 @@ def render_competitor_info():
         'market_positioning': market_positioning,
         'unique_value_prop': unique_value_prop
     })
+    save_session_state()
+    sync_sidebar()
     
     return competitor_overview, competitive_advantages, market_positioning, unique_value_prop
@@ -2,9 +2,16 @@
 Financial overview form section
 """
 import streamlit as st
+from app.session import save_session_state
+from app.sidebar import sync_sidebar
 
+@st.fragment
 def render_financial_overview():
-    """Render the financial overview form section"""
+    """
+    Render the financial overview form section
+    
+    Runs as a fragment, so editing a field reruns only this step.
+    """
     st.header("💰 Financial Overview")
     st.markdown("What are your financial projections and strategy?")
     
@@ -60,5 +67,7 @@ def render_financial_overview():
         'revenue_model': revenue_model,
         'funding_requirements': funding_requirements
     })
+    save_session_state()
+    sync_sidebar()
     
     return expected_costs, financial_strategy, projected_sales, revenue_model, funding_requirements
@@ -4,12 +4,17 @@ Business plan generation section
 import streamlit as st
 from utils.form_validation import FormValidator
 from utils.business_plan_formatter import BusinessPlanFormatter
-from app.business_plan_generator import generate_business_plan
+from app.business_plan_generator import generate_business_plan, display_saved_business_plan, render_generation_job
+from app.plan_history import render_plan_history, render_similar_plan_offer
+from utils.pdf_pool import get_pdf_pool
 
 def render_generate_section():
     """Render the business plan generation section"""
     st.header("🚀 Generate Your Business Plan")
     
+    # Start the PDF workers now, so they are warm by the time a plan is exported
+    get_pdf_pool()
+    
     # Show form summary
     formatter = BusinessPlanFormatter()
     summary = formatter.create_summary_card(st.session_state.form_data)
@@ -22,10 +27,26 @@ def render_generate_section():
     if not is_valid:
         st.error("Please complete all required fields before generating your business plan.")
         st.markdown(validator.get_validation_message(errors))
+        # Saved plans can still be reopened without filling in the form
+        display_saved_business_plan()
+        render_plan_history()
         return
     
+    # A plan saved for nearly the same answers can be reopened without calling the model
+    render_similar_plan_offer()
+    
     # Generate button
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
-        if st.button("🎯 Generate Business Plan", type="primary", use_container_width=True):
+        generating = bool(st.session_state.get('generation_job'))
+        if st.button("🎯 Generate Business Plan", type="primary", use_container_width=True, disabled=generating):
             generate_business_plan()
+        
+        if st.session_state.get('generation_job'):
+            # The plan is generated on a worker; only the progress fragment reruns while it polls
+            render_generation_job()
+        else:
+            # Reruns (downloads, widget changes) show the stored plan instead of regenerating
+            display_saved_business_plan()
+    
+    render_plan_history()
@@ -2,9 +2,16 @@
 Marketing details form section
 """
 import streamlit as st
+from app.session import save_session_state
+from app.sidebar import sync_sidebar
 
+@st.fragment
 def render_marketing_details():
-    """Render the marketing details form section"""
+    """
+    Render the marketing details form section
+    
+    Runs as a fragment, so editing a field reruns only this step.
+    """
     st.header("📈 Marketing Details")
     st.markdown("How will you attract and retain customers?")
     
@@ -51,5 +58,7 @@ def render_marketing_details():
         'marketing_channels': marketing_channels,
         'budget_considerations': budget_considerations
     })
+    save_session_state()
+    sync_sidebar()
     
     return marketing_strategy, customer_acquisition, marketing_channels, budget_considerations
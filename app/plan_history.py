@@ -0,0 +1,77 @@
+"""
+Saved plan history: reopen stored plans for review and re-download
+"""
+import streamlit as st
+from datetime import datetime
+from utils.near_duplicate import get_near_duplicate_index
+from utils.plan_store import PlanStore, get_plan_store
+from app.session import store_business_plan
+from config import PLAN_STORE_SEARCH_IN_APP
+
+def render_plan_history():
+    """Render the saved plan ID and the saved plans expander"""
+    store = get_plan_store()
+    if store is None:
+        return
+    
+    saved = st.session_state.get('business_plan')
+    if saved and saved.get('plan_id'):
+        st.caption(f"🗂️ Saved as plan `{saved['plan_id']}`. Keep this ID to open the plan again later.")
+    
+    with st.expander("📚 Saved plans"):
+        plan_id = st.text_input("Open a saved plan by ID", key="history_plan_id").strip()
+        if plan_id and st.button("Open plan", key="history_open_by_id"):
+            _open_plan(store, plan_id)
+        
+        # Listing other users' plans is only appropriate for single-tenant deployments
+        if PLAN_STORE_SEARCH_IN_APP:
+            query = st.text_input(
+                "Search saved plans",
+                key="history_query",
+                placeholder="Company name, target market or plan text"
+            )
+            results = store.search(query) if query.strip() else store.recent(10)
+            if not results:
+                st.write("No saved plans found.")
+            for plan in results:
+                col1, col2 = st.columns([5, 1])
+                created = datetime.fromtimestamp(plan['created_at']).strftime('%Y-%m-%d %H:%M')
+                col1.write(f"**{plan['company_name']}** · {plan['target_market'][:80]} · {created}")
+                if col2.button("Open", key=f"history_open_{plan['id']}"):
+                    _open_plan(store, plan['id'])
+
+def render_similar_plan_offer():
+    """Offer a saved plan generated from nearly the same form, before a new one is generated"""
+    # Matches can be other users' plans, so this follows the in-app search setting
+    if not PLAN_STORE_SEARCH_IN_APP or st.session_state.get('generation_job'):
+        return
+    store = get_plan_store()
+    index = get_near_duplicate_index()
+    if store is None or index is None:
+        return
+    
+    saved = st.session_state.get('business_plan') or {}
+    matches = [
+        (plan_id, similarity)
+        for plan_id, similarity in index.query(st.session_state.form_data)
+        if plan_id != saved.get('plan_id')
+    ]
+    if not matches:
+        return
+    plan_id, similarity = matches[0]
+    col1, col2 = st.columns([5, 1])
+    col1.info(
+        f"♻️ A saved plan was generated from a {similarity:.0%} similar form. "
+        "Open it instead of generating a new one?"
+    )
+    if col2.button("Open", key="similar_plan_open"):
+        _open_plan(store, plan_id)
+
+def _open_plan(store: PlanStore, plan_id: str):
+    """Make a stored plan the session's current plan"""
+    plan = store.get(plan_id)
+    if plan is None:
+        st.error("No saved plan with that ID.")
+        return
+    store_business_plan(plan['content'], plan['company_name'], plan['id'])
+    st.rerun()
@@ -1,13 +1,135 @@
 """
 Session state management
 """
+import hashlib
+import logging
+import secrets
+import sqlite3
+import zlib
 import streamlit as st
+from typing import Optional
+from utils.plan_artifacts import PlanArtifacts, plan_content_hash
+from utils.state_store import decode_state, encode_state, get_state_store, valid_session_id
+
+logger = logging.getLogger(__name__)
+
+# Plans kept per session; older ones are dropped when a new plan is stored
+MAX_STORED_PLANS = 3
+
+# Session keys mirrored to the state store. The API key is never persisted,
+# and derived caches like plan_artifacts are rebuilt on demand.
+PERSISTED_KEYS = (
+    'form_data',
+    'current_step',
+    'business_plan',
+    'business_plan_generated',
+    'plan_sections',
+    'generation_job',
+)
+# URL query parameter carrying the session ID
+SESSION_ID_PARAM = "sid"
 
 def initialize_session_state():
     """Initialize session state variables"""
+    restore_session_state()
     if 'form_data' not in st.session_state:
         st.session_state.form_data = {}
     if 'current_step' not in st.session_state:
         st.session_state.current_step = 1
     if 'business_plan_generated' not in st.session_state:
         st.session_state.business_plan_generated = False
+    if 'business_plan' not in st.session_state:
+        st.session_state.business_plan = None
+    if 'plan_artifacts' not in st.session_state:
+        st.session_state.plan_artifacts = {}
+    if 'generation_job' not in st.session_state:
+        st.session_state.generation_job = None
+
+def get_plan_artifacts(plan_content: str, company_name: str) -> PlanArtifacts:
+    """
+    Return the session's artifacts for a plan, keyed by content hash
+    
+    The formatted Markdown and PDF are built lazily by PlanArtifacts and
+    reused on every later rerun that displays the same plan.
+    """
+    artifacts_by_hash = st.session_state.plan_artifacts
+    content_hash = plan_content_hash(plan_content, company_name)
+    artifacts = artifacts_by_hash.get(content_hash)
+    if artifacts is None:
+        artifacts = PlanArtifacts(plan_content, company_name)
+        artifacts_by_hash[content_hash] = artifacts
+        while len(artifacts_by_hash) > MAX_STORED_PLANS:
+            artifacts_by_hash.pop(next(iter(artifacts_by_hash)))
+    return artifacts
+
+def store_business_plan(plan_content: str, company_name: str, plan_id: Optional[str] = None) -> PlanArtifacts:
+    """
+    Keep a generated plan in the session so reruns can show it without regenerating
+    
+    Args:
+        plan_content: Raw business plan content
+        company_name: Name of the company
+        plan_id: ID of the plan in the plan store, if it was saved there
+    """
+    st.session_state.business_plan = {
+        'content': plan_content,
+        'company_name': company_name,
+        'plan_id': plan_id,
+    }
+    st.session_state.business_plan_generated = True
+    return get_plan_artifacts(plan_content, company_name)
+
+def restore_session_state():
+    """
+    Load the session from the state store the first time this process sees it
+    
+    The session ID is read from the URL, or created and added to it, so a
+    reload routed to another replica or a restarted one resumes the wizard.
+    Does nothing when externalized state is disabled.
+    """
+    if 'state_session_id' in st.session_state:
+        return
+    store = get_state_store()
+    if store is None:
+        return
+    
+    session_id = st.query_params.get(SESSION_ID_PARAM)
+    if not valid_session_id(session_id):
+        session_id = secrets.token_urlsafe(16)
+        st.query_params[SESSION_ID_PARAM] = session_id
+    st.session_state.state_session_id = session_id
+    
+    try:
+        blob = store.load(session_id)
+        state = decode_state(blob) if blob is not None else {}
+    except (OSError, sqlite3.Error, zlib.error, ValueError) as e:
+        logger.warning("Could not restore session state: %s", e)
+        return
+    for key in PERSISTED_KEYS:
+        if key in state:
+            st.session_state[key] = state[key]
+    if blob is not None:
+        st.session_state.state_saved_digest = hashlib.sha256(blob).digest()
+
+def save_session_state():
+    """
+    Write the persisted session keys to the state store
+    
+    Called once at the end of a rerun (and of a step fragment's rerun); the
+    write is skipped when nothing changed since the last save.
+    """
+    session_id = st.session_state.get('state_session_id')
+    store = get_state_store()
+    if store is None or session_id is None:
+        return
+    
+    blob = encode_state({key: st.session_state.get(key) for key in PERSISTED_KEYS})
+    digest = hashlib.sha256(blob).digest()
+    if digest == st.session_state.get('state_saved_digest'):
+        return
+    try:
+        store.save(session_id, blob)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning("Could not save session state: %s", e)
+        return
+    st.session_state.state_saved_digest = digest
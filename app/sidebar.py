@@ -1,14 +1,25 @@
 """
 Sidebar rendering with API key input and progress tracking
+
+The sidebar is a fragment: changing the API key reruns only the sidebar. Step
+forms are fragments too and call sync_sidebar() after saving their fields,
+which reruns the whole app only when the form summary shown here changed.
 """
 import streamlit as st
+from typing import Any, Dict, Tuple
 from utils.form_validation import FormValidator
 
 def render_sidebar():
     """Render the sidebar with progress indicator"""
+    with st.sidebar:
+        _render_sidebar_contents()
+
+@st.fragment
+def _render_sidebar_contents():
+    """Sidebar contents; rendered inside ``st.sidebar`` so it must not use ``st.sidebar`` itself"""
     # API Key input
-    st.sidebar.title("API Settings")
-    api_key = st.sidebar.text_input(
+    st.title("API Settings")
+    api_key = st.text_input(
         "Gemini API Key",
         value=st.session_state.get('gemini_api_key', ''),
         type="password",
@@ -18,8 +29,8 @@ def render_sidebar():
     if api_key != st.session_state.get('gemini_api_key'):
         st.session_state['gemini_api_key'] = api_key
     
-    st.sidebar.markdown("---")
-    st.sidebar.title("Progress")
+    st.markdown("---")
+    st.title("Progress")
     
     steps = [
         "Company Overview",
@@ -31,24 +42,48 @@ def render_sidebar():
     
     for i, step in enumerate(steps, 1):
         if i < st.session_state.current_step:
-            st.sidebar.success(f"✅ {step}")
+            st.success(f"✅ {step}")
         elif i == st.session_state.current_step:
-            st.sidebar.info(f"🔄 {step}")
+            st.info(f"🔄 {step}")
         else:
-            st.sidebar.write(f"⏳ {step}")
+            st.write(f"⏳ {step}")
     
-    st.sidebar.markdown("---")
+    st.markdown("---")
+    
+    # Remember what was shown, so step fragments know when it goes stale
+    summary = form_summary(st.session_state.form_data)
+    st.session_state.sidebar_summary = summary
     
     # Show form data summary
     if st.session_state.form_data:
-        st.sidebar.subheader("Form Summary")
-        company_name = st.session_state.form_data.get('company_name', 'Not specified')
-        st.sidebar.write(f"**Company:** {company_name}")
+        company_name, is_valid, sections_with_errors = summary
+        st.subheader("Form Summary")
+        st.write(f"**Company:** {company_name}")
         
         # Show completion status
-        validator = FormValidator()
-        is_valid, errors = validator.validate_all_sections(st.session_state.form_data)
         if is_valid:
-            st.sidebar.success("✅ All sections complete")
+            st.success("✅ All sections complete")
         else:
-            st.sidebar.warning(f"⚠️ {len(errors)} sections need attention")
+            st.warning(f"⚠️ {sections_with_errors} sections need attention")
+
+def form_summary(form_data: Dict[str, Any]) -> Tuple[str, bool, int]:
+    """
+    What the sidebar shows about the form
+    
+    Returns:
+        Tuple of (company name, whether all sections are valid, number of
+        sections with errors)
+    """
+    is_valid, errors = FormValidator().validate_all_sections(form_data)
+    return form_data.get('company_name', 'Not specified'), is_valid, len(errors)
+
+def sync_sidebar():
+    """
+    Rerun the whole app if a step fragment changed what the sidebar shows
+    
+    Called by step forms after saving their fields. The summary is compared
+    on every call: when the step ran as part of a full rerun the sidebar has
+    just been rendered from the same form data, so nothing happens.
+    """
+    if form_summary(st.session_state.form_data) != st.session_state.get('sidebar_summary'):
+        st.rerun()
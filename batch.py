@@ -0,0 +1,284 @@
+"""
+AI Business Plan Generator - Headless Batch Entry Point
+
+Generates business plans for many companies at once from a JSONL or CSV file
+of form data records, without going through the Streamlit wizard.
+
+Usage:
+    python batch.py companies.jsonl --output-dir plans --concurrency 4
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, Iterator, List, Optional, Set
+from config import GEMINI_API_KEY, GENERATION_MODE
+from utils.api_client import GeminiAPIClient
+from utils.form_validation import FormValidator
+from utils.metrics import get_metrics
+from utils.plan_artifacts import PlanArtifacts
+from utils.plan_store import save_plan
+from utils.section_generator import SectionedPlanGenerator
+
+CHECKPOINT_FILENAME = "checkpoint.jsonl"
+REPORT_FILENAME = "batch_report.json"
+
+
+def read_records(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Read form data records from a JSONL or CSV file
+
+    Args:
+        path: Input file; ``.csv`` files are read with a header row, anything
+            else is treated as JSON Lines
+
+    Yields:
+        One form data dictionary per record. Numbers in JSON records are
+        turned into strings, as they would be typed into the form.
+
+    Raises:
+        ValueError: If a JSON line is invalid or not an object
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            for row in csv.DictReader(f):
+                yield {key: value or "" for key, value in row.items() if key}
+        else:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"{path}:{line_number}: invalid JSON ({e})") from e
+                if not isinstance(record, dict):
+                    raise ValueError(f"{path}:{line_number}: expected a JSON object")
+                yield {
+                    key: str(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else value
+                    for key, value in record.items()
+                }
+
+
+def record_id(form_data: Dict[str, Any]) -> str:
+    """Stable identifier for a record: its ``id`` field, or a hash of its contents"""
+    if form_data.get("id"):
+        return re.sub(r"[^A-Za-z0-9_.-]+", "_", str(form_data["id"]))
+    payload = json.dumps(form_data, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+def load_checkpoint(path: str) -> Set[str]:
+    """Return the IDs of records completed by earlier runs"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A run interrupted mid-write can leave a truncated last line
+                continue
+            if entry.get("status") == "done":
+                done.add(entry["id"])
+    return done
+
+
+class BatchRunner:
+    """Generates, formats and exports plans for a batch of records with bounded concurrency"""
+
+    def __init__(self, api_client: GeminiAPIClient, output_dir: str, concurrency: int = 4, write_pdf: bool = True):
+        self.api_client = api_client
+        self.output_dir = output_dir
+        self.concurrency = concurrency
+        self.write_pdf = write_pdf
+        self.validator = FormValidator()
+        self.checkpoint_path = os.path.join(output_dir, CHECKPOINT_FILENAME)
+        self._checkpoint_lock = threading.Lock()
+
+    def run(self, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Process every record that is not already in the checkpoint
+
+        Args:
+            records: Form data records to process
+
+        Returns:
+            Run report with throughput and per-record results
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        done = load_checkpoint(self.checkpoint_path)
+
+        pending = []
+        skipped = 0
+        for form_data in records:
+            rid = record_id(form_data)
+            if rid in done:
+                skipped += 1
+            else:
+                pending.append((rid, form_data))
+
+        results = []
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = {executor.submit(self._process, rid, form_data): rid for rid, form_data in pending}
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                print(_format_result(result), flush=True)
+        elapsed = time.perf_counter() - started
+
+        generated = [r for r in results if r["status"] == "done"]
+        latencies = sorted(r["latency_seconds"] for r in generated)
+        return {
+            "total_records": len(pending) + skipped,
+            "skipped_from_checkpoint": skipped,
+            "generated": len(generated),
+            "invalid": sum(1 for r in results if r["status"] == "invalid"),
+            "failed": sum(1 for r in results if r["status"] == "failed"),
+            "elapsed_seconds": elapsed,
+            "plans_per_minute": len(generated) / elapsed * 60 if elapsed > 0 else 0.0,
+            "latency_seconds": {
+                "p50": _percentile(latencies, 50),
+                "p95": _percentile(latencies, 95),
+                "max": latencies[-1] if latencies else None,
+            },
+            "records": sorted(results, key=lambda r: r["id"]),
+        }
+
+    def _process(self, rid: str, form_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate, generate and export a single record"""
+        not_strings = sorted(key for key, value in form_data.items() if key != "id" and not isinstance(value, str))
+        if not_strings:
+            return {"id": rid, "status": "invalid", "error": f"Form field values must be strings: {', '.join(not_strings)}"}
+        is_valid, errors = self.validator.validate_all_sections(form_data)
+        if not is_valid:
+            missing = [error for section_errors in errors.values() for error in section_errors]
+            return {"id": rid, "status": "invalid", "error": "; ".join(missing)}
+
+        started = time.perf_counter()
+        try:
+            plan = self._generate(form_data)
+            # Archive the plan before exporting, so a failed export does not lose it
+            plan_id = save_plan(form_data, plan, source="batch")
+            company_name = form_data.get("company_name", "Your Company")
+            # Both exports render from one parse of the plan
+            artifacts = PlanArtifacts(plan, company_name)
+
+            files = [self._write(f"{rid}.md", artifacts.formatted_markdown().encode("utf-8"))]
+            if self.write_pdf:
+                files.append(self._write(f"{rid}.pdf", artifacts.pdf_bytes()))
+        except Exception as e:
+            get_metrics().generations.inc(source="batch", status="failed")
+            return {
+                "id": rid,
+                "status": "failed",
+                "error": str(e),
+                "latency_seconds": time.perf_counter() - started,
+            }
+
+        result = {
+            "id": rid,
+            "status": "done",
+            "latency_seconds": time.perf_counter() - started,
+            "files": files,
+            "plan_id": plan_id,
+        }
+        get_metrics().generations.inc(source="batch", status="done")
+        self._checkpoint(result)
+        return result
+
+    def _generate(self, form_data: Dict[str, Any]) -> str:
+        """Generate the plan text using the configured generation mode"""
+        if GENERATION_MODE == "sections":
+            generator = SectionedPlanGenerator(self.api_client)
+            sections, failures = generator.generate(form_data)
+            if failures:
+                raise RuntimeError(f"Sections failed: {', '.join(sorted(failures))}")
+            return generator.assemble(sections)
+        return self.api_client.generate_business_plan(form_data, raise_errors=True)
+
+    def _write(self, filename: str, data: bytes) -> str:
+        """Write an output file atomically so a crash never leaves half-written artifacts"""
+        path = os.path.join(self.output_dir, filename)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return path
+
+    def _checkpoint(self, result: Dict[str, Any]):
+        """Append a completed record to the checkpoint file"""
+        with self._checkpoint_lock:
+            with open(self.checkpoint_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(result) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+
+def _percentile(sorted_values: List[float], percent: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(percent / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def _format_result(result: Dict[str, Any]) -> str:
+    if result["status"] == "done":
+        return f"[done]    {result['id']} ({result['latency_seconds']:.1f}s)"
+    return f"[{result['status']}] {result['id']}: {result['error']}"
+
+
+def _print_report(report: Dict[str, Any]):
+    latency = report["latency_seconds"]
+    print()
+    print(f"Records:    {report['total_records']} "
+          f"({report['skipped_from_checkpoint']} already done, {report['generated']} generated, "
+          f"{report['invalid']} invalid, {report['failed']} failed)")
+    print(f"Elapsed:    {report['elapsed_seconds']:.1f}s")
+    print(f"Throughput: {report['plans_per_minute']:.2f} plans/min")
+    if latency["p50"] is not None:
+        print(f"Latency:    p50 {latency['p50']:.1f}s, p95 {latency['p95']:.1f}s, max {latency['max']:.1f}s")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Generate business plans in bulk from JSONL or CSV form data.")
+    parser.add_argument("input", help="JSONL or CSV file with one form_data record per line/row")
+    parser.add_argument("-o", "--output-dir", default="batch_output", help="Directory for plans, checkpoint and report")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="Maximum number of plans generated at once")
+    parser.add_argument("--api-key", default=None, help="Gemini API key (defaults to GEMINI_API_KEY)")
+    parser.add_argument("--no-pdf", action="store_true", help="Only write Markdown output")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Batch entry point"""
+    args = parse_args(argv)
+
+    try:
+        records = list(read_records(args.input))
+        api_client = GeminiAPIClient(api_key=args.api_key or GEMINI_API_KEY)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    runner = BatchRunner(api_client, args.output_dir, concurrency=args.concurrency, write_pdf=not args.no_pdf)
+    report = runner.run(records)
+
+    with open(os.path.join(args.output_dir, REPORT_FILENAME), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    _print_report(report)
+
+    return 0 if report["failed"] == 0 and report["invalid"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
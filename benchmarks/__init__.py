@@ -0,0 +1 @@
+# Benchmarks package for AI Business Plan Generator
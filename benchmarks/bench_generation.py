@@ -0,0 +1,140 @@
+"""
+Generation throughput and tail-latency benchmark
+
+Drives GeminiAPIClient concurrently through the backend selected in
+config.py. Use the offline fake backend for reproducible runs:
+
+    python -m benchmarks.bench_generation --backend fake --requests 200 --concurrency 32
+
+The async and async-stream modes run every request as a task on a single
+event loop instead of one thread per request:
+
+    python -m benchmarks.bench_generation --backend fake --mode async-stream --requests 1000 --concurrency 500
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark plan generation throughput and latency.")
+    parser.add_argument("--backend", default=None, help="Override LLM_BACKEND (gemini or fake)")
+    parser.add_argument("--mode", choices=("single", "stream", "sections", "async", "async-stream"), default="single")
+    parser.add_argument("--requests", type=int, default=100, help="Total number of plans to generate")
+    parser.add_argument("--concurrency", type=int, default=16, help="Plans generated at once")
+    parser.add_argument("--respect-rate-limit", action="store_true",
+                        help="Keep the configured per-key rate limit instead of lifting it")
+    parser.add_argument("--output", default=None, help="Write results as JSON to this path")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+
+    # Configuration is read at import time, so it has to be set up first
+    if args.backend:
+        os.environ["LLM_BACKEND"] = args.backend
+    os.environ["CACHE_ENABLED"] = "false"
+    if not args.respect_rate_limit:
+        os.environ["RATE_LIMIT_REQUESTS_PER_MINUTE"] = str(10 ** 9)
+        os.environ["RATE_LIMIT_BURST"] = str(10 ** 6)
+        os.environ["MAX_CONCURRENT_REQUESTS"] = str(max(args.concurrency, 1))
+
+    from config import LLM_BACKEND
+    from utils.api_client import GeminiAPIClient
+    from utils.section_generator import SectionedPlanGenerator
+    from benchmarks.common import environment, sample_form, summarize, write_results
+
+    client = GeminiAPIClient()
+
+    def run_one(index: int) -> Dict[str, Any]:
+        form_data = sample_form(index)
+        started = time.perf_counter()
+        first_chunk_at = None
+        try:
+            if args.mode == "stream":
+                for _ in client.generate_business_plan_stream(form_data):
+                    if first_chunk_at is None:
+                        first_chunk_at = time.perf_counter()
+            elif args.mode == "sections":
+                sections, failures = SectionedPlanGenerator(client).generate(form_data)
+                if failures:
+                    raise RuntimeError(f"{len(failures)} sections failed")
+            else:
+                client.generate_business_plan(form_data, raise_errors=True)
+        except Exception as e:
+            return {"ok": False, "error": type(e).__name__, "latency": time.perf_counter() - started}
+        finished = time.perf_counter()
+        return {"ok": True, "latency": finished - started, "ttft": (first_chunk_at or finished) - started}
+
+    async def arun_one(index: int, limit: asyncio.Semaphore) -> Dict[str, Any]:
+        async with limit:
+            form_data = sample_form(index)
+            started = time.perf_counter()
+            first_chunk_at = None
+            try:
+                if args.mode == "async-stream":
+                    async for _ in client.agenerate_business_plan_stream(form_data):
+                        if first_chunk_at is None:
+                            first_chunk_at = time.perf_counter()
+                else:
+                    await client.agenerate_business_plan(form_data)
+            except Exception as e:
+                return {"ok": False, "error": type(e).__name__, "latency": time.perf_counter() - started}
+            finished = time.perf_counter()
+            return {"ok": True, "latency": finished - started, "ttft": (first_chunk_at or finished) - started}
+
+    async def arun_all() -> List[Dict[str, Any]]:
+        limit = asyncio.Semaphore(args.concurrency)
+        return await asyncio.gather(*(arun_one(index, limit) for index in range(1, args.requests + 1)))
+
+    started = time.perf_counter()
+    if args.mode.startswith("async"):
+        outcomes = asyncio.run(arun_all())
+    else:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            outcomes = list(executor.map(run_one, range(1, args.requests + 1)))
+    elapsed = time.perf_counter() - started
+
+    succeeded = [o for o in outcomes if o["ok"]]
+    errors: Dict[str, int] = {}
+    for outcome in outcomes:
+        if not outcome["ok"]:
+            errors[outcome["error"]] = errors.get(outcome["error"], 0) + 1
+
+    results = {
+        "benchmark": "generation",
+        "backend": LLM_BACKEND,
+        "mode": args.mode,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "elapsed_seconds": elapsed,
+        "plans_per_minute": len(succeeded) / elapsed * 60 if elapsed > 0 else 0.0,
+        "latency_seconds": summarize([o["latency"] for o in succeeded]),
+        "ttft_seconds": summarize([o["ttft"] for o in succeeded]),
+        "errors": errors,
+        "environment": environment(),
+    }
+
+    latency = results["latency_seconds"]
+    print(f"{args.requests} {args.mode} requests on '{LLM_BACKEND}' at concurrency {args.concurrency}")
+    print(f"  throughput: {results['plans_per_minute']:.1f} plans/min ({elapsed:.1f}s)")
+    if succeeded:
+        print(f"  latency:    p50 {latency['p50']:.3f}s  p95 {latency['p95']:.3f}s  p99 {latency['p99']:.3f}s")
+        if args.mode in ("stream", "async-stream"):
+            ttft = results["ttft_seconds"]
+            print(f"  ttft:       p50 {ttft['p50']:.3f}s  p95 {ttft['p95']:.3f}s  p99 {ttft['p99']:.3f}s")
+    if errors:
+        print(f"  errors:     {errors}")
+
+    if args.output:
+        write_results(args.output, results)
+    return 0 if not errors else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
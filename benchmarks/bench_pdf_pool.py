@@ -0,0 +1,135 @@
+"""
+PDF export throughput: in-process threads vs the warm render pool
+
+Renders a fixed corpus of synthetic plans concurrently, first on threads in
+this process (the GIL serializes them) and then through PDFRenderPool with
+increasing worker counts. A ticker thread stands in for other Streamlit
+sessions; its worst scheduling delay shows how long renders stall the rest of
+the process:
+
+    python -m benchmarks.bench_pdf_pool
+    python -m benchmarks.bench_pdf_pool --plans 64 --size 65536 --workers 1 2 4 8
+
+Throughput should grow with workers up to the number of cores.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, List, Optional
+from benchmarks.common import environment, summarize, synthetic_plan, write_results
+
+
+class Ticker:
+    """Thread that wakes every interval and records how late each wake-up was"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.delays: List[float] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self) -> "Ticker":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            expected = time.perf_counter() + self.interval
+            time.sleep(self.interval)
+            self.delays.append(max(0.0, time.perf_counter() - expected))
+
+
+def run_config(render: Callable[[int], bytes], plans: int, concurrency: int) -> Dict[str, Any]:
+    """Render every plan with ``concurrency`` callers and summarize latency and stalls"""
+    latencies: List[float] = []
+
+    def one(index: int) -> int:
+        started = time.perf_counter()
+        size = len(render(index))
+        latencies.append(time.perf_counter() - started)
+        return size
+
+    with Ticker() as ticker:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            sizes = list(executor.map(one, range(plans)))
+        elapsed = time.perf_counter() - started
+    return {
+        "elapsed_seconds": elapsed,
+        "plans_per_second": plans / elapsed if elapsed > 0 else 0.0,
+        "latency_seconds": summarize(latencies),
+        "ticker_delay_seconds": summarize(ticker.delays),
+        "output_bytes": sum(sizes),
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    cpus = os.cpu_count() or 1
+    default_workers = sorted({1, 2, 4, cpus} - {w for w in (2, 4) if w > cpus})
+    parser = argparse.ArgumentParser(description="Benchmark PDF export throughput across render workers.")
+    parser.add_argument("--plans", type=int, default=32, help="Plans in the corpus")
+    parser.add_argument("--size", type=int, default=32 * 1024, help="Approximate size of each plan in bytes")
+    parser.add_argument("--workers", type=int, nargs="+", default=default_workers, help="Worker counts to measure")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="Concurrent exports (default: twice the largest worker count)")
+    parser.add_argument("--output", default=None, help="Write results as JSON to this path")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    from utils.markdown_parser import parse_markdown
+    from utils.pdf_generator import render_pdf
+    from utils.pdf_pool import PDFRenderPool
+
+    documents = [parse_markdown(synthetic_plan(args.size, seed=index)) for index in range(args.plans)]
+    concurrency = args.concurrency or 2 * max(args.workers)
+    configs: Dict[str, Dict[str, Any]] = {}
+
+    print(f"{args.plans} plans of ~{args.size // 1024} KB, {concurrency} concurrent exports, {os.cpu_count()} CPUs")
+    configs["threads"] = run_config(lambda i: render_pdf(documents[i], f"Plan {i}"), args.plans, concurrency)
+
+    for workers in args.workers:
+        pool = PDFRenderPool(workers=workers, max_pending=args.plans, timeout_seconds=600)
+        try:
+            # Wait for every worker to finish starting, so only rendering is timed
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(lambda i: pool.render(documents[i % args.plans], "Warm-up"), range(workers)))
+            configs[f"pool_{workers}"] = run_config(
+                lambda i: pool.render(documents[i], f"Plan {i}"), args.plans, concurrency
+            )
+        finally:
+            pool.shutdown()
+
+    single = configs.get("pool_1", configs["threads"])["plans_per_second"]
+    for name, result in configs.items():
+        result["speedup_vs_one_worker"] = result["plans_per_second"] / single if single else None
+        latency = result["latency_seconds"]
+        stall = result["ticker_delay_seconds"]
+        print(
+            f"  {name:<10} {result['plans_per_second']:6.2f} plans/s  x{result['speedup_vs_one_worker']:.2f}  "
+            f"latency p50 {latency['p50']:.3f}s p95 {latency['p95']:.3f}s  "
+            f"stall p99 {stall['p99'] * 1000:.1f} ms max {stall['max'] * 1000:.1f} ms"
+        )
+
+    if args.output:
+        write_results(args.output, {
+            "benchmark": "pdf_pool",
+            "plans": args.plans,
+            "plan_bytes": args.size,
+            "concurrency": concurrency,
+            "configs": configs,
+            "environment": environment(),
+        })
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
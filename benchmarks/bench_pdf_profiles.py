@@ -0,0 +1,98 @@
+"""
+PDF render profiles on a fixed corpus
+
+Renders the same synthetic plans (fixed sizes and seeds, so every run and
+every machine sees identical input) with each profile in config.PDF_PROFILES
+and reports render time and file size per profile:
+
+    python -m benchmarks.bench_pdf_profiles
+    python -m benchmarks.bench_pdf_profiles --sizes 4096 65536 --seeds 5 --output results/profiles.json
+
+"draft" should render fastest and "archive" should produce the smallest files.
+"""
+import argparse
+import statistics
+import sys
+import time
+from typing import Dict, Any, List, Optional
+from benchmarks.common import environment, synthetic_plan, write_results
+
+DEFAULT_SIZES = [4 * 1024, 16 * 1024, 64 * 1024, 256 * 1024]
+
+
+def corpus(sizes: List[int], seeds: int) -> List[Dict[str, Any]]:
+    """Parsed plans for every size and seed, with their labels"""
+    from utils.markdown_parser import parse_markdown
+
+    plans = []
+    for size in sizes:
+        for seed in range(seeds):
+            text = synthetic_plan(size, seed=seed)
+            plans.append({"size": size, "seed": seed, "input_bytes": len(text.encode("utf-8")), "document": parse_markdown(text)})
+    return plans
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compare PDF render profiles on a fixed corpus.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Plan sizes in bytes")
+    parser.add_argument("--seeds", type=int, default=3, help="Plans per size")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed renders per plan; the median is kept")
+    parser.add_argument("--output", default=None, help="Write results as JSON to this path")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    from config import PDF_PROFILES
+    from utils.pdf_generator import _render_pdf
+
+    plans = corpus(args.sizes, args.seeds)
+    # Load fonts and build the cached styles before anything is timed
+    for profile in PDF_PROFILES:
+        _render_pdf(plans[0]["document"], "Warm-up", profile)
+
+    profiles: Dict[str, Dict[str, Any]] = {}
+    for profile in PDF_PROFILES:
+        by_size: Dict[int, Dict[str, List[float]]] = {}
+        for plan in plans:
+            timings = []
+            for _ in range(args.repeats):
+                started = time.perf_counter()
+                pdf_bytes = _render_pdf(plan["document"], "Acme Fitness Co", profile)
+                timings.append(time.perf_counter() - started)
+            entry = by_size.setdefault(plan["size"], {"seconds": [], "bytes": []})
+            entry["seconds"].append(statistics.median(timings))
+            entry["bytes"].append(len(pdf_bytes))
+        profiles[profile] = {
+            "total_seconds": sum(sum(entry["seconds"]) for entry in by_size.values()),
+            "total_bytes": sum(sum(entry["bytes"]) for entry in by_size.values()),
+            "sizes": {
+                str(size): {"median_seconds": statistics.median(entry["seconds"]), "median_bytes": statistics.median(entry["bytes"])}
+                for size, entry in by_size.items()
+            },
+        }
+
+    print(f"{len(plans)} plans ({args.seeds} per size), median of {args.repeats} renders each")
+    print(f"  {'size':>8}  " + "  ".join(f"{profile + ' ms':>12} {profile + ' KiB':>12}" for profile in profiles))
+    for size in args.sizes:
+        cells = []
+        for result in profiles.values():
+            case = result["sizes"][str(size)]
+            cells.append(f"{case['median_seconds'] * 1000:>12.1f} {case['median_bytes'] / 1024:>12.1f}")
+        print(f"  {size // 1024:>6}KB  " + "  ".join(cells))
+    for profile, result in profiles.items():
+        print(f"  {profile:<8} total {result['total_seconds']:.2f}s  {result['total_bytes'] / 1024:.0f} KiB")
+
+    if args.output:
+        write_results(args.output, {
+            "benchmark": "pdf_profiles",
+            "plans": len(plans),
+            "repeats": args.repeats,
+            "profiles": profiles,
+            "environment": environment(),
+        })
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""
+Rendering benchmark for plan formatting and PDF generation
+
+Measures wall time, peak Python memory and output size of
+BusinessPlanFormatter.format_business_plan and generate_pdf on synthetic
+plans from 1 KB to several MB, and compares them against a saved baseline:
+
+    python -m benchmarks.bench_rendering                    # compare to baseline
+    python -m benchmarks.bench_rendering --update-baseline  # record a new baseline
+
+Baselines are machine specific; record one on the machine that runs the
+comparison before relying on the timing checks.
+"""
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, Any, List, Optional
+from benchmarks.common import environment, synthetic_plan, write_results
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "rendering.json")
+DEFAULT_SIZES = [1024, 16 * 1024, 256 * 1024, 1024 * 1024, 4 * 1024 * 1024]
+# Metrics compared against the baseline; output size is reported but allowed to vary
+COMPARED_METRICS = ("seconds", "peak_memory_bytes")
+# Absolute changes below these are treated as noise, whatever the relative change
+NOISE_FLOOR = {"seconds": 0.005, "peak_memory_bytes": 64 * 1024}
+
+
+def measure(func: Callable[[], Any], repeats: int) -> Dict[str, Any]:
+    """
+    Time a callable and measure its peak traced memory
+
+    Timing runs are done without tracemalloc, which would otherwise dominate
+    the measurement; peak memory comes from one extra traced run.
+
+    Returns:
+        Median wall time, peak memory and the size of the returned output
+    """
+    timings = []
+    output = None
+    for _ in range(repeats):
+        gc.collect()
+        started = time.perf_counter()
+        output = func()
+        timings.append(time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    size = len(output.encode("utf-8")) if isinstance(output, str) else len(output)
+    return {"seconds": statistics.median(timings), "peak_memory_bytes": peak, "output_bytes": size}
+
+
+def run(sizes: List[int], repeats: int) -> Dict[str, Dict[str, Any]]:
+    """Benchmark every stage at every plan size"""
+    from utils.business_plan_formatter import BusinessPlanFormatter
+    from utils.pdf_generator import generate_pdf
+
+    formatter = BusinessPlanFormatter()
+    company_name = "Acme Fitness Co"
+    cases: Dict[str, Dict[str, Any]] = {}
+    for size in sizes:
+        plan = synthetic_plan(size)
+        formatted = formatter.format_business_plan(plan, company_name)
+        # Large inputs take seconds per run; one timed run is enough there
+        size_repeats = repeats if size <= 256 * 1024 else 1
+
+        stages = {
+            "format": lambda: formatter.format_business_plan(plan, company_name),
+            "pdf": lambda: generate_pdf(formatted, company_name),
+        }
+        for stage, func in stages.items():
+            name = f"{stage}/{_label(size)}"
+            cases[name] = {"input_bytes": len(plan.encode("utf-8")), **measure(func, size_repeats)}
+            result = cases[name]
+            print(
+                f"{name:<14} {result['seconds'] * 1000:>10.1f} ms "
+                f"{result['peak_memory_bytes'] / 1024 / 1024:>9.1f} MiB peak "
+                f"{result['output_bytes'] / 1024:>10.1f} KiB out",
+                flush=True,
+            )
+    return cases
+
+
+def compare(cases: Dict[str, Dict[str, Any]], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    Find cases that regressed beyond the threshold
+
+    Args:
+        cases: Results of this run
+        baseline: Previously saved results
+        threshold: Allowed relative increase, e.g. 0.25 for +25%
+
+    Returns:
+        Human-readable descriptions of every regression
+    """
+    regressions = []
+    for name, result in cases.items():
+        previous = baseline.get("cases", {}).get(name)
+        if previous is None:
+            continue
+        for metric in COMPARED_METRICS:
+            before, after = previous.get(metric), result[metric]
+            if before and after > before * (1 + threshold) and after - before > NOISE_FLOOR[metric]:
+                regressions.append(f"{name} {metric}: {before:.4g} -> {after:.4g} (+{(after / before - 1) * 100:.0f}%)")
+    return regressions
+
+
+def _label(size: int) -> str:
+    return f"{size // (1024 * 1024)}MB" if size >= 1024 * 1024 else f"{size // 1024}KB"
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark plan formatting and PDF rendering.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Plan sizes in bytes")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per case (small plans)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative regression")
+    parser.add_argument("--update-baseline", action="store_true", help="Save this run as the new baseline")
+    parser.add_argument("--output", default=None, help="Also write this run's results to a JSON file")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    results = {"benchmark": "rendering", "environment": environment(), "cases": run(args.sizes, args.repeats)}
+
+    if args.output:
+        write_results(args.output, results)
+
+    if args.update_baseline:
+        write_results(args.baseline, results)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(results["cases"], baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print(f"\nNo regressions beyond {args.threshold:.0%} against {baseline['environment'].get('commit')}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
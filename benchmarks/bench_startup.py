@@ -0,0 +1,175 @@
+"""
+Startup benchmark for import time and resident memory
+
+Each scenario imports the modules one path of the app needs in a fresh
+interpreter and records wall time and peak resident memory, so cold starts
+can be compared across commits:
+
+    python -m benchmarks.bench_startup                    # compare to baseline
+    python -m benchmarks.bench_startup --update-baseline  # record a new baseline
+
+Scenarios also list heavy packages they must not load; the wizard steps, for
+example, must not import the Gemini SDK or ReportLab. Loading one of them
+fails the run whatever the timings.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, Any, List, Optional
+from benchmarks.common import environment, write_results
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "startup.json")
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMPARED_METRICS = ("seconds", "max_rss_bytes")
+# Absolute changes below these are treated as noise, whatever the relative change
+NOISE_FLOOR = {"seconds": 0.05, "max_rss_bytes": 8 * 1024 * 1024}
+
+# Modules imported by main.py before any step is rendered
+WIZARD_MODULES = [
+    "streamlit",
+    "config",
+    "app.session",
+    "app.header",
+    "app.sidebar",
+    "app.company_overview",
+    "app.marketing_details",
+    "app.competitor_info",
+    "app.financial_overview",
+    "app.navigation",
+]
+
+SCENARIOS: Dict[str, Dict[str, List[str]]] = {
+    "interpreter": {"modules": [], "forbidden": []},
+    "wizard": {"modules": WIZARD_MODULES, "forbidden": ["google.generativeai", "reportlab"]},
+    "generate_step": {
+        "modules": WIZARD_MODULES + ["app.generate_section"],
+        "forbidden": ["google.generativeai", "reportlab"],
+    },
+    "pdf_export": {"modules": WIZARD_MODULES + ["app.generate_section", "utils.pdf_generator"], "forbidden": []},
+    "gemini_sdk": {"modules": WIZARD_MODULES + ["app.generate_section", "google.generativeai"], "forbidden": []},
+}
+
+# Runs in the child interpreter; prints one JSON line with the measurements
+_CHILD = """
+import importlib, json, resource, sys, time, warnings
+warnings.simplefilter("ignore")
+modules, forbidden = json.loads(sys.argv[1]), json.loads(sys.argv[2])
+started = time.perf_counter()
+for name in modules:
+    importlib.import_module(name)
+seconds = time.perf_counter() - started
+# ru_maxrss is in KiB on Linux and in bytes on macOS
+scale = 1 if sys.platform == "darwin" else 1024
+print(json.dumps({
+    "seconds": seconds,
+    "max_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+    "modules_loaded": len(sys.modules),
+    "forbidden_loaded": sorted({f for f in forbidden for m in sys.modules if m == f or m.startswith(f + ".")}),
+}))
+"""
+
+
+def measure(modules: List[str], forbidden: List[str], repeats: int) -> Dict[str, Any]:
+    """
+    Import modules in fresh interpreters
+
+    Returns:
+        Median import time, median peak RSS, the number of loaded modules and
+        any forbidden packages that were loaded
+    """
+    runs = []
+    for _ in range(repeats):
+        completed = subprocess.run(
+            [sys.executable, "-c", _CHILD, json.dumps(modules), json.dumps(forbidden)],
+            capture_output=True, text=True, cwd=REPO_ROOT, check=True,
+        )
+        runs.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    return {
+        "seconds": statistics.median(run["seconds"] for run in runs),
+        "max_rss_bytes": int(statistics.median(run["max_rss_bytes"] for run in runs)),
+        "modules_loaded": runs[-1]["modules_loaded"],
+        "forbidden_loaded": runs[-1]["forbidden_loaded"],
+    }
+
+
+def run(repeats: int) -> Dict[str, Dict[str, Any]]:
+    """Measure every scenario"""
+    cases = {}
+    for name, scenario in SCENARIOS.items():
+        result = measure(scenario["modules"], scenario["forbidden"], repeats)
+        cases[name] = result
+        loaded = f"  loaded {', '.join(result['forbidden_loaded'])}" if result["forbidden_loaded"] else ""
+        print(
+            f"{name:<14} {result['seconds'] * 1000:>8.0f} ms "
+            f"{result['max_rss_bytes'] / 1024 / 1024:>7.1f} MiB RSS "
+            f"{result['modules_loaded']:>6} modules{loaded}",
+            flush=True,
+        )
+    return cases
+
+
+def compare(cases: Dict[str, Dict[str, Any]], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    Find scenarios that regressed beyond the threshold or loaded a forbidden package
+
+    Returns:
+        Human-readable descriptions of every regression
+    """
+    regressions = [
+        f"{name} loaded {', '.join(result['forbidden_loaded'])}"
+        for name, result in cases.items() if result["forbidden_loaded"]
+    ]
+    for name, result in cases.items():
+        previous = baseline.get("cases", {}).get(name)
+        if previous is None:
+            continue
+        for metric in COMPARED_METRICS:
+            before, after = previous.get(metric), result[metric]
+            if before and after > before * (1 + threshold) and after - before > NOISE_FLOOR[metric]:
+                regressions.append(f"{name} {metric}: {before:.4g} -> {after:.4g} (+{(after / before - 1) * 100:.0f}%)")
+    return regressions
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark import time and resident memory at startup.")
+    parser.add_argument("--repeats", type=int, default=5, help="Fresh interpreters per scenario")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative regression")
+    parser.add_argument("--update-baseline", action="store_true", help="Save this run as the new baseline")
+    parser.add_argument("--output", default=None, help="Also write this run's results to a JSON file")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    results = {"benchmark": "startup", "environment": environment(), "cases": run(args.repeats)}
+
+    if args.output:
+        write_results(args.output, results)
+
+    baseline: Dict[str, Any] = {}
+    if args.update_baseline:
+        write_results(args.baseline, results)
+        print(f"Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    else:
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one")
+
+    regressions = compare(results["cases"], baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s):")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    if baseline:
+        print(f"\nNo regressions beyond {args.threshold:.0%} against {baseline['environment'].get('commit')}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""
+Shared helpers for the benchmark scripts
+"""
+import json
+import os
+import platform
+import random
+import subprocess
+from typing import Dict, Any, List, Optional
+
+# Matches the placeholder examples shown in the wizard
+SAMPLE_FORM = {
+    "company_name": "Acme Fitness Co",
+    "business_description": "A mobile app offering personalized workout plans and nutrition guidance",
+    "mission": "Empower busy professionals to stay healthy through simple daily routines",
+    "target_market": "Professionals aged 25–45 in urban areas seeking convenient home workouts",
+    "marketing_strategy": "Content marketing, influencer partnerships, and targeted social ads",
+    "customer_acquisition": "Free 7‑day trial, referral program, email onboarding sequence",
+    "marketing_channels": "Instagram, YouTube, TikTok, and newsletter collaborations",
+    "budget_considerations": "$2,000/month for ads, $500/month for content production",
+    "competitor_overview": "FitApp, HealthPro — both offer generic plans and limited coaching",
+    "competitive_advantages": "Personalized plans, AI‑driven coaching, progress tracking dashboard",
+    "market_positioning": "Premium yet affordable alternative focusing on accountability",
+    "unique_value_prop": "Daily micro‑workouts tailored to schedule and equipment",
+    "expected_costs": "Development $8k, hosting $200/mo, marketing $2k/mo",
+    "financial_strategy": "Keep CAC:LTV at 1:3, reinvest 30% of profits into growth",
+    "projected_sales": "500 subscriptions in year 1 at $15/month",
+    "revenue_model": "Monthly subscription with annual discount",
+    "funding_requirements": "$50k to cover 6 months runway and marketing tests",
+}
+
+
+def sample_form(index: int = 0) -> Dict[str, Any]:
+    """A copy of the sample form, made unique per index so requests never share a prompt"""
+    form_data = dict(SAMPLE_FORM)
+    if index:
+        form_data["company_name"] = f"{SAMPLE_FORM['company_name']} #{index}"
+    return form_data
+
+
+def percentile(values: List[float], percent: float) -> Optional[float]:
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(percent / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def summarize(values: List[float]) -> Dict[str, Optional[float]]:
+    """p50/p95/p99/max summary of a list of measurements"""
+    return {
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else None,
+    }
+
+
+def environment() -> Dict[str, Any]:
+    """Where and on which commit a benchmark ran, so results can be compared across commits"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def write_results(path: str, results: Dict[str, Any]):
+    """Write benchmark results as indented JSON"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+
+def synthetic_plan(target_bytes: int, seed: int = 0) -> str:
+    """
+    Markdown plan of roughly ``target_bytes`` with the shapes Gemini produces
+
+    Mixes numbered and ``#`` headings, long bullet runs, bold markup and plain
+    paragraphs. The same size and seed always give the same text.
+
+    Args:
+        target_bytes: Approximate UTF-8 size of the plan
+        seed: Seed for the word and structure choices
+
+    Returns:
+        Plan text
+    """
+    rng = random.Random(seed)
+    vocabulary = (
+        "market customers revenue growth strategy product pricing channel retention "
+        "margin forecast investment team launch segment demand acquisition partnership "
+        "brand operations runway scalable subscription churn cohort funnel"
+    ).split()
+    sections = [
+        "Executive Summary", "Company Description", "Market Analysis", "Organization & Management",
+        "Service or Product Line", "Marketing & Sales Strategy", "Financial Projections",
+        "Funding Request", "Appendix",
+    ]
+
+    def sentence(words: int) -> str:
+        text = " ".join(rng.choice(vocabulary) for _ in range(words))
+        return text[0].upper() + text[1:] + "."
+
+    parts = []
+    size = 0
+    block = 0
+    while size < target_bytes:
+        if block % 6 == 0:
+            number = (block // 6) % len(sections)
+            part = f"## {number + 1}. {sections[number]}"
+        elif block % 6 == 1:
+            part = f"**{sentence(3)[:-1]}:** {sentence(rng.randint(12, 30))}"
+        elif block % 6 in (2, 3):
+            bullets = [f"- **{rng.choice(vocabulary).title()}**: {sentence(rng.randint(6, 18))}" for _ in range(rng.randint(4, 12))]
+            part = "\n".join(bullets)
+        elif block % 6 == 4:
+            part = f"### {sentence(3)[:-1]}\n\n" + " ".join(sentence(rng.randint(10, 24)) for _ in range(3))
+        else:
+            part = "\n".join(f"{i}. {sentence(rng.randint(6, 14))}" for i in range(1, rng.randint(3, 7)))
+        parts.append(part)
+        size += len(part.encode("utf-8")) + 2
+        block += 1
+    return "\n\n".join(parts)
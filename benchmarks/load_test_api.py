@@ -0,0 +1,186 @@
+"""
+Load test for the headless HTTP API
+
+Starts api.py under uvicorn on the offline fake backend (or targets a
+running server with --url), then submits plans concurrently and streams each
+one back, measuring time to first byte and total latency:
+
+    python -m benchmarks.load_test_api --requests 500 --concurrency 100
+    python -m benchmarks.load_test_api --url http://127.0.0.1:8000 --export pdf
+
+Client concurrency uses threads; the server handles every connection on one
+event loop, with generation on its job queue.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+from benchmarks.common import environment, sample_form, summarize, write_results
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, concurrency: int) -> subprocess.Popen:
+    """Run api.py under uvicorn with the fake backend and wait until it answers"""
+    env = dict(
+        os.environ,
+        LLM_BACKEND=os.environ.get("LLM_BACKEND", "fake"),
+        CACHE_ENABLED="false",
+        PLAN_STORE_ENABLED=os.environ.get("PLAN_STORE_ENABLED", "false"),
+        JOB_WORKERS=os.environ.get("JOB_WORKERS", str(max(concurrency, 1))),
+        JOB_MAX_PENDING=os.environ.get("JOB_MAX_PENDING", str(max(concurrency * 4, 64))),
+        RATE_LIMIT_REQUESTS_PER_MINUTE=str(10 ** 9),
+        RATE_LIMIT_BURST=str(10 ** 6),
+        MAX_CONCURRENT_REQUESTS=str(max(concurrency, 1)),
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning", "--backlog", str(max(concurrency * 2, 2048))],
+        cwd=REPO_ROOT, env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/healthz", timeout=1).read()
+            return server
+        except (urllib.error.URLError, ConnectionError):
+            if server.poll() is not None:
+                raise RuntimeError("API server exited during startup")
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("API server did not start within 30s")
+
+
+def run_one(base_url: str, index: int, export: Optional[str], timeout: float) -> Dict[str, Any]:
+    """Submit one plan, stream it back and optionally download an export"""
+    started = time.perf_counter()
+    try:
+        body = json.dumps({"form_data": sample_form(index)}).encode("utf-8")
+        request = urllib.request.Request(
+            f"{base_url}/plans", data=body, method="POST", headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            job_id = json.load(response)["id"]
+        submitted = time.perf_counter()
+
+        first_byte_at = None
+        size = 0
+        with urllib.request.urlopen(f"{base_url}/plans/{job_id}/stream", timeout=timeout) as response:
+            while True:
+                chunk = response.read1(65536)
+                if not chunk:
+                    break
+                if first_byte_at is None:
+                    first_byte_at = time.perf_counter()
+                size += len(chunk)
+        streamed = time.perf_counter()
+        with urllib.request.urlopen(f"{base_url}/plans/{job_id}", timeout=timeout) as response:
+            status = json.load(response)["status"]
+        if status != "done":
+            raise RuntimeError(f"job {status}")
+
+        export_seconds = None
+        if export:
+            export_started = time.perf_counter()
+            with urllib.request.urlopen(f"{base_url}/plans/{job_id}/export?format={export}", timeout=timeout) as response:
+                response.read()
+            export_seconds = time.perf_counter() - export_started
+    except urllib.error.HTTPError as e:
+        return {"ok": False, "error": f"HTTP {e.code}", "latency": time.perf_counter() - started}
+    except Exception as e:
+        return {"ok": False, "error": type(e).__name__, "latency": time.perf_counter() - started}
+
+    return {
+        "ok": True,
+        "submit": submitted - started,
+        "ttfb": (first_byte_at or streamed) - started,
+        "latency": streamed - started,
+        "bytes": size,
+        "export": export_seconds,
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load test the plan generation HTTP API.")
+    parser.add_argument("--url", default=None, help="Target a running server instead of starting one")
+    parser.add_argument("--requests", type=int, default=200, help="Total number of plans")
+    parser.add_argument("--concurrency", type=int, default=50, help="Clients submitting and streaming at once")
+    parser.add_argument("--export", choices=("md", "pdf"), default=None, help="Also download this export per plan")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--output", default=None, help="Write results as JSON to this path")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    server = None
+    base_url = args.url
+    if base_url is None:
+        port = _free_port()
+        server = start_server(port, args.concurrency)
+        base_url = f"http://127.0.0.1:{port}"
+
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            outcomes = list(executor.map(
+                lambda index: run_one(base_url, index, args.export, args.timeout),
+                range(1, args.requests + 1),
+            ))
+        elapsed = time.perf_counter() - started
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    succeeded = [o for o in outcomes if o["ok"]]
+    errors: Dict[str, int] = {}
+    for outcome in outcomes:
+        if not outcome["ok"]:
+            errors[outcome["error"]] = errors.get(outcome["error"], 0) + 1
+
+    results = {
+        "benchmark": "api_load",
+        "target": args.url or "local uvicorn (fake backend)",
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "export": args.export,
+        "elapsed_seconds": elapsed,
+        "plans_per_minute": len(succeeded) / elapsed * 60 if elapsed > 0 else 0.0,
+        "submit_seconds": summarize([o["submit"] for o in succeeded]),
+        "ttfb_seconds": summarize([o["ttfb"] for o in succeeded]),
+        "latency_seconds": summarize([o["latency"] for o in succeeded]),
+        "export_seconds": summarize([o["export"] for o in succeeded if o["export"] is not None]),
+        "errors": errors,
+        "environment": environment(),
+    }
+
+    print(f"{args.requests} plans via {results['target']} at concurrency {args.concurrency}")
+    print(f"  throughput: {results['plans_per_minute']:.1f} plans/min ({elapsed:.1f}s)")
+    for label, key in (("submit", "submit_seconds"), ("ttfb", "ttfb_seconds"), ("latency", "latency_seconds"), ("export", "export_seconds")):
+        summary = results[key]
+        if summary["p50"] is not None:
+            print(f"  {label + ':':<11} p50 {summary['p50']:.3f}s  p95 {summary['p95']:.3f}s  p99 {summary['p99']:.3f}s")
+    if errors:
+        print(f"  errors:     {errors}")
+
+    if args.output:
+        write_results(args.output, results)
+    return 0 if not errors else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,407 @@
+"""
+Concurrent-session load test for the Streamlit app
+
+Drives headless sessions of main.py with Streamlit's AppTest on the offline
+fake backend. Each session fills the four form steps field by field, moves
+through them with the Next button, generates a plan, waits for the job and
+reruns once more to build the PDF download. Sessions run on threads in this
+process, as Streamlit runs each browser session's script on its own thread.
+
+Concurrency is raised level by level; every rerun is timed and the level at
+which throughput stops growing (or the rerun p95 exceeds --slo) is reported
+as the saturation point. Memory per session is the traced Python heap
+growth from holding finished sessions, measured before the load levels:
+
+    python -m benchmarks.load_test_app
+    python -m benchmarks.load_test_app --levels 1 4 16 64 --output results/app_load.json
+    python -m benchmarks.load_test_app --compare results/app_load.json
+
+Results carry the commit they ran on (see common.environment), and --compare
+prints the change against an earlier results file. Rerun times include
+AppTest's own parsing of the script output, so compare them across commits
+rather than reading them as browser latency. The memory figure includes
+AppTest's element tree of each session; PDF workers are separate processes
+and are not part of it.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+from benchmarks.common import environment, sample_form, summarize, write_results
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN_SCRIPT = os.path.join(REPO_ROOT, "main.py")
+
+# Widget label of every form field, per wizard step
+STEP_FIELDS = [
+    {
+        "Company Name *": "company_name",
+        "Target Market *": "target_market",
+        "Business/Product Description *": "business_description",
+        "Mission Statement *": "mission",
+    },
+    {
+        "Marketing Strategy *": "marketing_strategy",
+        "Customer Acquisition Methods": "customer_acquisition",
+        "Marketing Channels": "marketing_channels",
+        "Budget Considerations": "budget_considerations",
+    },
+    {
+        "Competitor Overview *": "competitor_overview",
+        "Competitive Advantages *": "competitive_advantages",
+        "Market Positioning": "market_positioning",
+        "Unique Value Proposition": "unique_value_prop",
+    },
+    {
+        "Expected Costs *": "expected_costs",
+        "Financial Strategy *": "financial_strategy",
+        "Projected Sales *": "projected_sales",
+        "Revenue Model": "revenue_model",
+        "Funding Requirements": "funding_requirements",
+    },
+]
+
+# Fewer held sessions than this make the memory figure noisy
+MIN_MEMORY_SESSIONS = 5
+
+# Reruns are grouped by what triggered them
+ACTIONS = ("load", "input", "navigate", "generate", "poll", "download")
+
+
+def share_test_runtime():
+    """
+    Let AppTest sessions run concurrently
+
+    AppTest installs a mock Runtime singleton for each run and clears it when
+    the run ends, so a session finishing would pull the Runtime from under the
+    others. Keep serving the most recent mock while the singleton is cleared.
+    """
+    from streamlit.runtime import Runtime
+
+    latest = [None]
+
+    def instance(cls):
+        if cls._instance is not None:
+            latest[0] = cls._instance
+        if latest[0] is None:
+            raise RuntimeError("Runtime hasn't been created!")
+        return latest[0]
+
+    def exists(cls) -> bool:
+        return cls._instance is not None or latest[0] is not None
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(exists)
+
+
+class SessionFailed(Exception):
+    """Raised when a session does not end up where the wizard should have taken it"""
+
+
+class Session:
+    """One headless browser session walking through the wizard"""
+
+    def __init__(self, index: int, poll_interval: float, generation_timeout: float, rerun_timeout: float):
+        from streamlit.testing.v1 import AppTest
+
+        self.index = index
+        self.form_data = sample_form(index)
+        self.poll_interval = poll_interval
+        self.generation_timeout = generation_timeout
+        self.app = AppTest.from_file(MAIN_SCRIPT, default_timeout=rerun_timeout)
+        self.reruns: Dict[str, List[float]] = {action: [] for action in ACTIONS}
+
+    def run(self):
+        """
+        Complete the wizard once
+
+        Raises:
+            SessionFailed: If a step, the generation or the download did not work
+        """
+        self._rerun("load", self.app.run)
+        for step, fields in enumerate(STEP_FIELDS, start=1):
+            self._expect_step(step)
+            # Every edit reruns the app, so each field is looked up again in the new element tree
+            for label, field in fields.items():
+                self._field(label).input(self.form_data[field])
+                self._rerun("input", self.app.run)
+            next_button = self._button("Next")
+            self._rerun("navigate", next_button.click().run)
+        self._expect_step(5)
+
+        self._rerun("generate", self._button("Generate").click().run)
+        deadline = time.monotonic() + self.generation_timeout
+        while self.app.session_state["generation_job"]:
+            if time.monotonic() > deadline:
+                raise SessionFailed(f"generation did not finish within {self.generation_timeout}s")
+            time.sleep(self.poll_interval)
+            self._rerun("poll", self.app.run)
+        if not self.app.session_state["business_plan"]:
+            errors = [element.value for element in self.app.error]
+            raise SessionFailed(f"no plan generated: {errors}")
+
+        # A download is served from the PDF built while rendering its button
+        self._rerun("download", self.app.run)
+        downloads = [button for button in self.app.get("download_button") if "PDF" in button.label]
+        if not downloads or not downloads[0].proto.url:
+            raise SessionFailed("no PDF download offered")
+
+    def _rerun(self, action: str, run):
+        started = time.perf_counter()
+        run()
+        self.reruns[action].append(time.perf_counter() - started)
+        if self.app.exception:
+            raise SessionFailed(f"{action} raised: {self.app.exception[0].message}")
+
+    def _button(self, label: str):
+        for button in self.app.button:
+            if label in button.label:
+                return button
+        raise SessionFailed(f"no {label!r} button on step {self.app.session_state['current_step']}")
+
+    def _field(self, label: str):
+        for widget in list(self.app.main.text_input) + list(self.app.main.text_area):
+            if widget.label == label:
+                return widget
+        raise SessionFailed(f"no {label!r} field on step {self.app.session_state['current_step']}")
+
+    def _expect_step(self, step: int):
+        if self.app.session_state["current_step"] != step:
+            raise SessionFailed(f"expected step {step}, on step {self.app.session_state['current_step']}")
+
+
+def run_session(index: int, args: argparse.Namespace) -> Dict[str, Any]:
+    """Run one session and return its rerun times, or the reason it failed"""
+    started = time.perf_counter()
+    session = Session(index, args.poll_interval, args.generation_timeout, args.rerun_timeout)
+    try:
+        session.run()
+    except Exception as e:
+        return {"ok": False, "error": f"{type(e).__name__}: {e}", "reruns": session.reruns, "session": session}
+    return {"ok": True, "seconds": time.perf_counter() - started, "reruns": session.reruns, "session": session}
+
+
+def measure_memory(sessions: int, args: argparse.Namespace, first_index: int) -> Dict[str, Any]:
+    """
+    Python heap held per finished session, from tracemalloc
+
+    Sessions run one after another while allocations are traced and are all
+    kept alive; the growth of traced memory divided by their number is what
+    each session costs. Unlike resident size this does not depend on what
+    the allocator happens to return to the OS, so it is comparable across
+    commits.
+    """
+    if sessions <= 0:
+        return {"sessions": 0, "traced_growth_bytes": None, "bytes_per_session": None, "errors": 0}
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        outcomes = [run_session(first_index + i, args) for i in range(sessions)]
+        gc.collect()
+        growth = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    failed = [o["error"] for o in outcomes if not o["ok"]]
+    del outcomes
+    return {
+        "sessions": sessions,
+        "traced_growth_bytes": growth,
+        "bytes_per_session": max(growth, 0) // sessions,
+        "errors": len(failed),
+    }
+
+
+def run_level(concurrency: int, args: argparse.Namespace, first_index: int) -> Dict[str, Any]:
+    """Run ``concurrency`` sessions at once, ``--rounds`` times each, and summarize them"""
+    total = concurrency * args.rounds
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(lambda i: run_session(first_index + i, args), range(total)))
+    elapsed = time.perf_counter() - started
+
+    reruns: Dict[str, List[float]] = {action: [] for action in ACTIONS}
+    errors: Dict[str, int] = {}
+    for outcome in outcomes:
+        for action, times in outcome["reruns"].items():
+            reruns[action].extend(times)
+        if not outcome["ok"]:
+            errors[outcome["error"]] = errors.get(outcome["error"], 0) + 1
+    every_rerun = [t for times in reruns.values() for t in times]
+    completed = sum(1 for outcome in outcomes if outcome["ok"])
+    return {
+        "concurrency": concurrency,
+        "sessions": total,
+        "completed": completed,
+        "elapsed_seconds": elapsed,
+        "sessions_per_minute": completed / elapsed * 60 if elapsed > 0 else 0.0,
+        "reruns_per_second": len(every_rerun) / elapsed if elapsed > 0 else 0.0,
+        "rerun_seconds": summarize(every_rerun),
+        "rerun_seconds_by_action": {action: summarize(times) for action, times in reruns.items()},
+        "session_seconds": summarize([o["seconds"] for o in outcomes if o["ok"]]),
+        "errors": errors,
+    }
+
+
+def find_saturation(levels: List[Dict[str, Any]], slo: float, min_gain: float) -> Dict[str, Any]:
+    """
+    First level at which adding sessions stops paying off
+
+    A level saturates when it has errors, its rerun p95 exceeds the SLO, or its
+    throughput grows less than ``min_gain`` over the previous level.
+
+    Returns:
+        Dictionary with the saturating concurrency and why, plus the highest
+        concurrency served before it; both are None if nothing saturated
+    """
+    previous = None
+    for level in levels:
+        p95 = level["rerun_seconds"]["p95"]
+        reason = None
+        if level["errors"]:
+            reason = "errors"
+        elif p95 is not None and p95 > slo:
+            reason = f"rerun p95 {p95:.3f}s above {slo:.3f}s"
+        elif previous and level["sessions_per_minute"] < previous["sessions_per_minute"] * (1 + min_gain):
+            reason = f"throughput grew less than {min_gain:.0%}"
+        if reason:
+            return {
+                "concurrency": level["concurrency"],
+                "reason": reason,
+                "capacity": previous["concurrency"] if previous else None,
+            }
+        previous = level
+    return {"concurrency": None, "reason": None, "capacity": previous["concurrency"] if previous else None}
+
+
+def print_comparison(results: Dict[str, Any], path: str):
+    """Print the change in the headline figures against an earlier results file"""
+    with open(path, encoding="utf-8") as f:
+        earlier = json.load(f)
+    print(f"\nCompared with {earlier['environment'].get('commit')} ({path}):")
+    earlier_levels = {level["concurrency"]: level for level in earlier.get("levels", [])}
+    for level in results["levels"]:
+        before = earlier_levels.get(level["concurrency"])
+        if not before or before["rerun_seconds"]["p95"] is None or level["rerun_seconds"]["p95"] is None:
+            continue
+        p95_change = level["rerun_seconds"]["p95"] / before["rerun_seconds"]["p95"] - 1
+        throughput_change = (
+            level["sessions_per_minute"] / before["sessions_per_minute"] - 1 if before["sessions_per_minute"] else 0.0
+        )
+        print(f"  {level['concurrency']:>4} sessions: rerun p95 {p95_change:+.0%}  throughput {throughput_change:+.0%}")
+    memory, earlier_memory = results["memory"], earlier.get("memory", {})
+    if memory["bytes_per_session"] and earlier_memory.get("bytes_per_session"):
+        print(f"  memory per session {memory['bytes_per_session'] / earlier_memory['bytes_per_session'] - 1:+.0%}")
+    print(f"  saturation {earlier['saturation']['concurrency']} -> {results['saturation']['concurrency']}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load test the Streamlit app with concurrent headless sessions.")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32],
+                        help="Concurrent sessions per level, in increasing order")
+    parser.add_argument("--rounds", type=int, default=2, help="Wizard runs per concurrent session at each level")
+    parser.add_argument("--memory-sessions", type=int, default=10,
+                        help="Finished sessions held to measure memory per session")
+    parser.add_argument("--slo", type=float, default=1.0, help="Rerun p95 in seconds above which a level is saturated")
+    parser.add_argument("--min-gain", type=float, default=0.1,
+                        help="Throughput growth below which a level is saturated")
+    parser.add_argument("--poll-interval", type=float, default=None,
+                        help="Seconds between job polls (default: JOB_POLL_INTERVAL_SECONDS)")
+    parser.add_argument("--generation-timeout", type=float, default=120.0, help="Longest wait for one plan")
+    parser.add_argument("--rerun-timeout", type=float, default=60.0, help="Longest a single rerun may take")
+    parser.add_argument("--stop-at-saturation", action="store_true", help="Skip the levels after the saturation point")
+    parser.add_argument("--output", default=None, help="Write results as JSON to this path")
+    parser.add_argument("--compare", default=None, help="Earlier results JSON to compare with")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    levels = sorted(set(args.levels))
+
+    # Configuration is read at import time, so it has to be set up first
+    os.environ.setdefault("LLM_BACKEND", "fake")
+    os.environ["CACHE_ENABLED"] = "false"
+    os.environ.setdefault("PLAN_STORE_ENABLED", "false")
+    os.environ.setdefault("JOB_WORKERS", str(max(levels)))
+    os.environ.setdefault("JOB_MAX_PENDING", str(max(levels) * 4))
+    os.environ["RATE_LIMIT_REQUESTS_PER_MINUTE"] = str(10 ** 9)
+    os.environ["RATE_LIMIT_BURST"] = str(10 ** 6)
+    os.environ["MAX_CONCURRENT_REQUESTS"] = str(max(levels))
+    sys.path.insert(0, REPO_ROOT)
+
+    from config import JOB_POLL_INTERVAL_SECONDS, LLM_BACKEND
+
+    share_test_runtime()
+
+    if args.poll_interval is None:
+        args.poll_interval = JOB_POLL_INTERVAL_SECONDS
+
+    print(f"App sessions on '{LLM_BACKEND}', levels {levels}, {args.rounds} rounds, {os.cpu_count()} CPUs")
+    # The first session pays for imports, the PDF pool start and cold caches
+    warm_up = run_session(0, args)
+    if not warm_up["ok"]:
+        print(f"  warm-up session failed: {warm_up['error']}")
+        return 1
+    del warm_up
+
+    next_index = 1
+    memory = measure_memory(args.memory_sessions, args, next_index)
+    next_index += args.memory_sessions
+    if memory["bytes_per_session"] is not None:
+        print(f"  memory: {memory['bytes_per_session'] / 1024 / 1024:.2f} MiB per session "
+              f"({memory['sessions']} sessions held)")
+        if memory["sessions"] < MIN_MEMORY_SESSIONS:
+            print(f"  warning: memory measured on fewer than {MIN_MEMORY_SESSIONS} sessions is noisy")
+
+    results_levels: List[Dict[str, Any]] = []
+    for concurrency in levels:
+        level = run_level(concurrency, args, next_index)
+        next_index += level["sessions"]
+        results_levels.append(level)
+        rerun = level["rerun_seconds"]
+        line = (f"  {concurrency:>4} sessions: {level['sessions_per_minute']:7.1f} sessions/min  "
+                f"{level['reruns_per_second']:6.1f} reruns/s")
+        if rerun["p50"] is not None:
+            line += f"  rerun p50 {rerun['p50']:.3f}s p95 {rerun['p95']:.3f}s p99 {rerun['p99']:.3f}s"
+        if level["errors"]:
+            line += f"  errors {sum(level['errors'].values())}"
+        print(line)
+        if args.stop_at_saturation and find_saturation(results_levels, args.slo, args.min_gain)["concurrency"]:
+            break
+    gc.collect()
+
+    saturation = find_saturation(results_levels, args.slo, args.min_gain)
+    if saturation["concurrency"] is None:
+        print(f"  no saturation up to {levels[-1]} sessions")
+    else:
+        print(f"  saturates at {saturation['concurrency']} sessions ({saturation['reason']}); "
+              f"served up to {saturation['capacity']}")
+
+    results = {
+        "benchmark": "app_load",
+        "backend": LLM_BACKEND,
+        "rounds": args.rounds,
+        "poll_interval_seconds": args.poll_interval,
+        "slo_seconds": args.slo,
+        "min_gain": args.min_gain,
+        "memory": memory,
+        "levels": results_levels,
+        "saturation": saturation,
+        "environment": environment(),
+    }
+    if args.output:
+        write_results(args.output, results)
+    if args.compare:
+        print_comparison(results, args.compare)
+    errors = memory["errors"] + sum(sum(level["errors"].values()) for level in results_levels)
+    return 0 if not errors else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
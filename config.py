@@ -12,6 +12,138 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GEMINI_MODEL = "gemini-2.5-flash"
 MAX_RETRIES = 3
 REQUEST_TIMEOUT = 60
+CLIENT_POOL_IDLE_SECONDS = 15 * 60
+CLIENT_POOL_MAX_SIZE = 64
+
+# Rate Limiting and Resilience Configuration
+RATE_LIMIT_REQUESTS_PER_MINUTE = int(os.getenv("RATE_LIMIT_REQUESTS_PER_MINUTE", "30"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "10"))
+RATE_LIMIT_MAX_WAIT_SECONDS = 30
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "16"))
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 30.0
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_SECONDS = 30
+
+# LLM Backend Configuration
+# "gemini" calls the live API; "fake" is a deterministic offline backend for
+# load tests and benchmarks. LLM_CASSETTE_MODE ("record" or "replay") wraps
+# either backend to save responses to, or serve them from, LLM_CASSETTE_PATH.
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+LLM_CASSETTE_MODE = os.getenv("LLM_CASSETTE_MODE", "")
+LLM_CASSETTE_PATH = os.getenv("LLM_CASSETTE_PATH", os.path.join("cassettes", "gemini.json"))
+
+# Fake Backend Configuration
+FAKE_LATENCY_DISTRIBUTION = os.getenv("FAKE_LATENCY_DISTRIBUTION", "lognormal")
+FAKE_LATENCY_MEAN_SECONDS = float(os.getenv("FAKE_LATENCY_MEAN_SECONDS", "0.8"))
+FAKE_LATENCY_STDDEV_SECONDS = float(os.getenv("FAKE_LATENCY_STDDEV_SECONDS", "0.3"))
+FAKE_TOKENS_PER_SECOND = float(os.getenv("FAKE_TOKENS_PER_SECOND", "250"))
+FAKE_OUTPUT_TOKENS = int(os.getenv("FAKE_OUTPUT_TOKENS", "1500"))
+FAKE_FAILURE_RATE = float(os.getenv("FAKE_FAILURE_RATE", "0.0"))
+FAKE_RATE_LIMIT_RATE = float(os.getenv("FAKE_RATE_LIMIT_RATE", "0.0"))
+FAKE_SEED = int(os.getenv("FAKE_SEED", "1234"))
+
+# Generation Configuration
+GENERATION_TEMPERATURE = 0.7
+MAX_OUTPUT_TOKENS = 4000
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "true").lower() == "true"
+
+# Token Budget Configuration
+# Form fields are compacted locally (boilerplate stripping, cross-field
+# deduplication, extractive summarization) when they exceed these estimated
+# token limits. The output limit is MAX_OUTPUT_TOKENS for any compacted
+# prompt; it only drops when MODEL_CONTEXT_TOKENS is set smaller than
+# PROMPT_TOKEN_BUDGET plus MAX_OUTPUT_TOKENS.
+FIELD_TOKEN_LIMIT = int(os.getenv("FIELD_TOKEN_LIMIT", "400"))
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "3000"))
+MODEL_CONTEXT_TOKENS = int(os.getenv("MODEL_CONTEXT_TOKENS", "1048576"))
+
+# Response Cache Configuration
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+CACHE_MEMORY_SIZE = 128
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", os.path.join(".cache", "responses.sqlite3"))
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", str(7 * 24 * 60 * 60)))
+CACHE_MAX_DISK_BYTES = 50 * 1024 * 1024
+
+# Single-Flight Configuration
+# Identical requests that arrive while one is being generated wait for it and
+# share its result (or error) instead of calling the model again.
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+SINGLE_FLIGHT_WAIT_SECONDS = 300
+
+# Plan Store Configuration
+# Generated plans and their form data are kept in a SQLite file for history,
+# re-download and audit. Searching every stored plan from the app is only
+# suitable for single-tenant deployments, so it is off by default.
+PLAN_STORE_ENABLED = os.getenv("PLAN_STORE_ENABLED", "true").lower() == "true"
+PLAN_STORE_PATH = os.getenv("PLAN_STORE_PATH", os.path.join(".cache", "plans.sqlite3"))
+PLAN_STORE_SEARCH_IN_APP = os.getenv("PLAN_STORE_SEARCH_IN_APP", "false").lower() == "true"
+
+# Near-Duplicate Configuration
+# A MinHash/LSH index over the form text of stored plans finds earlier
+# submissions that closely match the current form, so the app can offer the
+# saved plan before generating a new one. Offering other users' plans is only
+# suitable for single-tenant deployments, so the app shows matches only when
+# PLAN_STORE_SEARCH_IN_APP is enabled.
+NEAR_DUPLICATE_ENABLED = os.getenv("NEAR_DUPLICATE_ENABLED", "true").lower() == "true"
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.8"))
+NEAR_DUPLICATE_PERMUTATIONS = 64
+NEAR_DUPLICATE_BANDS = 16
+NEAR_DUPLICATE_SHINGLE_WORDS = 3
+NEAR_DUPLICATE_MAX_CANDIDATES = 128
+
+# Background Job Configuration
+# Generation runs on a process-wide worker pool; the page polls job status
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "8"))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "64"))
+JOB_RETENTION_SECONDS = 10 * 60
+JOB_POLL_INTERVAL_SECONDS = 0.5
+
+# HTTP API Configuration
+# api.py serves plan generation and export to other services over ASGI
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+API_MAX_BODY_BYTES = 1024 * 1024
+API_STREAM_POLL_SECONDS = 0.05
+API_EXPORT_CACHE_SIZE = 32
+
+# Session State Configuration
+# STATE_BACKEND mirrors each session's form data, step and plan into a store
+# keyed by a session ID in the URL, so any replica can serve the session and
+# restarts keep in-progress wizards: "memory", "sqlite", "file" or "" (off).
+STATE_BACKEND = os.getenv("STATE_BACKEND", "").lower()
+STATE_DB_PATH = os.getenv("STATE_DB_PATH", os.path.join(".cache", "sessions.sqlite3"))
+STATE_DIR = os.getenv("STATE_DIR", os.path.join(".cache", "sessions"))
+STATE_TTL_SECONDS = int(os.getenv("STATE_TTL_SECONDS", str(7 * 24 * 60 * 60)))
+STATE_MEMORY_MAX_SESSIONS = 10000
+
+# PDF Render Pool Configuration
+# PDFs are rendered in worker processes that load ReportLab, the stylesheet
+# and fonts once at startup, so rendering never holds the app's GIL.
+# PDF_POOL_WORKERS=0 renders in the calling thread instead.
+PDF_POOL_WORKERS = int(os.getenv("PDF_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_POOL_MAX_PENDING = int(os.getenv("PDF_POOL_MAX_PENDING", "32"))
+PDF_RENDER_TIMEOUT_SECONDS = int(os.getenv("PDF_RENDER_TIMEOUT_SECONDS", "60"))
+
+# PDF Profile Configuration
+# "draft" favours render latency (uncompressed pages, lightweight bullet
+# lists) for downloads offered while the plan is on screen; "archive" favours
+# file size (compressed pages) for plans exported, stored or emailed.
+PDF_PROFILES = {
+    "draft": {"page_compression": False, "simple_lists": True},
+    "archive": {"page_compression": True, "simple_lists": False},
+}
+PDF_APP_PROFILE = os.getenv("PDF_APP_PROFILE", "draft")
+PDF_EXPORT_PROFILE = os.getenv("PDF_EXPORT_PROFILE", "archive")
+
+# Metrics Configuration
+# Per-stage latency histograms and counters. METRICS_EXPORT is "prometheus"
+# (text format on http://METRICS_HOST:METRICS_PORT/metrics), "json" (a
+# structured log line every METRICS_LOG_INTERVAL_SECONDS) or "" (collect only).
+METRICS_EXPORT = os.getenv("METRICS_EXPORT", "").lower()
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
+METRICS_LOG_INTERVAL_SECONDS = int(os.getenv("METRICS_LOG_INTERVAL_SECONDS", "60"))
 
 # Application Configuration
 APP_TITLE = "AI Business Plan Generator"
@@ -26,10 +158,7 @@ REQUIRED_FIELDS = {
 }
 
 # AI Prompt Templates
-BUSINESS_PLAN_PROMPT = """
-You are an expert business consultant. Generate a comprehensive business plan based on the following information:
-
-COMPANY OVERVIEW:
+BUSINESS_CONTEXT_TEMPLATE = """COMPANY OVERVIEW:
 - Company Name: {company_name}
 - Business Description: {business_description}
 - Mission Statement: {mission}
@@ -54,7 +183,12 @@ FINANCIAL OVERVIEW:
 - Revenue Model: {revenue_model}
 - Funding Requirements: {funding_requirements}
 
-Please generate a professional business plan with the following structure:
+"""
+
+BUSINESS_PLAN_PROMPT = """
+You are an expert business consultant. Generate a comprehensive business plan based on the following information:
+
+""" + BUSINESS_CONTEXT_TEMPLATE + """Please generate a professional business plan with the following structure:
 1. Executive Summary
 2. Company Description
 3. Market Analysis
@@ -68,6 +202,71 @@ Please generate a professional business plan with the following structure:
 Make the plan detailed, professional, and actionable. Use clear headings and bullet points for easy reading.
 """
 
+# Sectioned Generation Configuration
+# "single" asks for the whole plan in one call; "sections" generates each
+# section concurrently from its own prompt and assembles them in order.
+GENERATION_MODE = os.getenv("GENERATION_MODE", "single")
+SECTION_MAX_WORKERS = 4
+SECTION_MAX_OUTPUT_TOKENS = 2000
+EXECUTIVE_SUMMARY_SECTION = "Executive Summary"
+
+# Plan sections in canonical order, with what each one should cover
+PLAN_SECTIONS = {
+    "Executive Summary": "A concise overview of the business, its market opportunity, competitive edge, financial outlook and funding ask.",
+    "Company Description": "What the company does, its mission, the problem it solves and the customers it serves.",
+    "Market Analysis": "Target market size and segments, customer needs, industry trends and the competitive landscape.",
+    "Organization & Management": "Legal structure, key roles, the team needed to execute the plan and hiring priorities.",
+    "Service or Product Line": "The products or services offered, their benefits, lifecycle and any intellectual property.",
+    "Marketing & Sales Strategy": "Positioning, acquisition channels, pricing, sales process and marketing budget allocation.",
+    "Financial Projections": "Cost structure, revenue model, sales projections, break-even analysis and key financial assumptions.",
+    "Funding Request": "How much funding is needed, how it will be used and over what timeframe. If no funding is required, say so briefly.",
+    "Appendix": "Supporting assumptions, glossary of terms and any additional notes referenced in the plan.",
+}
+
+# Plan sections that depend on each form field. Editing a field only
+# regenerates these sections, plus the Executive Summary whenever any other
+# section changes. Fields missing from this map affect every section.
+SECTION_DEPENDENCIES = {
+    "company_name": list(PLAN_SECTIONS),
+    "business_description": ["Company Description", "Market Analysis", "Organization & Management", "Service or Product Line"],
+    "mission": ["Company Description", "Organization & Management"],
+    "target_market": ["Company Description", "Market Analysis", "Marketing & Sales Strategy", "Financial Projections"],
+    "marketing_strategy": ["Marketing & Sales Strategy"],
+    "customer_acquisition": ["Marketing & Sales Strategy", "Financial Projections"],
+    "marketing_channels": ["Marketing & Sales Strategy"],
+    "budget_considerations": ["Marketing & Sales Strategy", "Financial Projections"],
+    "competitor_overview": ["Market Analysis", "Service or Product Line"],
+    "competitive_advantages": ["Market Analysis", "Service or Product Line", "Marketing & Sales Strategy"],
+    "market_positioning": ["Market Analysis", "Marketing & Sales Strategy"],
+    "unique_value_prop": ["Company Description", "Service or Product Line", "Marketing & Sales Strategy"],
+    "expected_costs": ["Organization & Management", "Financial Projections", "Funding Request", "Appendix"],
+    "financial_strategy": ["Financial Projections", "Funding Request", "Appendix"],
+    "projected_sales": ["Financial Projections", "Funding Request", "Appendix"],
+    "revenue_model": ["Service or Product Line", "Financial Projections", "Appendix"],
+    "funding_requirements": ["Financial Projections", "Funding Request"],
+}
+
+SECTION_PROMPT = """
+You are an expert business consultant writing one section of a business plan based on the following information:
+
+""" + BUSINESS_CONTEXT_TEMPLATE + """
+Write only the "{section_title}" section of the business plan. {section_guidance}
+
+Do not repeat the section title as a heading and do not write any other sections.
+Make the section detailed, professional, and actionable. Use clear sub-headings and bullet points for easy reading.
+"""
+
+EXECUTIVE_SUMMARY_PROMPT = """
+You are an expert business consultant. Write the Executive Summary of a business plan for {company_name}.
+
+The rest of the plan has already been written:
+
+{plan_sections}
+
+Summarize the plan above in a concise, compelling Executive Summary for investors. {section_guidance}
+Do not repeat the section title as a heading. Use short paragraphs and bullet points.
+"""
+
 # Error Messages
 ERROR_MESSAGES = {
     "api_key_missing": "Please set your GEMINI_API_KEY in the environment variables",
@@ -3,14 +3,13 @@ AI Business Plan Generator - Main Entry Point
 """
 import streamlit as st
 from config import APP_TITLE
-from app.session import initialize_session_state
+from app.session import initialize_session_state, save_session_state
 from app.header import render_header
 from app.sidebar import render_sidebar
 from app.company_overview import render_company_overview
 from app.marketing_details import render_marketing_details
 from app.competitor_info import render_competitor_info
 from app.financial_overview import render_financial_overview
-from app.generate_section import render_generate_section
 from app.navigation import render_navigation_buttons
 
 # Page configuration
@@ -42,6 +41,9 @@ def main():
     elif st.session_state.current_step == 4:
         render_financial_overview()
     elif st.session_state.current_step == 5:
+        # The generate step pulls in the LLM client, job queue and plan store;
+        # importing it only here keeps cold starts and steps 1-4 light
+        from app.generate_section import render_generate_section
         render_generate_section()
     
     # Render navigation buttons
@@ -54,6 +56,9 @@ def main():
         "**AI Business Plan Generator** | Powered by Google Gemini AI | "
         "For support, please check the documentation or contact support."
     )
+    
+    # Persist the session once per rerun, so other replicas can resume it
+    save_session_state()
 
 if __name__ == "__main__":
     main()
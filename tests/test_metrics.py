@@ -0,0 +1,14 @@
+"""
+Tests for the Prometheus text exposition of metrics
+"""
+from utils.metrics import _format_labels
+
+
+def test_label_values_are_escaped():
+    formatted = _format_labels((("error_class", 'Bad "quote" \\ path\nnext'),))
+
+    assert formatted == '{error_class="Bad \\"quote\\" \\\\ path\\nnext"}'
+
+
+def test_extra_label_is_appended():
+    assert _format_labels((("stage", "pdf"),), ("le", "0.5")) == '{stage="pdf",le="0.5"}'
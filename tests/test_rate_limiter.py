@@ -0,0 +1,16 @@
+"""
+Tests for retry classification of generation errors
+"""
+from utils.llm_backend import CassetteMissError
+from utils.rate_limiter import classify_error
+
+
+def test_cassette_miss_is_not_retried():
+    classification = classify_error(CassetteMissError("No recorded response"))
+
+    assert not classification.retryable
+    assert classification.kind == "CassetteMissError"
+
+
+def test_connection_errors_are_retried():
+    assert classify_error(ConnectionError("reset")).retryable
@@ -0,0 +1,47 @@
+"""
+Tests for the response cache disk tier's size accounting and eviction
+"""
+from utils.response_cache import ResponseCache
+
+
+def _disk_rows(cache):
+    return dict(cache._conn.execute("SELECT key, size FROM responses").fetchall())
+
+
+def test_byte_total_tracks_inserts_replaces_and_clear(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"), max_disk_bytes=1000)
+
+    cache.set("a", "x" * 100)
+    cache.set("b", "x" * 50)
+    cache.set("a", "x" * 10)
+    assert cache._disk_bytes == 60 == sum(_disk_rows(cache).values())
+
+    cache.clear()
+    assert cache._disk_bytes == 0
+
+
+def test_byte_total_is_seeded_when_reopened(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    ResponseCache(path).set("a", "x" * 42)
+
+    assert ResponseCache(path)._disk_bytes == 42
+
+
+def test_least_recently_used_rows_are_evicted_over_the_limit(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"), memory_size=0, max_disk_bytes=250)
+    for key in "abc":
+        cache.set(key, "x" * 100)
+
+    assert set(_disk_rows(cache)) == {"b", "c"}
+    assert cache._disk_bytes == 200
+
+
+def test_expired_rows_are_dropped_on_write(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"), ttl_seconds=60)
+    cache.set("old", "x" * 100)
+    cache._conn.execute("UPDATE responses SET created_at = created_at - 3600")
+
+    cache.set("new", "x" * 10)
+
+    assert set(_disk_rows(cache)) == {"new"}
+    assert cache._disk_bytes == 10
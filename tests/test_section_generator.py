@@ -0,0 +1,40 @@
+"""
+Tests for splitting single-call plans into reusable sections
+"""
+from config import BUSINESS_PLAN_PROMPT, PLAN_SECTIONS
+from utils.section_generator import reusable_sections, split_plan_sections
+
+
+def _prompt_headings():
+    """Section headings exactly as BUSINESS_PLAN_PROMPT asks for them"""
+    return [line for line in BUSINESS_PLAN_PROMPT.splitlines() if line[:1].isdigit() and ". " in line]
+
+
+def _plan(headings):
+    return "\n\n".join(f"## {heading}\n\nText of {heading}." for heading in headings)
+
+
+def test_split_recognises_every_prompt_heading():
+    sections = split_plan_sections(_plan(_prompt_headings()))
+
+    assert list(sections) == list(PLAN_SECTIONS)
+    assert sections["Funding Request"] == "Text of 8. Funding Request (if applicable)."
+    assert "Funding" not in sections["Financial Projections"]
+
+
+def test_section_containing_unknown_numbered_heading_is_not_kept():
+    headings = _prompt_headings()
+    headings.insert(7, "7b. Unit Economics")
+    sections = split_plan_sections(_plan(headings).replace("## 7b.", "## 8."))
+
+    assert "Financial Projections" not in sections
+    assert "Funding Request" in sections
+
+
+def test_editing_mission_does_not_duplicate_funding_request():
+    form_data = {"mission": "Old mission", "funding_requirements": "$50k"}
+    previous = {"form_data": form_data, "sections": split_plan_sections(_plan(_prompt_headings()))}
+
+    kept = reusable_sections(previous, dict(form_data, mission="New mission"))
+
+    assert all("Funding" not in text for title, text in kept.items() if title != "Funding Request")
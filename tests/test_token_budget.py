@@ -0,0 +1,42 @@
+"""
+Tests for local prompt compaction
+"""
+import pytest
+from config import MAX_OUTPUT_TOKENS, MODEL_CONTEXT_TOKENS
+from utils.token_budget import compact_fields, output_token_budget
+
+
+@pytest.mark.parametrize("value", [
+    "Hi-tech manufacturers in Germany",
+    "Hello Fresh, Blue Apron",
+    "Dear Kitchen and Bath Co",
+    "Cheers Brewing and local pubs",
+    "Thanks to our partners we reach 40 stores",
+])
+def test_business_text_starting_with_greeting_words_is_kept(value):
+    compacted, _ = compact_fields({"competitor_overview": value})
+
+    assert compacted["competitor_overview"] == value
+
+
+def test_greeting_words_kept_on_every_line_of_a_multi_line_value():
+    value = "Hello Fresh, Blue Apron\nDear Kitchen and Bath Co\nCheers Brewing and local pubs"
+    compacted, _ = compact_fields({"competitor_overview": value})
+
+    assert compacted["competitor_overview"] == value
+
+
+def test_letter_salutation_and_sign_off_are_dropped():
+    value = "Hi team,\nWe sell meal kits to busy parents.\n---\nThanks!"
+    compacted, _ = compact_fields({"business_description": value})
+
+    assert compacted["business_description"] == "We sell meal kits to busy parents."
+
+
+def test_typical_prompt_gets_the_full_output_limit():
+    assert output_token_budget(446) == MAX_OUTPUT_TOKENS
+    assert output_token_budget(10) == MAX_OUTPUT_TOKENS
+
+
+def test_output_limit_shrinks_only_near_the_context_window():
+    assert output_token_budget(MODEL_CONTEXT_TOKENS - 1000) == 1000
@@ -1,29 +1,65 @@
 """
 Gemini API client for generating business plans
+
+Sync methods serve the Streamlit app and worker threads; the ``a``-prefixed
+async methods share the same prompt preparation, caching, coalescing, rate
+limits and retries for callers running many generations on one event loop.
 """
-import google.generativeai as genai
-from typing import Dict, Any, Optional
+from typing import Dict, Any, AsyncIterator, Iterator, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import logging
 import time
-import streamlit as st
-from config import GEMINI_API_KEY, GEMINI_MODEL, MAX_RETRIES, REQUEST_TIMEOUT, ERROR_MESSAGES
+from config import (
+    GEMINI_API_KEY,
+    MAX_RETRIES,
+    REQUEST_TIMEOUT,
+    ERROR_MESSAGES,
+    GENERATION_TEMPERATURE,
+    MAX_OUTPUT_TOKENS,
+)
+from utils.client_pool import key_fingerprint
+from utils.llm_backend import backend_requires_api_key, create_backend
+from utils.metrics import get_metrics
+from utils.rate_limiter import Backoff, CircuitOpenError, classify_error, get_circuit_breaker, get_rate_limiter
+from utils.response_cache import get_response_cache
+from utils.single_flight import get_single_flight
+from utils.token_budget import compact_fields, estimate_tokens, output_token_budget
+
+logger = logging.getLogger(__name__)
 
 class GeminiAPIClient:
     """Client for interacting with Google Gemini API"""
     
     def __init__(self, api_key: Optional[str] = None):
         key_to_use = api_key or GEMINI_API_KEY
-        if not key_to_use:
+        if not key_to_use and backend_requires_api_key():
             raise ValueError(ERROR_MESSAGES["api_key_missing"])
         
-        genai.configure(api_key=key_to_use)
-        self.model = genai.GenerativeModel(GEMINI_MODEL)
+        # Gemini model handles are pooled per key, so construction is cheap and
+        # never touches the process-global key used by genai.configure
+        self.backend = create_backend(key_to_use)
+        self.key_id = key_fingerprint(key_to_use or "")
+        self.rate_limiter = get_rate_limiter()
+        self.circuit_breaker = get_circuit_breaker()
+        self.generation_config = {
+            "temperature": GENERATION_TEMPERATURE,
+            "max_output_tokens": MAX_OUTPUT_TOKENS,
+        }
+        self.cache = get_response_cache()
+        self.single_flight = get_single_flight()
+        self.metrics = get_metrics()
+        self.last_timing: Dict[str, Any] = {}
     
-    def generate_business_plan(self, form_data: Dict[str, Any]) -> str:
+    def generate_business_plan(self, form_data: Dict[str, Any], raise_errors: bool = False) -> str:
         """
         Generate a business plan using the provided form data
         
         Args:
             form_data: Dictionary containing all form inputs
+            raise_errors: Raise failures instead of reporting them with st.error,
+                for callers running outside Streamlit
             
         Returns:
             Generated business plan as string
@@ -31,55 +67,501 @@ class GeminiAPIClient:
         try:
             # Prepare the prompt with form data
             prompt = self._prepare_prompt(form_data)
-            
-            # Generate content with retry logic
-            for attempt in range(MAX_RETRIES):
-                try:
-                    response = self.model.generate_content(
-                        prompt,
-                        generation_config=genai.types.GenerationConfig(
-                            temperature=0.7,
-                            max_output_tokens=4000,
-                        )
-                    )
-                    
-                    if response.text:
-                        return response.text
-                    else:
-                        raise Exception("Empty response from API")
-                        
-                except Exception as e:
-                    if attempt == MAX_RETRIES - 1:
-                        raise e
-                    time.sleep(2 ** attempt)  # Exponential backoff
+            return self.generate_text(prompt, max_output_tokens=output_token_budget(estimate_tokens(prompt)))
             
         except Exception as e:
+            if raise_errors:
+                raise
+            import streamlit as st
             st.error(f"{ERROR_MESSAGES['api_error']}: {str(e)}")
             return None
     
+    def generate_text(self, prompt: str, max_output_tokens: Optional[int] = None) -> str:
+        """
+        Generate text for an already prepared prompt, with caching and retries
+        
+        Args:
+            prompt: Complete prompt to send to the model
+            max_output_tokens: Optional override of the configured output limit
+            
+        Returns:
+            Generated text
+            
+        Raises:
+            Exception: If generation fails after all retries
+        """
+        generation_config = self._generation_config(max_output_tokens)
+        started = time.perf_counter()
+        
+        # Serve identical requests from the cache
+        cache_key, cached = self._lookup_cache(prompt, generation_config, started)
+        if cached is not None:
+            return cached
+        
+        # Wait for an identical request that is already running rather than repeating it
+        if self.single_flight is None:
+            return self._generate_upstream(prompt, generation_config, started, cache_key)
+        text, shared = self.single_flight.do(
+            self._flight_key("text", cache_key),
+            lambda: self._generate_upstream(prompt, generation_config, started, cache_key),
+        )
+        if shared:
+            finished = time.perf_counter()
+            self._record_timing(started, finished, cached=False, coalesced=True, usage=self._usage(prompt, text, generation_config))
+        return text
+    
+    def _generate_upstream(self, prompt: str, generation_config: Dict[str, Any], started: float, cache_key: str) -> str:
+        """Call the backend with retry logic and cache the response"""
+        backoff = Backoff()
+        for attempt in range(MAX_RETRIES):
+            try:
+                self.circuit_breaker.before_call()
+                with self.rate_limiter.slot(self.key_id):
+                    text = self.backend.generate(prompt, generation_config)
+                
+                if text:
+                    # Without streaming the first token arrives with the full response
+                    finished = time.perf_counter()
+                    self.circuit_breaker.record_success()
+                    self._record_timing(started, finished, cached=False, usage=self._usage(prompt, text, generation_config))
+                    if self.cache is not None:
+                        self.cache.set(cache_key, text)
+                    return text
+                else:
+                    raise Exception("Empty response from API")
+                    
+            except Exception as e:
+                self._handle_failure(e, attempt, backoff)
+    
+    def generate_business_plan_stream(self, form_data: Dict[str, Any]) -> Iterator[str]:
+        """
+        Generate a business plan, yielding text chunks as they arrive
+        
+        Args:
+            form_data: Dictionary containing all form inputs
+            
+        Yields:
+            Chunks of the generated business plan, in order
+            
+        Raises:
+            Exception: If generation fails after all retries. Failures after
+                the first chunk has been yielded are raised immediately, since
+                a retry would repeat text the caller has already rendered.
+        """
+        prompt = self._prepare_prompt(form_data)
+        started = time.perf_counter()
+        generation_config = self._generation_config(output_token_budget(estimate_tokens(prompt)))
+        
+        cache_key, cached = self._lookup_cache(prompt, generation_config, started)
+        if cached is not None:
+            yield cached
+            return
+        
+        if self.single_flight is None:
+            yield from self._stream_upstream(prompt, generation_config, started, cache_key)
+            return
+        
+        # Duplicates of a running stream replay its chunks from the start
+        chunks, shared = self.single_flight.stream(
+            self._flight_key("stream", cache_key),
+            lambda: self._stream_upstream(prompt, generation_config, started, cache_key),
+        )
+        if not shared:
+            yield from chunks
+            return
+        received = []
+        first_chunk_at = None
+        for text in chunks:
+            if first_chunk_at is None:
+                first_chunk_at = time.perf_counter()
+            received.append(text)
+            yield text
+        self._record_timing(
+            started, first_chunk_at, cached=False, coalesced=True, chunks=len(received),
+            usage=self._usage(prompt, "".join(received), generation_config),
+        )
+    
+    def _stream_upstream(self, prompt: str, generation_config: Dict[str, Any], started: float, cache_key: str) -> Iterator[str]:
+        """Stream from the backend with retry logic and cache the full response"""
+        backoff = Backoff()
+        for attempt in range(MAX_RETRIES):
+            chunks = []
+            first_chunk_at = None
+            try:
+                self.circuit_breaker.before_call()
+                with self.rate_limiter.slot(self.key_id):
+                    for text in self.backend.stream(prompt, generation_config):
+                        if first_chunk_at is None:
+                            first_chunk_at = time.perf_counter()
+                        chunks.append(text)
+                        yield text
+                
+                if not chunks:
+                    raise Exception("Empty response from API")
+                
+                self.circuit_breaker.record_success()
+                text = "".join(chunks)
+                self._record_timing(
+                    started, first_chunk_at, cached=False, chunks=len(chunks),
+                    usage=self._usage(prompt, text, generation_config),
+                )
+                if self.cache is not None:
+                    self.cache.set(cache_key, text)
+                return
+                
+            except GeneratorExit:
+                # The consumer stopped reading early, e.g. a cancelled job
+                self.circuit_breaker.release()
+                raise
+            except Exception as e:
+                if chunks:
+                    self.circuit_breaker.release()
+                    raise
+                self._handle_failure(e, attempt, backoff)
+    
+    async def agenerate_business_plan(self, form_data: Dict[str, Any]) -> str:
+        """
+        Async variant of generate_business_plan
+        
+        Never reports to Streamlit; failures are raised to the caller.
+        
+        Args:
+            form_data: Dictionary containing all form inputs
+            
+        Returns:
+            Generated business plan as string
+            
+        Raises:
+            Exception: If generation fails after all retries
+        """
+        prompt = self._prepare_prompt(form_data)
+        return await self.agenerate_text(prompt, max_output_tokens=output_token_budget(estimate_tokens(prompt)))
+    
+    async def agenerate_text(self, prompt: str, max_output_tokens: Optional[int] = None) -> str:
+        """
+        Async variant of generate_text
+        
+        Args:
+            prompt: Complete prompt to send to the model
+            max_output_tokens: Optional override of the configured output limit
+            
+        Returns:
+            Generated text
+            
+        Raises:
+            Exception: If generation fails after all retries
+        """
+        generation_config = self._generation_config(max_output_tokens)
+        started = time.perf_counter()
+        
+        cache_key, cached = self._lookup_cache(prompt, generation_config, started)
+        if cached is not None:
+            return cached
+        
+        if self.single_flight is None:
+            return await self._agenerate_upstream(prompt, generation_config, started, cache_key)
+        text, shared = await self.single_flight.ado(
+            self._flight_key("text", cache_key),
+            lambda: self._agenerate_upstream(prompt, generation_config, started, cache_key),
+        )
+        if shared:
+            finished = time.perf_counter()
+            self._record_timing(started, finished, cached=False, coalesced=True, usage=self._usage(prompt, text, generation_config))
+        return text
+    
+    async def _agenerate_upstream(self, prompt: str, generation_config: Dict[str, Any], started: float, cache_key: str) -> str:
+        """Async variant of _generate_upstream"""
+        backoff = Backoff()
+        for attempt in range(MAX_RETRIES):
+            try:
+                self.circuit_breaker.before_call()
+                async with self.rate_limiter.aslot(self.key_id):
+                    text = await self.backend.agenerate(prompt, generation_config)
+                
+                if text:
+                    finished = time.perf_counter()
+                    self.circuit_breaker.record_success()
+                    self._record_timing(started, finished, cached=False, usage=self._usage(prompt, text, generation_config))
+                    if self.cache is not None:
+                        self.cache.set(cache_key, text)
+                    return text
+                else:
+                    raise Exception("Empty response from API")
+                    
+            except asyncio.CancelledError:
+                self.circuit_breaker.release()
+                raise
+            except Exception as e:
+                await self._ahandle_failure(e, attempt, backoff)
+    
+    async def agenerate_business_plan_stream(self, form_data: Dict[str, Any]) -> AsyncIterator[str]:
+        """
+        Async variant of generate_business_plan_stream
+        
+        Args:
+            form_data: Dictionary containing all form inputs
+            
+        Yields:
+            Chunks of the generated business plan, in order
+            
+        Raises:
+            Exception: If generation fails after all retries, or immediately
+                once a chunk has been yielded
+        """
+        prompt = self._prepare_prompt(form_data)
+        started = time.perf_counter()
+        generation_config = self._generation_config(output_token_budget(estimate_tokens(prompt)))
+        
+        cache_key, cached = self._lookup_cache(prompt, generation_config, started)
+        if cached is not None:
+            yield cached
+            return
+        
+        if self.single_flight is None:
+            async for text in self._astream_upstream(prompt, generation_config, started, cache_key):
+                yield text
+            return
+        
+        chunks, shared = self.single_flight.astream(
+            self._flight_key("stream", cache_key),
+            lambda: self._astream_upstream(prompt, generation_config, started, cache_key),
+        )
+        received = []
+        first_chunk_at = None
+        try:
+            async for text in chunks:
+                if first_chunk_at is None:
+                    first_chunk_at = time.perf_counter()
+                received.append(text)
+                yield text
+        finally:
+            # Async generators are not closed when the loop over them stops
+            await chunks.aclose()
+        if shared:
+            self._record_timing(
+                started, first_chunk_at, cached=False, coalesced=True, chunks=len(received),
+                usage=self._usage(prompt, "".join(received), generation_config),
+            )
+    
+    async def _astream_upstream(self, prompt: str, generation_config: Dict[str, Any], started: float, cache_key: str) -> AsyncIterator[str]:
+        """Async variant of _stream_upstream"""
+        backoff = Backoff()
+        for attempt in range(MAX_RETRIES):
+            chunks = []
+            first_chunk_at = None
+            try:
+                self.circuit_breaker.before_call()
+                async with self.rate_limiter.aslot(self.key_id):
+                    stream = self.backend.astream(prompt, generation_config)
+                    try:
+                        async for text in stream:
+                            if first_chunk_at is None:
+                                first_chunk_at = time.perf_counter()
+                            chunks.append(text)
+                            yield text
+                    finally:
+                        await stream.aclose()
+                
+                if not chunks:
+                    raise Exception("Empty response from API")
+                
+                self.circuit_breaker.record_success()
+                text = "".join(chunks)
+                self._record_timing(
+                    started, first_chunk_at, cached=False, chunks=len(chunks),
+                    usage=self._usage(prompt, text, generation_config),
+                )
+                if self.cache is not None:
+                    self.cache.set(cache_key, text)
+                return
+                
+            except (GeneratorExit, asyncio.CancelledError):
+                self.circuit_breaker.release()
+                raise
+            except Exception as e:
+                if chunks:
+                    self.circuit_breaker.release()
+                    raise
+                await self._ahandle_failure(e, attempt, backoff)
+    
+    def _handle_failure(self, error: Exception, attempt: int, backoff: Backoff):
+        """
+        Decide whether a failed attempt is retried, sleeping before the retry
+        
+        Raises:
+            Exception: The original error if it is fatal or retries are exhausted
+        """
+        delay = self._retry_delay(error, attempt, backoff)
+        with self.metrics.span("retry_backoff"):
+            time.sleep(delay)
+    
+    async def _ahandle_failure(self, error: Exception, attempt: int, backoff: Backoff):
+        """Async variant of _handle_failure, waiting without blocking the event loop"""
+        delay = self._retry_delay(error, attempt, backoff)
+        with self.metrics.span("retry_backoff"):
+            await asyncio.sleep(delay)
+    
+    def _retry_delay(self, error: Exception, attempt: int, backoff: Backoff) -> float:
+        """
+        Record a failed attempt and return how long to wait before retrying
+        
+        Raises:
+            Exception: The original error if it is fatal or retries are exhausted
+        """
+        if isinstance(error, CircuitOpenError):
+            self.metrics.upstream_requests.inc(outcome="circuit_open")
+            raise error
+        
+        classification = classify_error(error)
+        self.metrics.upstream_requests.inc(outcome="error")
+        self.metrics.errors.inc(error_class=type(error).__name__, kind=classification.kind)
+        if classification.retryable and classification.kind != "rate_limited":
+            # Only upstream health problems count towards opening the breaker;
+            # a 429 means this key is over quota, not that the service is down
+            self.circuit_breaker.record_failure()
+        else:
+            self.circuit_breaker.release()
+        
+        if not classification.retryable or attempt == MAX_RETRIES - 1:
+            raise error
+        
+        delay = backoff.next_delay(classification.retry_after)
+        logger.info("Retrying after %s in %.1fs (attempt %d)", classification.kind, delay, attempt + 1)
+        self.metrics.retries.inc(kind=classification.kind)
+        return delay
+    
+    def _record_timing(
+        self,
+        started: float,
+        first_chunk_at: float,
+        cached: bool,
+        chunks: int = 1,
+        usage: Optional[Dict[str, int]] = None,
+        coalesced: bool = False,
+    ):
+        """
+        Record time-to-first-token, total duration and token estimates of the last request
+        
+        Responses shared from an identical in-flight request (coalesced) did
+        not reach the upstream, so they are left out of the upstream metrics
+        and their tokens are counted like cached ones.
+        """
+        finished = time.perf_counter()
+        if not cached and not coalesced:
+            self.metrics.upstream_requests.inc(outcome="success")
+            self.metrics.stage_seconds.observe(first_chunk_at - started, stage="ttft")
+            self.metrics.stage_seconds.observe(finished - started, stage="upstream")
+        for direction in ("input", "output"):
+            if usage and f"{direction}_tokens" in usage:
+                self.metrics.tokens.inc(usage[f"{direction}_tokens"], direction=direction, cached=str(cached or coalesced).lower())
+        self.last_timing = {
+            "ttft_seconds": first_chunk_at - started,
+            "total_seconds": finished - started,
+            "cached": cached,
+            "coalesced": coalesced,
+            "chunks": chunks,
+            **(usage or {}),
+        }
+        logger.info(
+            "Generation finished: ttft=%.3fs total=%.3fs cached=%s coalesced=%s chunks=%d input_tokens~%s output_tokens~%s",
+            self.last_timing["ttft_seconds"],
+            self.last_timing["total_seconds"],
+            cached,
+            coalesced,
+            chunks,
+            self.last_timing.get("input_tokens"),
+            self.last_timing.get("output_tokens"),
+        )
+    
+    @staticmethod
+    def _usage(prompt: str, text: str, generation_config: Dict[str, Any]) -> Dict[str, int]:
+        """Local token estimates for a request and its response"""
+        return {
+            "input_tokens": estimate_tokens(prompt),
+            "output_tokens": estimate_tokens(text),
+            "max_output_tokens": generation_config["max_output_tokens"],
+        }
+    
+    def _generation_config(self, max_output_tokens: Optional[int] = None) -> Dict[str, Any]:
+        """Generation config for one request, optionally overriding the output limit"""
+        generation_config = dict(self.generation_config)
+        if max_output_tokens is not None:
+            generation_config["max_output_tokens"] = max_output_tokens
+        return generation_config
+    
+    def _lookup_cache(self, prompt: str, generation_config: Dict[str, Any], started: float) -> Tuple[str, Optional[str]]:
+        """
+        Look a request up in the response cache, recording a hit as the last request
+        
+        Returns:
+            Tuple of (cache key, cached text or None)
+        """
+        cache_key = self._cache_key(prompt, generation_config)
+        if self.cache is None:
+            return cache_key, None
+        cached = self.cache.get(cache_key)
+        self.metrics.cache_lookups.inc(result="miss" if cached is None else "hit")
+        if cached is not None:
+            self._record_timing(started, started, cached=True, usage=self._usage(prompt, cached, generation_config))
+        return cache_key, cached
+    
+    def _cache_key(self, prompt: str, generation_config: Dict[str, Any]) -> str:
+        """Content-addressed cache key for a prompt under the current model and config"""
+        payload = json.dumps(
+            {"model": self.backend.model_name, "prompt": prompt, "generation_config": generation_config},
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def _flight_key(self, mode: str, cache_key: str) -> str:
+        """
+        Single-flight key for a request
+        
+        Includes the API key fingerprint, so a quota or auth error on one
+        user's key is never handed to another user's identical request, and
+        the mode, since a streamed flight has no single result to share.
+        """
+        return f"{mode}:{self.key_id}:{cache_key}"
+    
     def _prepare_prompt(self, form_data: Dict[str, Any]) -> str:
         """Prepare the prompt with form data"""
         from config import BUSINESS_PLAN_PROMPT
         
-        # Fill in the prompt template with form data
-        prompt = BUSINESS_PLAN_PROMPT.format(
-            company_name=form_data.get("company_name", ""),
-            business_description=form_data.get("business_description", ""),
-            mission=form_data.get("mission", ""),
-            target_market=form_data.get("target_market", ""),
-            marketing_strategy=form_data.get("marketing_strategy", ""),
-            customer_acquisition=form_data.get("customer_acquisition", ""),
-            marketing_channels=form_data.get("marketing_channels", ""),
-            budget_considerations=form_data.get("budget_considerations", ""),
-            competitor_overview=form_data.get("competitor_overview", ""),
-            competitive_advantages=form_data.get("competitive_advantages", ""),
-            market_positioning=form_data.get("market_positioning", ""),
-            unique_value_prop=form_data.get("unique_value_prop", ""),
-            expected_costs=form_data.get("expected_costs", ""),
-            financial_strategy=form_data.get("financial_strategy", ""),
-            projected_sales=form_data.get("projected_sales", ""),
-            revenue_model=form_data.get("revenue_model", ""),
-            funding_requirements=form_data.get("funding_requirements", "")
-        )
+        # Fill in the prompt template with form data, compacted to the token budget
+        prompt = BUSINESS_PLAN_PROMPT.format(**self.prepare_fields(form_data))
         
         return prompt
+    
+    def prepare_fields(self, form_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Prompt placeholders for the form, compacted to fit the token budget
+        
+        Whitespace and boilerplate are stripped, sentences repeated across
+        fields are kept once, and oversized fields are summarized locally.
+        """
+        with self.metrics.span("prompt"):
+            fields, _ = compact_fields(self.prompt_fields(form_data))
+        return fields
+    
+    @staticmethod
+    def prompt_fields(form_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Map form data onto the placeholders used by the prompt templates"""
+        return {
+            "company_name": form_data.get("company_name", ""),
+            "business_description": form_data.get("business_description", ""),
+            "mission": form_data.get("mission", ""),
+            "target_market": form_data.get("target_market", ""),
+            "marketing_strategy": form_data.get("marketing_strategy", ""),
+            "customer_acquisition": form_data.get("customer_acquisition", ""),
+            "marketing_channels": form_data.get("marketing_channels", ""),
+            "budget_considerations": form_data.get("budget_considerations", ""),
+            "competitor_overview": form_data.get("competitor_overview", ""),
+            "competitive_advantages": form_data.get("competitive_advantages", ""),
+            "market_positioning": form_data.get("market_positioning", ""),
+            "unique_value_prop": form_data.get("unique_value_prop", ""),
+            "expected_costs": form_data.get("expected_costs", ""),
+            "financial_strategy": form_data.get("financial_strategy", ""),
+            "projected_sales": form_data.get("projected_sales", ""),
+            "revenue_model": form_data.get("revenue_model", ""),
+            "funding_requirements": form_data.get("funding_requirements", "")
+        }
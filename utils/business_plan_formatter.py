@@ -1,10 +1,12 @@
 """
 Business plan formatting utilities
 """
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import streamlit as st
 from datetime import datetime
-from .pdf_generator import generate_pdf
+from config import PDF_APP_PROFILE
+from .markdown_parser import Document, parse_markdown, render_markdown
+from .metrics import get_metrics
 
 class BusinessPlanFormatter:
     """Handles formatting and display of generated business plans"""
@@ -23,8 +25,40 @@ class BusinessPlanFormatter:
         Returns:
             Formatted business plan
         """
-        # Add header with company name and date
-        header = f"""
+        # Clean up the content
+        with get_metrics().span("format"):
+            formatted_content = self._clean_content(plan_content)
+        
+        return self.format_header(company_name) + formatted_content
+    
+    def format_document(self, document: Document, company_name: str, header: Optional[str] = None) -> str:
+        """
+        Format an already parsed business plan for display
+        
+        Args:
+            document: Parsed business plan content
+            company_name: Name of the company
+            header: Header from format_header; built fresh when omitted
+            
+        Returns:
+            Formatted business plan
+        """
+        if header is None:
+            header = self.format_header(company_name)
+        with get_metrics().span("format"):
+            return header + render_markdown(document)
+    
+    def format_header(self, company_name: str) -> str:
+        """
+        Build the plan header with company name and date
+        
+        Args:
+            company_name: Name of the company
+            
+        Returns:
+            Markdown header ending in a horizontal rule
+        """
+        return f"""
 # Business Plan
 **Company:** {company_name}  
 **Generated on:** {datetime.now().strftime('%B %d, %Y')}  
@@ -33,64 +67,56 @@ class BusinessPlanFormatter:
 ---
 
 """
-        
-        # Clean up the content
-        formatted_content = self._clean_content(plan_content)
-        
-        return header + formatted_content
     
     def _clean_content(self, content: str) -> str:
         """
         Clean and format the content
         
+        Parses the content once and renders it back as normalized Markdown:
+        consistent spacing between blocks, balanced emphasis and list markers.
+        
         Args:
             content: Raw content to clean
             
         Returns:
             Cleaned content
         """
-        # Remove any extra whitespace
-        content = content.strip()
-        
-        # Ensure proper spacing between sections
-        content = content.replace('\n\n\n', '\n\n')
-        
-        # Fix common formatting issues
-        content = content.replace('** **', '**')
-        content = content.replace('* *', '*')
-        
-        return content
+        return render_markdown(parse_markdown(content))
     
-    def display_business_plan(self, plan_content: str, company_name: str):
+    def display_business_plan(self, plan_content: str, company_name: str, artifacts=None):
         """
         Display the business plan in Streamlit
         
         Args:
             plan_content: Raw business plan content
             company_name: Name of the company
+            artifacts: Optional PlanArtifacts memoizing the formatted plan and
+                PDF across reruns; built fresh when omitted
         """
-        formatted_plan = self.format_business_plan(plan_content, company_name)
+        if artifacts is None:
+            from .plan_artifacts import PlanArtifacts
+            artifacts = PlanArtifacts(plan_content, company_name)
         
         # Display the plan
-        st.markdown(formatted_plan)
+        st.markdown(artifacts.formatted_markdown())
         
         # Add download button
-        self._add_download_button(formatted_plan, company_name)
+        self._add_download_button(artifacts)
     
-    def _add_download_button(self, formatted_plan: str, company_name: str):
+    def _add_download_button(self, artifacts):
         """
         Add a download button for the business plan
         
         Args:
-            formatted_plan: Formatted business plan content
-            company_name: Name of the company
+            artifacts: PlanArtifacts for the plan being displayed
         """
+        company_name = artifacts.company_name
         safe_company_name = "".join(c for c in company_name if c.isalnum() or c in (' ', '-', '_')).rstrip()
         pdf_filename = f"{safe_company_name}_Business_Plan_{datetime.now().strftime('%Y%m%d')}.pdf"
 
-        # Primary: PDF download
+        # Primary: PDF download, rendered with the fast profile since it is built on every display
         try:
-            pdf_bytes = generate_pdf(formatted_plan, company_name)
+            pdf_bytes = artifacts.pdf_bytes(PDF_APP_PROFILE)
             st.download_button(
                 label="📥 Download Business Plan (PDF)",
                 data=pdf_bytes,
@@ -105,7 +131,7 @@ class BusinessPlanFormatter:
             with st.expander("Download as Markdown (fallback)"):
                 st.download_button(
                     label="📥 Download Business Plan (Markdown)",
-                    data=formatted_plan,
+                    data=artifacts.formatted_markdown(),
                     file_name=md_filename,
                     mime="text/markdown",
                     help="Download your business plan as a Markdown file"
@@ -0,0 +1,158 @@
+"""
+Process-wide pool of Gemini model handles keyed by API key
+
+``genai.configure`` sets a process-global API key, so concurrent sessions
+using different keys can send requests under each other's credentials. The
+pool instead gives every key its own SDK client manager and service client,
+which are reused across reruns and sessions so their connections stay warm.
+The SDK itself is imported when the first handle is created, so importing
+this module (e.g. for key_fingerprint) stays cheap.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Any, Optional
+from config import GEMINI_MODEL, CLIENT_POOL_IDLE_SECONDS, CLIENT_POOL_MAX_SIZE
+from utils.metrics import get_metrics
+
+if TYPE_CHECKING:
+    import google.generativeai as genai
+
+logger = logging.getLogger(__name__)
+
+
+def key_fingerprint(api_key: str) -> str:
+    """Non-reversible identifier for an API key, safe to use as a dict key or in logs"""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+class _PoolEntry:
+    """Model handle and the per-key SDK client manager that owns its connections"""
+
+    def __init__(self, manager: Any, model: "genai.GenerativeModel"):
+        self.manager = manager
+        self.model = model
+        self.last_used = time.monotonic()
+
+
+class ModelPool:
+    """Thread-safe cache of per-key model handles with idle and size-based eviction"""
+
+    def __init__(self, idle_seconds: int = CLIENT_POOL_IDLE_SECONDS, max_size: int = CLIENT_POOL_MAX_SIZE):
+        """
+        Args:
+            idle_seconds: Handles unused for longer than this are closed
+            max_size: Maximum number of keys held at once; the least recently
+                used handle is closed when the pool is full
+        """
+        self.idle_seconds = idle_seconds
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, _PoolEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.created = 0
+        self.reused = 0
+        self.evicted = 0
+
+    def get_model(self, api_key: str, async_client: bool = False) -> "genai.GenerativeModel":
+        """
+        Return the model handle for an API key, creating it on first use
+
+        Args:
+            api_key: Gemini API key the handle should authenticate with
+            async_client: Also bind this key's async service client, used by
+                ``generate_content_async``. It is created on first async use
+                and tied to the event loop that first awaits it.
+
+        Returns:
+            A GenerativeModel bound to its own service client for this key
+        """
+        fingerprint = key_fingerprint(api_key)
+        stale = []
+        with self._lock:
+            stale.extend(self._pop_idle())
+            entry = self._entries.get(fingerprint)
+            if entry is None:
+                entry = self._create(api_key)
+                self._entries[fingerprint] = entry
+                self.created += 1
+                logger.info("Created Gemini client for key %s", fingerprint[:8])
+                while len(self._entries) > self.max_size:
+                    stale.append(self._entries.popitem(last=False)[1])
+            else:
+                self.reused += 1
+            self.evicted += len(stale)
+            self._entries.move_to_end(fingerprint)
+            entry.last_used = time.monotonic()
+            if async_client and entry.model._async_client is None:
+                entry.model._async_client = entry.manager.get_default_client("generative_async")
+            model = entry.model
+
+        for old in stale:
+            self._close(old)
+        return model
+
+    def _create(self, api_key: str) -> _PoolEntry:
+        """Build a client manager and model scoped to a single key"""
+        import google.generativeai as genai
+        from google.generativeai import client as genai_client
+
+        manager = genai_client._ClientManager()
+        manager.configure(api_key=api_key)
+        model = genai.GenerativeModel(GEMINI_MODEL)
+        # Bind the model to this key's client instead of the process-global default
+        model._client = manager.get_default_client("generative")
+        return _PoolEntry(manager, model)
+
+    def _pop_idle(self):
+        """Remove and return entries idle for longer than the configured limit"""
+        cutoff = time.monotonic() - self.idle_seconds
+        idle = [fingerprint for fingerprint, entry in self._entries.items() if entry.last_used < cutoff]
+        return [self._entries.pop(fingerprint) for fingerprint in idle]
+
+    def _close(self, entry: _PoolEntry):
+        """Release the connections held by an evicted entry"""
+        for client in entry.manager.clients.values():
+            try:
+                client.transport.close()
+            except Exception as e:
+                logger.debug("Error closing evicted Gemini client: %s", e)
+
+    def evict_idle(self):
+        """Close every handle that has been idle for longer than the configured limit"""
+        with self._lock:
+            stale = self._pop_idle()
+            self.evicted += len(stale)
+        for entry in stale:
+            self._close(entry)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Pool counters for monitoring
+
+        Returns:
+            Dictionary with the number of live handles and lifetime counters
+        """
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "created": self.created,
+                "reused": self.reused,
+                "evicted": self.evicted,
+            }
+
+
+_pool: Optional[ModelPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_model_pool() -> ModelPool:
+    """Return the process-wide model pool shared by all sessions"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ModelPool()
+            get_metrics().register_collector("model_pool", _pool.stats)
+        return _pool
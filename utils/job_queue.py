@@ -0,0 +1,331 @@
+"""
+Process-wide background queue for business plan generation
+
+Generation runs on a shared worker pool instead of the Streamlit script
+thread. Each job has an ID and exposes its status, the text streamed so far
+and a cancellation flag, so a page can poll it cheaply and stay responsive.
+"""
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, List, Optional
+from config import (
+    GENERATION_MODE,
+    JOB_MAX_PENDING,
+    JOB_RETENTION_SECONDS,
+    JOB_WORKERS,
+    PLAN_SECTIONS,
+    STREAM_RESPONSES,
+)
+from utils.metrics import get_metrics
+from utils.plan_store import save_plan
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+class JobQueueFull(Exception):
+    """Raised when too many jobs are already waiting for a worker"""
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's work function once the job has been cancelled"""
+
+
+class GenerationJob:
+    """State of one background generation, shared between its worker and any pollers"""
+
+    def __init__(self, job_id: str, source: str = "app", company_name: str = ""):
+        self.id = job_id
+        self.source = source
+        self.company_name = company_name
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[str] = None
+        self.error: Optional[str] = None
+        self.error_type: Optional[str] = None
+        # Fraction complete and a short status line for progress displays
+        self.progress = 0.0
+        self.message = ""
+        # Per-section results and failures, kept for retries and later edits
+        self.sections: Dict[str, str] = {}
+        self.failures: Dict[str, str] = {}
+        # Sections carried over unchanged from an earlier plan
+        self.reused_sections: List[str] = []
+        self.timing: Dict[str, Any] = {}
+        # ID in the plan store once the finished plan has been saved
+        self.plan_id: Optional[str] = None
+        self._chunks: List[str] = []
+        self.cancel_event = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    @property
+    def partial_text(self) -> str:
+        """Text generated so far; the full plan once a streaming job is done"""
+        return "".join(self._chunks)
+
+    def emit(self, text: str):
+        """Append a chunk of generated text; called from the worker"""
+        self._chunks.append(text)
+
+    def chunks_since(self, index: int) -> List[str]:
+        """Chunks emitted after the first ``index``, so a streamer only sends new text"""
+        return self._chunks[index:]
+
+    def cancel(self):
+        """Ask the job to stop; work already sent upstream cannot be recalled"""
+        self.cancel_event.set()
+
+    def check_cancelled(self):
+        """
+        Stop the work function if the job has been cancelled
+
+        Raises:
+            JobCancelled: If cancellation was requested
+        """
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+
+class JobQueue:
+    """Bounded worker pool running generation jobs, with job lookup by ID"""
+
+    def __init__(
+        self,
+        max_workers: int = JOB_WORKERS,
+        max_pending: int = JOB_MAX_PENDING,
+        retention_seconds: float = JOB_RETENTION_SECONDS,
+    ):
+        """
+        Args:
+            max_workers: Jobs running at once
+            max_pending: Jobs allowed to wait for a worker before submissions
+                are rejected
+            retention_seconds: How long finished jobs stay available to pollers
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retention_seconds = retention_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="plan-job")
+        self._jobs: Dict[str, GenerationJob] = {}
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.rejected = 0
+
+    def submit(self, work: Callable[[GenerationJob], str], source: str = "app", company_name: str = "") -> GenerationJob:
+        """
+        Queue a work function; its return value becomes the job result
+
+        Args:
+            work: Called on a worker thread with the job, which it can use to
+                emit partial text, report progress and check for cancellation
+            source: Who submitted the job, e.g. "app"; used in metrics
+            company_name: Company the plan is for, kept for exports
+
+        Returns:
+            The queued job
+
+        Raises:
+            JobQueueFull: If the pool and its queue are both full
+        """
+        with self._lock:
+            self._prune()
+            unfinished = sum(1 for job in self._jobs.values() if not job.finished)
+            if unfinished >= self.max_workers + self.max_pending:
+                self.rejected += 1
+                raise JobQueueFull(f"{unfinished} generation jobs are already queued or running")
+            job = GenerationJob(uuid.uuid4().hex, source, company_name)
+            self._jobs[job.id] = job
+            self.submitted += 1
+        self._executor.submit(self._run, job, work)
+        return job
+
+    def submit_generation(
+        self,
+        form_data: Dict[str, Any],
+        api_key: Optional[str] = None,
+        completed_sections: Optional[Dict[str, str]] = None,
+        source: str = "app",
+    ) -> GenerationJob:
+        """
+        Queue generation of a business plan in the configured generation mode
+
+        The finished plan is saved to the plan store before the job is
+        marked done.
+
+        Args:
+            form_data: Snapshot of the form inputs; not modified
+            api_key: Gemini API key of the requesting user
+            completed_sections: Sections of an earlier plan to keep; only the
+                missing sections are generated, section by section
+            source: Recorded with the stored plan, e.g. "app"
+
+        Returns:
+            The queued job
+        """
+        form_data = dict(form_data)
+
+        def work(job: GenerationJob) -> str:
+            plan = _generate_plan(job, form_data, api_key, completed_sections)
+            job.check_cancelled()
+            job.plan_id = save_plan(form_data, plan, source)
+            return plan
+
+        return self.submit(work, source, form_data.get("company_name", "Your Company"))
+
+    def get(self, job_id: Optional[str]) -> Optional[GenerationJob]:
+        """Look up a job; finished jobs are forgotten after the retention period"""
+        if not job_id:
+            return None
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a job
+
+        Returns:
+            True if the job exists and had not finished yet
+        """
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return False
+        job.cancel()
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Queue counters for monitoring
+
+        Returns:
+            Dictionary with queued/running job counts and lifetime counters
+        """
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+            return {
+                "queued": statuses.count(QUEUED),
+                "running": statuses.count(RUNNING),
+                "max_workers": self.max_workers,
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+            }
+
+    def _run(self, job: GenerationJob, work: Callable[[GenerationJob], str]):
+        if job.cancel_event.is_set():
+            self._finish(job, CANCELLED)
+            return
+        job.status = RUNNING
+        job.started_at = time.time()
+        try:
+            result = work(job)
+            job.check_cancelled()
+            job.result = result
+            job.progress = 1.0
+            self._finish(job, DONE)
+        except JobCancelled:
+            self._finish(job, CANCELLED)
+        except Exception as e:
+            job.error = str(e)
+            job.error_type = type(e).__name__
+            logger.info("Generation job %s failed: %s", job.id, job.error_type)
+            self._finish(job, FAILED)
+
+    def _finish(self, job: GenerationJob, status: str):
+        job.finished_at = time.time()
+        job.status = status
+        get_metrics().generations.inc(source=job.source, status=status)
+
+    def _prune(self):
+        """Drop finished jobs past the retention period; caller holds the lock"""
+        cutoff = time.time() - self.retention_seconds
+        expired = [job_id for job_id, job in self._jobs.items() if job.finished and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+def _generate_plan(
+    job: GenerationJob,
+    form_data: Dict[str, Any],
+    api_key: Optional[str],
+    completed_sections: Optional[Dict[str, str]],
+) -> str:
+    """Generate the plan text for a job"""
+    from utils.api_client import GeminiAPIClient
+    from utils.section_generator import SectionedPlanGenerator, split_plan_sections
+
+    api_client = GeminiAPIClient(api_key=api_key)
+    started = time.perf_counter()
+
+    # Unchanged sections of an earlier plan are reused whatever the mode, so
+    # an edit only regenerates the sections that depend on the edited fields
+    if GENERATION_MODE == "sections" or completed_sections:
+        job.reused_sections = sorted(completed_sections or {})
+        generator = SectionedPlanGenerator(api_client)
+        progress = {"done": len(completed_sections or {}), "first_section_at": None}
+
+        def on_section_done(title: str, succeeded: bool):
+            progress["done"] += 1
+            if succeeded and progress["first_section_at"] is None:
+                progress["first_section_at"] = time.perf_counter()
+            job.progress = progress["done"] / len(PLAN_SECTIONS)
+            job.message = f"{'✅' if succeeded else '⚠️'} {title}"
+
+        job.progress = progress["done"] / len(PLAN_SECTIONS)
+        sections, failures = generator.generate(form_data, completed_sections, on_section_done, job.cancel_event)
+        job.sections, job.failures = sections, failures
+        job.check_cancelled()
+        if failures:
+            raise Exception(f"{len(failures)} section(s) could not be generated")
+
+        finished = time.perf_counter()
+        job.timing = {
+            "ttft_seconds": (progress["first_section_at"] or finished) - started,
+            "total_seconds": finished - started,
+            "cached": len(completed_sections or {}) == len(PLAN_SECTIONS),
+            "chunks": len(sections),
+        }
+        return generator.assemble(sections)
+
+    if STREAM_RESPONSES:
+        stream = api_client.generate_business_plan_stream(form_data)
+        try:
+            for chunk in stream:
+                job.check_cancelled()
+                job.emit(chunk)
+        finally:
+            stream.close()
+        plan = job.partial_text
+    else:
+        # A blocking call cannot be interrupted; a cancelled job discards its result
+        plan = api_client.generate_business_plan(form_data, raise_errors=True)
+    job.timing = api_client.last_timing
+    # Keep the plan split per section so a later edit can regenerate only part of it
+    job.sections = split_plan_sections(plan)
+    return plan
+
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Return the process-wide job queue shared by all sessions"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+            get_metrics().register_collector("job_queue", _queue.stats)
+        return _queue
@@ -0,0 +1,475 @@
+"""
+LLM backends used by the API client
+
+The client talks to a backend rather than to ``google.generativeai``
+directly, so generation can be pointed at a deterministic offline fake or at
+recorded cassettes for load tests and benchmarks. Every backend also has
+async variants for callers running many generations on one event loop.
+"""
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Any, AsyncIterator, Iterator, List, Optional, Tuple
+from config import (
+    GEMINI_MODEL,
+    LLM_BACKEND,
+    LLM_CASSETTE_MODE,
+    LLM_CASSETTE_PATH,
+    FAKE_LATENCY_DISTRIBUTION,
+    FAKE_LATENCY_MEAN_SECONDS,
+    FAKE_LATENCY_STDDEV_SECONDS,
+    FAKE_TOKENS_PER_SECOND,
+    FAKE_OUTPUT_TOKENS,
+    FAKE_FAILURE_RATE,
+    FAKE_RATE_LIMIT_RATE,
+    FAKE_SEED,
+)
+
+
+class LLMBackend(ABC):
+    """Interface every text generation backend implements"""
+
+    # Identifies the model in cache keys, so backends never share cached responses
+    model_name: str = ""
+
+    @abstractmethod
+    def generate(self, prompt: str, generation_config: Dict[str, Any]) -> str:
+        """
+        Generate a complete response
+
+        Args:
+            prompt: Complete prompt to send
+            generation_config: Sampling settings (temperature, max_output_tokens)
+
+        Returns:
+            Generated text, or an empty string if the model returned nothing
+        """
+
+    @abstractmethod
+    def stream(self, prompt: str, generation_config: Dict[str, Any]) -> Iterator[str]:
+        """
+        Generate a response incrementally
+
+        Args:
+            prompt: Complete prompt to send
+            generation_config: Sampling settings (temperature, max_output_tokens)
+
+        Yields:
+            Text chunks in order
+        """
+
+    async def agenerate(self, prompt: str, generation_config: Dict[str, Any]) -> str:
+        """
+        Async variant of generate
+
+        The default runs ``generate`` in the loop's thread pool; backends with
+        a native async transport override it.
+        """
+        return await asyncio.get_running_loop().run_in_executor(None, self.generate, prompt, generation_config)
+
+    async def astream(self, prompt: str, generation_config: Dict[str, Any]) -> AsyncIterator[str]:
+        """
+        Async variant of stream
+
+        The default pulls each chunk of ``stream`` in the loop's thread pool;
+        backends with a native async transport override it.
+        """
+        loop = asyncio.get_running_loop()
+        iterator = iter(self.stream(prompt, generation_config))
+        done = object()
+        try:
+            while True:
+                chunk = await loop.run_in_executor(None, next, iterator, done)
+                if chunk is done:
+                    return
+                yield chunk
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini through ``google.generativeai``, using the per-key model pool"""
+
+    def __init__(self, api_key: str):
+        import google.generativeai as genai
+        from utils.client_pool import get_model_pool
+
+        self._genai = genai
+        self._pool = get_model_pool()
+        self._api_key = api_key
+        self.model = self._pool.get_model(api_key)
+        self.model_name = GEMINI_MODEL
+
+    def generate(self, prompt: str, generation_config: Dict[str, Any]) -> str:
+        response = self.model.generate_content(
+            prompt,
+            generation_config=self._genai.types.GenerationConfig(**generation_config)
+        )
+        return response.text
+
+    def stream(self, prompt: str, generation_config: Dict[str, Any]) -> Iterator[str]:
+        response = self.model.generate_content(
+            prompt,
+            generation_config=self._genai.types.GenerationConfig(**generation_config),
+            stream=True
+        )
+        for chunk in response:
+            text = chunk.text if chunk.parts else ""
+            if text:
+                yield text
+
+    async def agenerate(self, prompt: str, generation_config: Dict[str, Any]) -> str:
+        model = self._pool.get_model(self._api_key, async_client=True)
+        response = await model.generate_content_async(
+            prompt,
+            generation_config=self._genai.types.GenerationConfig(**generation_config)
+        )
+        return response.text
+
+    async def astream(self, prompt: str, generation_config: Dict[str, Any]) -> AsyncIterator[str]:
+        model = self._pool.get_model(self._api_key, async_client=True)
+        response = await model.generate_content_async(
+            prompt,
+            generation_config=self._genai.types.GenerationConfig(**generation_config),
+            stream=True
+        )
+        async for chunk in response:
+            text = chunk.text if chunk.parts else ""
+            if text:
+                yield text
+
+
+class FakeBackendError(Exception):
+    """Injected upstream failure, classified like an HTTP 503"""
+
+    code = 503
+
+
+class FakeRateLimitError(Exception):
+    """Injected quota error, classified like an HTTP 429 with a Retry-After hint"""
+
+    code = 429
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class FakeBackend(LLMBackend):
+    """
+    Deterministic offline backend with configurable latency and failure injection
+
+    The same prompt and attempt number always produce the same latency, output
+    and injected errors, regardless of how concurrent calls interleave, so
+    benchmark runs are reproducible.
+    """
+
+    model_name = "fake"
+
+    def __init__(
+        self,
+        latency_distribution: str = FAKE_LATENCY_DISTRIBUTION,
+        latency_mean: float = FAKE_LATENCY_MEAN_SECONDS,
+        latency_stddev: float = FAKE_LATENCY_STDDEV_SECONDS,
+        tokens_per_second: float = FAKE_TOKENS_PER_SECOND,
+        output_tokens: int = FAKE_OUTPUT_TOKENS,
+        failure_rate: float = FAKE_FAILURE_RATE,
+        rate_limit_rate: float = FAKE_RATE_LIMIT_RATE,
+        seed: int = FAKE_SEED,
+    ):
+        """
+        Args:
+            latency_distribution: "constant", "normal" or "lognormal" time to first token
+            latency_mean: Mean time to first token in seconds
+            latency_stddev: Standard deviation of the time to first token
+            tokens_per_second: Streaming rate after the first token
+            output_tokens: Approximate response length in tokens
+            failure_rate: Probability of an injected 503 per call
+            rate_limit_rate: Probability of an injected 429 per call
+            seed: Seed mixed into every per-call random generator
+        """
+        if latency_distribution not in ("constant", "normal", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {latency_distribution}")
+        self.latency_distribution = latency_distribution
+        self.latency_mean = latency_mean
+        self.latency_stddev = latency_stddev
+        self.tokens_per_second = tokens_per_second
+        self.output_tokens = output_tokens
+        self.failure_rate = failure_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.seed = seed
+        self._attempts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def generate(self, prompt: str, generation_config: Dict[str, Any]) -> str:
+        return "".join(self.stream(prompt, generation_config))
+
+    def stream(self, prompt: str, generation_config: Dict[str, Any]) -> Iterator[str]:
+        chunks, delays, error = self._plan_call(prompt, generation_config)
+        for chunk, delay in zip(chunks, delays):
+            time.sleep(delay)
+            yield chunk
+        if error is not None:
+            time.sleep(delays[-1])
+            raise error
+
+    async def agenerate(self, prompt: str, generation_config: Dict[str, Any]) -> str:
+        return "".join([chunk async for chunk in self.astream(prompt, generation_config)])
+
+    async def astream(self, prompt: str, generation_config: Dict[str, Any]) -> AsyncIterator[str]:
+        chunks, delays, error = self._plan_call(prompt, generation_config)
+        for chunk, delay in zip(chunks, delays):
+            await asyncio.sleep(delay)
+            yield chunk
+        if error is not None:
+            await asyncio.sleep(delays[-1])
+            raise error
+
+    def _plan_call(self, prompt: str, generation_config: Dict[str, Any]) -> Tuple[List[str], List[float], Optional[Exception]]:
+        """
+        Decide the outcome of one call up front, so sync and async calls behave the same
+
+        Returns:
+            Tuple of (chunks, delay before each chunk, injected error). An
+            injected error has no chunks and one delay before it is raised.
+        """
+        rng = self._call_rng(prompt)
+
+        roll = rng.random()
+        if roll < self.rate_limit_rate:
+            return [], [min(self.latency_mean, 0.05)], FakeRateLimitError(
+                "Injected rate limit", retry_after=round(rng.uniform(0.5, 2.0), 2)
+            )
+        if roll < self.rate_limit_rate + self.failure_rate:
+            return [], [self._first_token_latency(rng)], FakeBackendError("Injected upstream failure")
+
+        max_tokens = generation_config.get("max_output_tokens") or self.output_tokens
+        words = self._response_words(prompt, rng, min(self.output_tokens, max_tokens))
+
+        first_token_latency = self._first_token_latency(rng)
+        chunk_words = 16
+        seconds_per_chunk = chunk_words / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        chunks = [" ".join(words[start:start + chunk_words]) + " " for start in range(0, len(words), chunk_words)]
+        delays = [first_token_latency] + [seconds_per_chunk] * (len(chunks) - 1)
+        return chunks, delays, None
+
+    def _call_rng(self, prompt: str) -> random.Random:
+        """Random generator determined by the seed, the prompt and its attempt number"""
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        with self._lock:
+            attempt = self._attempts.get(digest, 0)
+            self._attempts[digest] = attempt + 1
+        return random.Random(f"{self.seed}:{digest}:{attempt}")
+
+    def _first_token_latency(self, rng: random.Random) -> float:
+        if self.latency_distribution == "constant" or self.latency_mean <= 0:
+            return self.latency_mean
+        if self.latency_distribution == "normal":
+            return max(0.0, rng.gauss(self.latency_mean, self.latency_stddev))
+        # Lognormal parameterised by the mean and standard deviation of the result
+        variance = self.latency_stddev ** 2
+        sigma = math.sqrt(math.log(1 + variance / self.latency_mean ** 2))
+        mu = math.log(self.latency_mean) - sigma ** 2 / 2
+        return rng.lognormvariate(mu, sigma)
+
+    @staticmethod
+    def _response_words(prompt: str, rng: random.Random, token_count: int) -> List[str]:
+        """Markdown-shaped filler text, with headings for any sections the prompt names"""
+        vocabulary = (
+            "market customers revenue growth strategy product pricing channel "
+            "retention margin forecast investment team launch segment demand "
+            "acquisition partnership brand operations runway scalable"
+        ).split()
+        sections = [line.split(". ", 1)[1] for line in prompt.splitlines() if line[:1].isdigit() and ". " in line]
+
+        words: List[str] = []
+        per_section = max(1, token_count // max(1, len(sections)))
+        for number, title in enumerate(sections or [None], 1):
+            if title:
+                words.extend(["\n\n##", f"{number}.", *title.split(), "\n\n"])
+            for i in range(per_section):
+                if i % 12 == 0:
+                    words.append("\n-")
+                words.append(rng.choice(vocabulary))
+        return words
+
+
+class CassetteMissError(Exception):
+    """Raised in replay mode when no recording exists for a request"""
+
+    # Replaying the same request finds the same nothing, so it is never retried
+    retryable = False
+
+
+class Cassette:
+    """JSON file of recorded responses, shared by every backend using the same path"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data: Dict[str, Any] = {"model_name": None, "responses": {}}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self._data = json.load(f)
+
+    @property
+    def model_name(self) -> Optional[str]:
+        return self._data.get("model_name")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data["responses"])
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._data["responses"].get(key)
+
+    def put(self, key: str, model_name: str, chunks: List[str], offsets: List[float]):
+        """Store a recording and rewrite the file atomically"""
+        with self._lock:
+            self._data["model_name"] = model_name
+            self._data["responses"][key] = {"chunks": chunks, "offsets": offsets}
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._data, f)
+            os.replace(tmp_path, self.path)
+
+
+class CassetteBackend(LLMBackend):
+    """Records responses of another backend to a cassette, or replays them offline"""
+
+    def __init__(self, cassette: Cassette, mode: str, inner: Optional[LLMBackend] = None, replay_timing: bool = True):
+        """
+        Args:
+            cassette: Recordings to read from or append to
+            mode: "record" to call ``inner`` and save responses, "replay" to serve them
+            inner: Backend to record from; required in record mode
+            replay_timing: Reproduce the recorded chunk timing when replaying
+        """
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        if mode == "record" and inner is None:
+            raise ValueError("Recording a cassette requires an inner backend")
+        self.cassette = cassette
+        self.mode = mode
+        self.inner = inner
+        self.replay_timing = replay_timing
+        self.model_name = inner.model_name if inner is not None else (cassette.model_name or GEMINI_MODEL)
+
+    @staticmethod
+    def _key(prompt: str, generation_config: Dict[str, Any]) -> str:
+        payload = json.dumps({"prompt": prompt, "generation_config": generation_config}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def generate(self, prompt: str, generation_config: Dict[str, Any]) -> str:
+        return "".join(self.stream(prompt, generation_config))
+
+    def stream(self, prompt: str, generation_config: Dict[str, Any]) -> Iterator[str]:
+        key = self._key(prompt, generation_config)
+        if self.mode == "replay":
+            yield from self._replay(key)
+            return
+
+        started = time.perf_counter()
+        chunks, offsets = [], []
+        for chunk in self.inner.stream(prompt, generation_config):
+            chunks.append(chunk)
+            offsets.append(round(time.perf_counter() - started, 4))
+            yield chunk
+        self.cassette.put(key, self.model_name, chunks, offsets)
+
+    async def agenerate(self, prompt: str, generation_config: Dict[str, Any]) -> str:
+        return "".join([chunk async for chunk in self.astream(prompt, generation_config)])
+
+    async def astream(self, prompt: str, generation_config: Dict[str, Any]) -> AsyncIterator[str]:
+        key = self._key(prompt, generation_config)
+        if self.mode == "replay":
+            entry = self._recording(key)
+            started = time.perf_counter()
+            for chunk, offset in zip(entry["chunks"], entry["offsets"]):
+                if self.replay_timing:
+                    delay = offset - (time.perf_counter() - started)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                yield chunk
+            return
+
+        started = time.perf_counter()
+        chunks, offsets = [], []
+        async for chunk in self.inner.astream(prompt, generation_config):
+            chunks.append(chunk)
+            offsets.append(round(time.perf_counter() - started, 4))
+            yield chunk
+        # The cassette file is small and rewritten rarely, so this blocks only briefly
+        self.cassette.put(key, self.model_name, chunks, offsets)
+
+    def _recording(self, key: str) -> Dict[str, Any]:
+        entry = self.cassette.get(key)
+        if entry is None:
+            raise CassetteMissError(f"No recorded response for request {key[:12]} in {self.cassette.path}")
+        return entry
+
+    def _replay(self, key: str) -> Iterator[str]:
+        entry = self._recording(key)
+        started = time.perf_counter()
+        for chunk, offset in zip(entry["chunks"], entry["offsets"]):
+            if self.replay_timing:
+                delay = offset - (time.perf_counter() - started)
+                if delay > 0:
+                    time.sleep(delay)
+            yield chunk
+
+
+_fake_backend: Optional[FakeBackend] = None
+_cassettes: Dict[str, Cassette] = {}
+_factory_lock = threading.Lock()
+
+
+def backend_requires_api_key() -> bool:
+    """Whether the configured backend talks to the live Gemini API"""
+    return LLM_BACKEND == "gemini" and LLM_CASSETTE_MODE != "replay"
+
+
+def create_backend(api_key: Optional[str] = None) -> LLMBackend:
+    """
+    Build the backend selected by ``LLM_BACKEND`` and ``LLM_CASSETTE_MODE``
+
+    Args:
+        api_key: Gemini API key, required unless an offline backend is configured
+
+    Returns:
+        The configured LLMBackend
+    """
+    global _fake_backend
+    if LLM_BACKEND == "fake":
+        # One shared fake keeps attempt counters, and so injected failures, consistent
+        with _factory_lock:
+            if _fake_backend is None:
+                _fake_backend = FakeBackend()
+            inner: Optional[LLMBackend] = _fake_backend
+    elif LLM_BACKEND == "gemini":
+        inner = GeminiBackend(api_key) if LLM_CASSETTE_MODE != "replay" else None
+    else:
+        raise ValueError(f"Unknown LLM_BACKEND: {LLM_BACKEND}")
+
+    if not LLM_CASSETTE_MODE:
+        return inner
+
+    with _factory_lock:
+        cassette = _cassettes.get(LLM_CASSETTE_PATH)
+        if cassette is None:
+            cassette = _cassettes[LLM_CASSETTE_PATH] = Cassette(LLM_CASSETTE_PATH)
+    if LLM_CASSETTE_MODE == "replay" and not len(cassette):
+        raise CassetteMissError(f"Cassette is empty or missing: {LLM_CASSETTE_PATH}")
+    return CassetteBackend(cassette, LLM_CASSETTE_MODE, inner)
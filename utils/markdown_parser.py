@@ -0,0 +1,498 @@
+"""
+Single-pass Markdown parser producing a compact document model
+
+Generated plans are parsed once into headings, paragraphs, nested lists,
+rules, tables and code blocks with inline bold/italic spans. The formatter's
+Markdown cleanup and the PDF builder both render from this model instead of
+re-scanning the text themselves.
+"""
+import re
+from typing import List, Optional, Tuple
+
+# Inline style flags, combined with bitwise OR
+BOLD = 1
+ITALIC = 2
+
+# A run of text in one style; "\n" inside the text is a hard line break
+Span = Tuple[str, int]
+
+
+class Heading:
+    __slots__ = ("level", "spans", "line")
+
+    def __init__(self, level: int, spans: List[Span], line: Optional[int] = None):
+        self.level = level
+        self.spans = spans
+        # Index of the source line, so callers can slice the original text
+        self.line = line
+
+
+class Paragraph:
+    __slots__ = ("spans", "line")
+
+    def __init__(self, spans: List[Span], line: Optional[int] = None):
+        self.spans = spans
+        # Index of the paragraph's first source line
+        self.line = line
+
+
+class ListItem:
+    __slots__ = ("spans", "children")
+
+    def __init__(self, spans: List[Span], children: Optional[List["ListBlock"]] = None):
+        self.spans = spans
+        self.children = children if children is not None else []
+
+
+class ListBlock:
+    __slots__ = ("ordered", "start", "items")
+
+    def __init__(self, ordered: bool, start: int = 1, items: Optional[List[ListItem]] = None):
+        self.ordered = ordered
+        self.start = start
+        self.items = items if items is not None else []
+
+
+class Rule:
+    __slots__ = ()
+
+
+class Table:
+    __slots__ = ("rows", "alignments")
+
+    def __init__(self, rows: List[List[List[Span]]], alignments: List[str]):
+        # The first row is the header; alignments keep the separator cells (e.g. ":---:")
+        self.rows = rows
+        self.alignments = alignments
+
+
+class CodeBlock:
+    __slots__ = ("lines",)
+
+    def __init__(self, lines: List[str]):
+        self.lines = lines
+
+
+class Document:
+    __slots__ = ("blocks",)
+
+    def __init__(self, blocks: List[object]):
+        self.blocks = blocks
+
+
+_HEADING_RE = re.compile(r"(#{1,6})\s+(.*?)\s*#*\s*$")
+_RULE_RE = re.compile(r"(?:(?:\*\s*){3,}|(?:-\s*){3,}|(?:_\s*){3,})$")
+_BULLET_RE = re.compile(r"([-*+•])\s+(.*)$")
+_ORDERED_RE = re.compile(r"(\d{1,9})[.)]\s+(.*)$")
+_TABLE_SEPARATOR_RE = re.compile(r"\|?\s*:?-{2,}:?\s*(\|\s*:?-{2,}:?\s*)*\|?$")
+_INLINE_MARKER_RE = re.compile(r"\\[\\*_`]|\*\*|__|\*")
+
+# Short numbered lines without closing punctuation, like "1. Executive Summary",
+# are section headings rather than one-item lists
+_NUMBERED_HEADING_MAX_LENGTH = 60
+
+
+def parse_markdown(text: str) -> Document:
+    """
+    Parse Markdown-like plan text into a Document in a single pass
+
+    Args:
+        text: Plan content as produced by the model
+
+    Returns:
+        The parsed Document
+    """
+    return _Parser(text.splitlines()).parse()
+
+
+class _Parser:
+    """Line-oriented state machine; every line is visited exactly once"""
+
+    def __init__(self, lines: List[str]):
+        self.lines = lines
+        self.blocks: List[object] = []
+        self.paragraph: List[str] = []
+        self.paragraph_line = 0
+        # Open lists as (indent, ListBlock); list item text is collected raw and
+        # parsed into spans when the list closes, so continuation lines can join it
+        self.list_stack: List[Tuple[int, ListBlock]] = []
+        self.blank_since_item = False
+
+    def parse(self) -> Document:
+        lines = self.lines
+        i = 0
+        while i < len(lines):
+            raw = lines[i].expandtabs(4)
+            stripped = raw.strip()
+            indent = len(raw) - len(raw.lstrip())
+            i += 1
+
+            if not stripped:
+                self._flush_paragraph()
+                self.blank_since_item = True
+                continue
+
+            if stripped.startswith("```") or stripped.startswith("~~~"):
+                i = self._code_block(stripped[:3], i)
+                continue
+
+            heading = _HEADING_RE.match(stripped)
+            if heading:
+                self._close_blocks()
+                self.blocks.append(Heading(len(heading.group(1)), parse_inline(heading.group(2)), i - 1))
+                continue
+
+            if _RULE_RE.match(stripped):
+                self._close_blocks()
+                self.blocks.append(Rule())
+                continue
+
+            if stripped.startswith("|"):
+                i = self._table(i - 1)
+                continue
+
+            bullet = _BULLET_RE.match(stripped)
+            if bullet:
+                self._list_item(indent, False, 1, bullet.group(2))
+                continue
+
+            ordered = _ORDERED_RE.match(stripped)
+            if ordered:
+                if indent == 0 and not self.list_stack and self._is_numbered_heading(ordered.group(2), i):
+                    self._close_blocks()
+                    self.blocks.append(Heading(2, parse_inline(stripped), i - 1))
+                else:
+                    self._list_item(indent, True, int(ordered.group(1)), ordered.group(2))
+                continue
+
+            if self.list_stack and (indent > 0 or not self.blank_since_item):
+                # Continuation of the innermost open list item
+                item = self.list_stack[-1][1].items[-1]
+                item.spans = f"{item.spans} {stripped}"
+                continue
+
+            self._close_lists()
+            if not self.paragraph:
+                self.paragraph_line = i - 1
+            # Two trailing spaces mark a hard line break, as in the plan header
+            self.paragraph.append(stripped + ("\n" if raw.endswith("  ") else " "))
+
+        self._close_blocks()
+        return Document(self.blocks)
+
+    def _is_numbered_heading(self, text: str, next_index: int) -> bool:
+        if len(text) > _NUMBERED_HEADING_MAX_LENGTH or text[-1] in ".:;,!?":
+            return False
+        # One line of lookahead: a following numbered line makes this a list
+        for line in self.lines[next_index:]:
+            if line.strip():
+                return not _ORDERED_RE.match(line.strip())
+        return True
+
+    def _list_item(self, indent: int, ordered: bool, number: int, text: str):
+        self._flush_paragraph()
+        stack = self.list_stack
+        while stack and stack[-1][0] > indent:
+            stack.pop()
+
+        if stack and stack[-1][0] == indent and stack[-1][1].ordered != ordered:
+            # A different list type at the same level starts a new list
+            stack.pop()
+
+        if stack and stack[-1][0] == indent:
+            block = stack[-1][1]
+        else:
+            block = ListBlock(ordered, number)
+            if stack:
+                stack[-1][1].items[-1].children.append(block)
+            else:
+                self._finalize_lists()
+                self.blocks.append(block)
+            stack.append((indent, block))
+
+        block.items.append(ListItem(text))
+        self.blank_since_item = False
+
+    def _table(self, start: int) -> int:
+        """Consume consecutive table rows starting at ``start``; returns the next line index"""
+        self._close_blocks()
+        lines = self.lines
+        i = start
+        raw_rows = []
+        while i < len(lines) and lines[i].strip().startswith("|"):
+            raw_rows.append(lines[i].strip())
+            i += 1
+
+        alignments: List[str] = []
+        rows = []
+        for position, row in enumerate(raw_rows):
+            if position == 1 and _TABLE_SEPARATOR_RE.match(row):
+                alignments = _split_cells(row)
+                continue
+            rows.append([parse_inline(cell) for cell in _split_cells(row)])
+        self.blocks.append(Table(rows, alignments))
+        return i
+
+    def _code_block(self, fence: str, i: int) -> int:
+        """Consume a fenced code block whose opening fence was just read"""
+        self._close_blocks()
+        lines = self.lines
+        code = []
+        while i < len(lines) and not lines[i].strip().startswith(fence):
+            code.append(lines[i])
+            i += 1
+        self.blocks.append(CodeBlock(code))
+        return i + 1
+
+    def _flush_paragraph(self):
+        if self.paragraph:
+            text = "".join(self.paragraph).rstrip()
+            self.blocks.append(Paragraph(parse_inline(text), self.paragraph_line))
+            self.paragraph = []
+
+    def _close_lists(self):
+        if self.list_stack:
+            self.list_stack = []
+            self._finalize_lists()
+
+    def _finalize_lists(self):
+        # Only the most recent top-level list can still hold raw item text
+        for block in reversed(self.blocks):
+            if isinstance(block, ListBlock):
+                _finalize_list(block)
+                break
+            if not isinstance(block, Paragraph):
+                break
+
+    def _close_blocks(self):
+        self._flush_paragraph()
+        self._close_lists()
+
+
+def _finalize_list(block: ListBlock):
+    for item in block.items:
+        if isinstance(item.spans, str):
+            item.spans = parse_inline(item.spans)
+        for child in item.children:
+            _finalize_list(child)
+
+
+def _split_cells(row: str) -> List[str]:
+    row = row.strip()
+    if row.startswith("|"):
+        row = row[1:]
+    if row.endswith("|") and not row.endswith("\\|"):
+        row = row[:-1]
+    return [cell.strip() for cell in row.split("|")]
+
+
+def parse_inline(text: str) -> List[Span]:
+    """
+    Parse bold/italic emphasis into styled spans in linear time
+
+    Markers are paired with a stack; unmatched markers are kept as literal
+    text. ``**``/``__`` mark bold and ``*`` marks italic. Single underscores
+    are left alone so identifiers and URLs survive.
+
+    Args:
+        text: Inline text of one block
+
+    Returns:
+        List of (text, style) spans
+    """
+    tokens = [(m.start(), m.end(), m.group()) for m in _INLINE_MARKER_RE.finditer(text)]
+    if not tokens:
+        return [(text, 0)] if text else []
+
+    length = len(text)
+    closes_at = {}
+    stack: List[int] = []
+    for index, (start, end, marker) in enumerate(tokens):
+        if marker[0] == "\\":
+            continue
+        can_open = end < length and not text[end].isspace()
+        can_close = start > 0 and not text[start - 1].isspace()
+        if can_close:
+            # Close the nearest matching opener; openers above it stay literal
+            for depth in range(len(stack) - 1, -1, -1):
+                if tokens[stack[depth]][2] == marker:
+                    closes_at[stack[depth]] = index
+                    del stack[depth:]
+                    break
+            else:
+                depth = None
+            if depth is not None:
+                continue
+        if can_open:
+            stack.append(index)
+
+    closers = set(closes_at.values())
+    spans: List[Span] = []
+    style = 0
+    position = 0
+    for index, (start, end, marker) in enumerate(tokens):
+        if marker[0] == "\\":
+            _append_span(spans, text[position:start] + marker[1], style)
+        elif index in closes_at or index in closers:
+            _append_span(spans, text[position:start], style)
+            style ^= ITALIC if marker == "*" else BOLD
+        else:
+            _append_span(spans, text[position:end], style)
+        position = end
+    _append_span(spans, text[position:], style)
+    return spans
+
+
+def _append_span(spans: List[Span], text: str, style: int):
+    if not text:
+        return
+    if spans and spans[-1][1] == style:
+        spans[-1] = (spans[-1][0] + text, style)
+    else:
+        spans.append((text, style))
+
+
+def plain_text(spans: List[Span]) -> str:
+    """Text of a list of spans without any styling"""
+    return "".join(text for text, _ in spans)
+
+
+def render_markdown(document: Document) -> str:
+    """
+    Render a Document back to normalized Markdown
+
+    Args:
+        document: Parsed document
+
+    Returns:
+        Markdown with one blank line between blocks and balanced emphasis
+    """
+    parts = []
+    for block in document.blocks:
+        if isinstance(block, Heading):
+            parts.append("#" * block.level + " " + render_inline_markdown(block.spans))
+        elif isinstance(block, Paragraph):
+            parts.append(render_inline_markdown(block.spans))
+        elif isinstance(block, ListBlock):
+            lines: List[str] = []
+            _render_list_markdown(block, 0, lines)
+            parts.append("\n".join(lines))
+        elif isinstance(block, Rule):
+            parts.append("---")
+        elif isinstance(block, Table):
+            parts.append(_render_table_markdown(block))
+        elif isinstance(block, CodeBlock):
+            parts.append("\n".join(["```", *block.lines, "```"]))
+    return "\n\n".join(parts)
+
+
+def _render_list_markdown(block: ListBlock, depth: int, lines: List[str]):
+    indent = "   " * depth
+    for number, item in enumerate(block.items, block.start):
+        marker = f"{number}." if block.ordered else "-"
+        lines.append(f"{indent}{marker} {render_inline_markdown(item.spans)}")
+        for child in item.children:
+            _render_list_markdown(child, depth + 1, lines)
+
+
+def _render_table_markdown(table: Table) -> str:
+    lines = []
+    for position, row in enumerate(table.rows):
+        lines.append("| " + " | ".join(render_inline_markdown(cell) for cell in row) + " |")
+        if position == 0:
+            alignments = table.alignments or ["---"] * len(row)
+            lines.append("| " + " | ".join(alignments) + " |")
+    return "\n".join(lines)
+
+
+_MARKDOWN_MARKERS = {BOLD: "**", ITALIC: "*", BOLD | ITALIC: "***"}
+
+
+def render_inline_markdown(spans: List[Span]) -> str:
+    """Render spans as Markdown, escaping literal asterisks and keeping whitespace outside markers"""
+    out = []
+    for text, style in spans:
+        body = text.replace("\\", "\\\\").replace("*", "\\*").replace("__", "\\_\\_").replace("\n", "  \n")
+        core = body.strip()
+        if style and core:
+            marker = _MARKDOWN_MARKERS[style]
+            lead = body[:len(body) - len(body.lstrip())]
+            trail = body[len(body.rstrip()):]
+            out.append(f"{lead}{marker}{core}{marker}{trail}")
+        else:
+            out.append(body)
+    return "".join(out)
+
+
+def pack_document(document: Document) -> tuple:
+    """
+    Convert a Document into nested tuples of strings and ints
+
+    The packed form holds no class instances, so it serializes compactly
+    (e.g. with marshal) for rendering in another process.
+
+    Args:
+        document: Parsed document
+
+    Returns:
+        Tuple of packed blocks; unpack_document restores the Document
+    """
+    return tuple(_pack_block(block) for block in document.blocks)
+
+
+def unpack_document(packed: tuple) -> Document:
+    """Inverse of pack_document"""
+    return Document([_unpack_block(block) for block in packed])
+
+
+def _pack_spans(spans: List[Span]) -> tuple:
+    return tuple((text, style) for text, style in spans)
+
+
+def _pack_list(block: ListBlock) -> tuple:
+    items = tuple((_pack_spans(item.spans), tuple(_pack_list(child) for child in item.children)) for item in block.items)
+    return ("l", block.ordered, block.start, items)
+
+
+def _pack_block(block: object) -> tuple:
+    if isinstance(block, Heading):
+        return ("h", block.level, _pack_spans(block.spans))
+    if isinstance(block, Paragraph):
+        return ("p", _pack_spans(block.spans))
+    if isinstance(block, ListBlock):
+        return _pack_list(block)
+    if isinstance(block, Rule):
+        return ("r",)
+    if isinstance(block, Table):
+        return ("t", tuple(tuple(_pack_spans(cell) for cell in row) for row in block.rows), tuple(block.alignments))
+    if isinstance(block, CodeBlock):
+        return ("c", tuple(block.lines))
+    raise TypeError(f"Cannot pack block of type {type(block).__name__}")
+
+
+def _unpack_spans(packed: tuple) -> List[Span]:
+    return [(text, style) for text, style in packed]
+
+
+def _unpack_list(packed: tuple) -> ListBlock:
+    _, ordered, start, items = packed
+    return ListBlock(ordered, start, [
+        ListItem(_unpack_spans(spans), [_unpack_list(child) for child in children]) for spans, children in items
+    ])
+
+
+def _unpack_block(packed: tuple) -> object:
+    tag = packed[0]
+    if tag == "h":
+        return Heading(packed[1], _unpack_spans(packed[2]))
+    if tag == "p":
+        return Paragraph(_unpack_spans(packed[1]))
+    if tag == "l":
+        return _unpack_list(packed)
+    if tag == "r":
+        return Rule()
+    if tag == "t":
+        return Table([[_unpack_spans(cell) for cell in row] for row in packed[1]], list(packed[2]))
+    if tag == "c":
+        return CodeBlock(list(packed[1]))
+    raise ValueError(f"Unknown packed block tag: {tag!r}")
@@ -0,0 +1,302 @@
+"""
+In-process metrics: counters, latency histograms and stage timing spans
+
+Stages of a generation (prompt preparation, the upstream call and its time
+to first token, retry backoff, formatting and PDF rendering) are timed into
+histograms, and generations, errors, retries and cache lookups are counted.
+Metrics are exported either as Prometheus text on a local HTTP endpoint or
+as periodic structured JSON log lines, depending on METRICS_EXPORT.
+"""
+import bisect
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Any, Iterator, List, Optional, Sequence, Tuple
+from config import METRICS_EXPORT, METRICS_HOST, METRICS_PORT, METRICS_LOG_INTERVAL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from fast local stages up to long generations
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label_value(value)}"' for key, value in pairs) + "}"
+
+
+def _escape_label_value(value: str) -> str:
+    """Escape a label value as the Prometheus text format requires"""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[Tuple[Labels, float]]:
+        with self._lock:
+            return list(self._values.items())
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels, as used by Prometheus"""
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., +Inf count], sum
+        self._series: Dict[Labels, Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _labels(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = ([0] * (len(self.buckets) + 1), [0.0])
+                self._series[key] = series
+            series[0][index] += 1
+            series[1][0] += value
+
+    def snapshot(self) -> Dict[Labels, Dict[str, Any]]:
+        """Cumulative bucket counts, count and sum per label set"""
+        with self._lock:
+            series = {key: (list(counts), total[0]) for key, (counts, total) in self._series.items()}
+        result = {}
+        for key, (counts, total) in series.items():
+            cumulative = []
+            running = 0
+            for count in counts:
+                running += count
+                cumulative.append(running)
+            result[key] = {"buckets": cumulative, "count": running, "sum": total}
+        return result
+
+    def quantile(self, q: float, cumulative: List[int]) -> Optional[float]:
+        """
+        Estimate a quantile from cumulative bucket counts
+
+        Interpolates linearly inside the bucket holding the quantile, like
+        Prometheus' histogram_quantile. Values in the +Inf bucket are reported
+        as the largest finite bound.
+        """
+        total = cumulative[-1] if cumulative else 0
+        if not total:
+            return None
+        rank = q * total
+        for index, count in enumerate(cumulative):
+            if count >= rank:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                previous = cumulative[index - 1] if index else 0
+                in_bucket = count - previous
+                fraction = (rank - previous) / in_bucket if in_bucket else 1.0
+                return lower + (self.buckets[index] - lower) * fraction
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    """Holds every metric and the collectors that report existing component stats"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+        self.stage_seconds = self.histogram(
+            "bizplan_stage_duration_seconds",
+            "Duration of generation stages: prompt, upstream, ttft, retry_backoff, format, pdf",
+        )
+        self.generations = self.counter("bizplan_generations_total", "Plan generations by source and status")
+        self.upstream_requests = self.counter("bizplan_upstream_requests_total", "Upstream LLM calls by outcome")
+        self.errors = self.counter("bizplan_errors_total", "Upstream errors by error class and classification")
+        self.retries = self.counter("bizplan_retries_total", "Retried upstream calls by classification")
+        self.cache_lookups = self.counter("bizplan_cache_lookups_total", "Response cache lookups by result")
+        self.tokens = self.counter("bizplan_tokens_total", "Estimated tokens by direction (input or output)")
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Counter(name, help_text)
+            return self._metrics[name]
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Histogram(name, help_text, buckets)
+            return self._metrics[name]
+
+    def register_collector(self, prefix: str, collect: Callable[[], Dict[str, Any]]):
+        """
+        Report a component's stats() as gauges at export time
+
+        Args:
+            prefix: Gauge name prefix, e.g. "response_cache"
+            collect: Returns a possibly nested dictionary; numbers become
+                gauges and strings become a gauge with a ``value`` label
+        """
+        with self._lock:
+            self._collectors[prefix] = collect
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        """Time the enclosed block into the stage duration histogram"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_seconds.observe(time.perf_counter() - started, stage=stage)
+
+    def gauges(self) -> List[Tuple[str, Labels, float]]:
+        """Current values from every registered collector"""
+        with self._lock:
+            collectors = list(self._collectors.items())
+        gauges: List[Tuple[str, Labels, float]] = []
+        for prefix, collect in collectors:
+            try:
+                _flatten(f"bizplan_{prefix}", collect(), gauges)
+            except Exception as e:
+                logger.warning("Metrics collector %s failed: %s", prefix, e)
+        return gauges
+
+    def render_prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            if isinstance(metric, Counter):
+                lines.append(f"# HELP {metric.name} {metric.help}")
+                lines.append(f"# TYPE {metric.name} counter")
+                for labels, value in metric.samples():
+                    lines.append(f"{metric.name}{_format_labels(labels)} {value:g}")
+            else:
+                lines.append(f"# HELP {metric.name} {metric.help}")
+                lines.append(f"# TYPE {metric.name} histogram")
+                for labels, series in metric.snapshot().items():
+                    for bound, count in zip(metric.buckets, series["buckets"]):
+                        lines.append(f"{metric.name}_bucket{_format_labels(labels, ('le', f'{bound:g}'))} {count}")
+                    lines.append(f"{metric.name}_bucket{_format_labels(labels, ('le', '+Inf'))} {series['count']}")
+                    lines.append(f"{metric.name}_sum{_format_labels(labels)} {series['sum']:g}")
+                    lines.append(f"{metric.name}_count{_format_labels(labels)} {series['count']}")
+        for name, labels, value in self.gauges():
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name}{_format_labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        All metrics as a JSON-serializable dictionary
+
+        Histograms include count, sum and estimated p50/p95/p99 per label set.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        result: Dict[str, Any] = {}
+        for metric in metrics:
+            if isinstance(metric, Counter):
+                result[metric.name] = [{"labels": dict(labels), "value": value} for labels, value in metric.samples()]
+            else:
+                result[metric.name] = [
+                    {
+                        "labels": dict(labels),
+                        "count": series["count"],
+                        "sum": series["sum"],
+                        "p50": metric.quantile(0.50, series["buckets"]),
+                        "p95": metric.quantile(0.95, series["buckets"]),
+                        "p99": metric.quantile(0.99, series["buckets"]),
+                    }
+                    for labels, series in metric.snapshot().items()
+                ]
+        result["gauges"] = [{"name": name, "labels": dict(labels), "value": value} for name, labels, value in self.gauges()]
+        return result
+
+
+def _flatten(prefix: str, stats: Dict[str, Any], gauges: List[Tuple[str, Labels, float]]):
+    for key, value in stats.items():
+        name = f"{prefix}_{key}"
+        if isinstance(value, dict):
+            _flatten(name, value, gauges)
+        elif isinstance(value, bool):
+            gauges.append((name, (), float(value)))
+        elif isinstance(value, (int, float)):
+            gauges.append((name, (), float(value)))
+        elif isinstance(value, str):
+            gauges.append((name, (("value", value),), 1.0))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = get_metrics().render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes are frequent; keep them out of the application log
+        pass
+
+
+def _start_exporter(registry: MetricsRegistry):
+    """Start the configured exporter on a daemon thread"""
+    if METRICS_EXPORT == "prometheus":
+        try:
+            server = ThreadingHTTPServer((METRICS_HOST, METRICS_PORT), _MetricsHandler)
+        except OSError as e:
+            # Another process on this host (e.g. a second worker) already serves the port
+            logger.warning("Metrics endpoint not started on %s:%d: %s", METRICS_HOST, METRICS_PORT, e)
+            return
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        logger.info("Serving Prometheus metrics on http://%s:%d/metrics", METRICS_HOST, METRICS_PORT)
+    elif METRICS_EXPORT == "json":
+        def log_snapshots():
+            while True:
+                time.sleep(METRICS_LOG_INTERVAL_SECONDS)
+                logger.info(json.dumps({"event": "metrics", "timestamp": time.time(), **registry.snapshot()}))
+
+        threading.Thread(target=log_snapshots, name="metrics-log", daemon=True).start()
+
+
+_registry: Optional[MetricsRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsRegistry:
+    """Return the process-wide metrics registry, starting the configured exporter on first use"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = MetricsRegistry()
+            _start_exporter(_registry)
+        return _registry
@@ -0,0 +1,295 @@
+"""
+Near-duplicate detection for plan submissions
+
+Each stored plan's form data is reduced to a MinHash signature of word
+shingles over its normalized field text, and the signatures are bucketed by
+band for locality-sensitive hashing. A query hashes the current form once,
+looks up the plans sharing at least one band bucket and estimates their
+Jaccard similarity from the signatures, which takes well under a millisecond
+and never touches the database or the model.
+
+Signatures use one-permutation hashing: every shingle is hashed once and
+kept as the minimum of the bin it falls into, and empty bins borrow from
+their nearest non-empty neighbour. This replaces one hash per shingle and
+permutation with one hash per shingle. The index lives in memory only, with
+signatures from Python's per-process string hash, and is rebuilt from the
+plan store when the process first needs it.
+"""
+import logging
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from operator import eq
+from typing import Dict, Any, List, Optional, Set, Tuple, Union
+from config import (
+    NEAR_DUPLICATE_BANDS,
+    NEAR_DUPLICATE_ENABLED,
+    NEAR_DUPLICATE_MAX_CANDIDATES,
+    NEAR_DUPLICATE_PERMUTATIONS,
+    NEAR_DUPLICATE_SHINGLE_WORDS,
+    NEAR_DUPLICATE_THRESHOLD,
+)
+from .metrics import get_metrics
+from .plan_store import PlanStore, get_plan_store
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+")
+_EMPTY = 0xFFFFFFFF
+_MASK64 = (1 << 64) - 1
+# Odd 32-bit constant used to give densified bins distinct values per distance
+_DENSIFY_STEP = 0x9E3779B1
+
+
+def normalize_form(form_data: Dict[str, Any]) -> List[List[str]]:
+    """
+    Lower-cased, Unicode-normalized words of each text field, in field order
+
+    Punctuation and whitespace differences do not change the result.
+    """
+    fields = []
+    for key in sorted(form_data):
+        value = form_data[key]
+        if not isinstance(value, str):
+            continue
+        words = _WORD.findall(unicodedata.normalize("NFKC", value).casefold())
+        if words:
+            fields.append(words)
+    return fields
+
+
+def form_shingles(form_data: Dict[str, Any], words: int = NEAR_DUPLICATE_SHINGLE_WORDS) -> Set[Tuple[str, ...]]:
+    """Word n-grams of each field; a field shorter than n words is one shingle"""
+    shingles = set()
+    for field in normalize_form(form_data):
+        if len(field) <= words:
+            shingles.add(tuple(field))
+            continue
+        shingles.update(zip(*(field[offset:] for offset in range(words))))
+    return shingles
+
+
+class NearDuplicateIndex:
+    """In-memory MinHash/LSH index from form text to stored plan IDs"""
+
+    def __init__(
+        self,
+        permutations: int = NEAR_DUPLICATE_PERMUTATIONS,
+        bands: int = NEAR_DUPLICATE_BANDS,
+        shingle_words: int = NEAR_DUPLICATE_SHINGLE_WORDS,
+        max_candidates: int = NEAR_DUPLICATE_MAX_CANDIDATES,
+    ):
+        """
+        Args:
+            permutations: Signature length; more is more accurate and larger
+            bands: LSH bands the signature is split into; more bands find
+                less similar candidates
+            shingle_words: Words per shingle
+            max_candidates: Most candidate plans a query compares signatures with
+
+        Raises:
+            ValueError: If the signature cannot be split evenly into bands
+        """
+        if bands <= 0 or permutations % bands:
+            raise ValueError(f"{permutations} permutations cannot be split into {bands} bands")
+        self.permutations = permutations
+        self.bands = bands
+        self.shingle_words = shingle_words
+        self.max_candidates = max_candidates
+        self._rows = permutations // bands
+        self._lock = threading.Lock()
+        # Signatures of all plans back to back, one per slot
+        self._signatures = array("I")
+        self._plan_ids: List[str] = []
+        # Per band: hash of the band's values -> slot, or list of slots once shared
+        self._buckets: List[Dict[int, Union[int, List[int]]]] = [{} for _ in range(bands)]
+
+        self.queries = 0
+        self.matches = 0
+
+    def __len__(self) -> int:
+        return len(self._plan_ids)
+
+    def signature(self, form_data: Dict[str, Any]) -> Optional[array]:
+        """
+        MinHash signature of a form's text
+
+        Returns:
+            Array of ``permutations`` 32-bit values, or None if the form has no text
+        """
+        k = self.permutations
+        bins = [_EMPTY] * k
+        for shingle in form_shingles(form_data, self.shingle_words):
+            # hash() is salted per process, which is fine for an index that is never persisted
+            h = hash(shingle) & _MASK64
+            slot = h % k
+            value = h >> 32
+            if value < bins[slot]:
+                bins[slot] = value
+        if min(bins) == _EMPTY:
+            return None
+        if max(bins) == _EMPTY:
+            # Densify: an empty bin takes the next filled bin's value, offset by the distance
+            filled = list(bins)
+            for i in range(k):
+                if filled[i] != _EMPTY:
+                    continue
+                distance = 1
+                while filled[(i + distance) % k] == _EMPTY:
+                    distance += 1
+                bins[i] = (filled[(i + distance) % k] + distance * _DENSIFY_STEP) & 0xFFFFFFFF
+        return array("I", bins)
+
+    def add(self, plan_id: str, form_data: Dict[str, Any]) -> bool:
+        """
+        Index a stored plan's form data
+
+        Returns:
+            True if the form had text to index
+        """
+        signature = self.signature(form_data)
+        if signature is None:
+            return False
+        keys = self._band_keys(signature)
+        with self._lock:
+            slot = len(self._plan_ids)
+            self._plan_ids.append(plan_id)
+            self._signatures.extend(signature)
+            for bucket, key in zip(self._buckets, keys):
+                entry = bucket.get(key)
+                if entry is None:
+                    bucket[key] = slot
+                elif isinstance(entry, list):
+                    entry.append(slot)
+                else:
+                    bucket[key] = [entry, slot]
+        return True
+
+    def query(
+        self,
+        form_data: Dict[str, Any],
+        threshold: float = NEAR_DUPLICATE_THRESHOLD,
+        limit: int = 5,
+    ) -> List[Tuple[str, float]]:
+        """
+        Find stored plans whose form text is similar to this form
+
+        Args:
+            form_data: Form inputs to look up
+            threshold: Lowest estimated Jaccard similarity to return, 0 to 1
+            limit: Most matches to return
+
+        Returns:
+            (plan_id, similarity) pairs, most similar first
+        """
+        with get_metrics().span("near_duplicate"):
+            signature = self.signature(form_data)
+            if signature is None:
+                return []
+            keys = self._band_keys(signature)
+            k = self.permutations
+            with self._lock:
+                self.queries += 1
+                entries = [bucket.get(key) for bucket, key in zip(self._buckets, keys)]
+                singles = {entry for entry in entries if isinstance(entry, int)}
+                shared = sorted((entry for entry in entries if isinstance(entry, list)), key=len)
+                # Many near-identical stored forms would make every query verify them all, so only
+                # the newest plans of the most selective buckets are verified beyond the cap
+                candidates = set(singles)
+                for entry in shared:
+                    room = self.max_candidates - len(candidates)
+                    if room <= 0:
+                        break
+                    candidates.update(entry[-room:])
+                found: Dict[str, float] = {}
+                for slot in candidates:
+                    stored = self._signatures[slot * k:(slot + 1) * k]
+                    similarity = sum(map(eq, signature, stored)) / k
+                    if similarity >= threshold:
+                        # A plan saved while the index was first built can be indexed twice
+                        found[self._plan_ids[slot]] = similarity
+                if found:
+                    self.matches += 1
+            return sorted(found.items(), key=lambda match: match[1], reverse=True)[:limit]
+
+    def rebuild(self, store: PlanStore) -> int:
+        """
+        Replace the index contents with every plan in the store
+
+        Returns:
+            Number of plans indexed
+        """
+        fresh = NearDuplicateIndex(self.permutations, self.bands, self.shingle_words, self.max_candidates)
+        for plan_id, form_data in store.iter_forms():
+            fresh.add(plan_id, form_data)
+        with self._lock:
+            self._signatures = fresh._signatures
+            self._plan_ids = fresh._plan_ids
+            self._buckets = fresh._buckets
+        return len(fresh)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Index size and usage for monitoring
+
+        Returns:
+            Dictionary with indexed plans, bucket count, signature bytes, and
+            query and match counters
+        """
+        with self._lock:
+            return {
+                "plans": len(self._plan_ids),
+                "buckets": sum(len(bucket) for bucket in self._buckets),
+                "signature_bytes": self._signatures.itemsize * len(self._signatures),
+                "queries": self.queries,
+                "matches": self.matches,
+            }
+
+    def _band_keys(self, signature: array) -> List[int]:
+        rows = self._rows
+        return [hash(tuple(signature[start:start + rows])) for start in range(0, self.permutations, rows)]
+
+
+_index: Optional[NearDuplicateIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_near_duplicate_index() -> Optional[NearDuplicateIndex]:
+    """
+    Return the process-wide near-duplicate index, building it from the plan store on first call
+
+    Returns:
+        The shared index, or None when near-duplicate detection or plan
+        storage is disabled
+    """
+    global _index
+    if not NEAR_DUPLICATE_ENABLED:
+        return None
+    with _index_lock:
+        if _index is None:
+            store = get_plan_store()
+            if store is None:
+                return None
+            index = NearDuplicateIndex()
+            started = time.perf_counter()
+            count = index.rebuild(store)
+            logger.info("Near-duplicate index built from %d plans in %.2fs", count, time.perf_counter() - started)
+            _index = index
+            get_metrics().register_collector("near_duplicate", _index.stats)
+        return _index
+
+
+def index_plan(plan_id: str, form_data: Dict[str, Any]):
+    """
+    Add a newly stored plan to the shared index
+
+    Does nothing until the index has been built; building it reads the plan
+    from the store anyway.
+    """
+    # Waiting for a build in progress keeps a plan saved meanwhile from being missed
+    with _index_lock:
+        index = _index
+    if index is not None:
+        index.add(plan_id, form_data)
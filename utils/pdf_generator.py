@@ -1,42 +1,71 @@
 """
 PDF generation utilities using ReportLab.
 
-Converts simple Markdown-like content into a readable PDF without external binaries.
+Renders a parsed plan document (see markdown_parser) into a readable PDF without external binaries.
+Named render profiles (config.PDF_PROFILES) trade render time against file size.
 """
+from functools import lru_cache
 from io import BytesIO
-from typing import List
+from typing import Dict, Any, List, Tuple
+from xml.sax.saxutils import escape
+from reportlab.lib import colors
 from reportlab.lib.pagesizes import LETTER
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, ListFlowable, ListItem
+from reportlab.platypus import (
+    SimpleDocTemplate, Paragraph, Spacer, ListFlowable, ListItem, HRFlowable, Preformatted, Table, TableStyle,
+)
 from reportlab.lib.units import inch
+from config import PDF_EXPORT_PROFILE, PDF_PROFILES
+from . import markdown_parser as md
+from .markdown_parser import BOLD, ITALIC, Document, parse_markdown
+from .metrics import get_metrics
 
+MARGIN = 0.8 * inch
+FRAME_WIDTH = LETTER[0] - 2 * MARGIN
+LIST_INDENT = 18
 
-def _split_lines(text: str) -> List[str]:
-    return [line.rstrip() for line in text.splitlines()]
 
-
-def generate_pdf(markdown_text: str, company_name: str) -> bytes:
+def generate_pdf(markdown_text: str, company_name: str, profile: str = PDF_EXPORT_PROFILE) -> bytes:
     """Generate a PDF document from markdown-like text.
 
     Args:
         markdown_text: The business plan content (Markdown-like) to render.
         company_name: Company name for the title header.
+        profile: Render profile name from config.PDF_PROFILES.
 
     Returns:
         PDF bytes suitable for sending to a download button.
     """
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=LETTER,
-        leftMargin=0.8 * inch,
-        rightMargin=0.8 * inch,
-        topMargin=0.8 * inch,
-        bottomMargin=0.8 * inch,
-        title=f"{company_name} Business Plan",
-    )
+    return render_pdf(parse_markdown(markdown_text), company_name, profile)
 
+
+def render_pdf(document: Document, company_name: str, profile: str = PDF_EXPORT_PROFILE) -> bytes:
+    """Render an already parsed plan document to PDF.
+
+    Args:
+        document: Parsed business plan.
+        company_name: Company name for the title header.
+        profile: Render profile name from config.PDF_PROFILES.
+
+    Returns:
+        PDF bytes suitable for sending to a download button.
+    """
+    with get_metrics().span("pdf"):
+        return _render_pdf(document, company_name, profile)
+
+
+def profile_settings(profile: str) -> Dict[str, Any]:
+    """Settings of a render profile, raising ValueError for unknown names."""
+    try:
+        return PDF_PROFILES[profile]
+    except KeyError:
+        raise ValueError(f"Unknown PDF profile {profile!r} (expected one of {', '.join(PDF_PROFILES)})") from None
+
+
+@lru_cache(maxsize=1)
+def _stylesheet() -> Tuple[Any, ParagraphStyle]:
+    """Sample stylesheet and title style, built once per process and only read afterwards."""
     styles = getSampleStyleSheet()
     title_style = ParagraphStyle(
         name="TitleCenter",
@@ -44,52 +73,44 @@ def generate_pdf(markdown_text: str, company_name: str) -> bytes:
         alignment=TA_CENTER,
         spaceAfter=12,
     )
-    heading_style = styles["Heading2"]
-    normal_style = styles["BodyText"]
-
-    story = []
-    # Title
-    story.append(Paragraph(f"{company_name} — Business Plan", title_style))
-    story.append(Spacer(1, 0.2 * inch))
-
-    lines = _split_lines(markdown_text)
-
-    bullet_buffer: List[str] = []
-
-    def flush_bullets():
-        if not bullet_buffer:
-            return
-        items = [ListItem(Paragraph(item, normal_style)) for item in bullet_buffer]
-        story.append(ListFlowable(items, bulletType="bullet"))
-        story.append(Spacer(1, 6))
-        bullet_buffer.clear()
-
-    for raw in lines:
-        line = raw.strip()
-        if not line:
-            flush_bullets()
-            story.append(Spacer(1, 6))
-            continue
-
-        # Detect headings: numeric enumerated headings like "1. Executive Summary"
-        if line[:2].isdigit() or (len(line) > 2 and line[0].isdigit() and line[1] == "."):
-            flush_bullets()
-            story.append(Paragraph(line, heading_style))
-            story.append(Spacer(1, 4))
-            continue
+    return styles, title_style
+
+
+@lru_cache(maxsize=None)
+def _bullet_style(depth: int) -> ParagraphStyle:
+    """Body text indented for a list item at a nesting depth, with room for its bullet."""
+    styles, _ = _stylesheet()
+    return ParagraphStyle(
+        name=f"Bullet{depth}",
+        parent=styles["BodyText"],
+        leftIndent=LIST_INDENT * (depth + 1),
+        bulletIndent=LIST_INDENT * depth + 4,
+        spaceBefore=0,
+        spaceAfter=2,
+    )
 
-        # Detect bullets starting with '-', '*', '•'
-        if line.startswith("- ") or line.startswith("* ") or line.startswith("• "):
-            bullet_buffer.append(line[2:].strip())
-            continue
 
-        # Bold markers cleanup for simple readability
-        clean = line.replace("**", "").replace("__", "")
+def _render_pdf(document: Document, company_name: str, profile: str = PDF_EXPORT_PROFILE) -> bytes:
+    settings = profile_settings(profile)
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=LETTER,
+        leftMargin=MARGIN,
+        rightMargin=MARGIN,
+        topMargin=MARGIN,
+        bottomMargin=MARGIN,
+        title=f"{company_name} Business Plan",
+        pageCompression=1 if settings["page_compression"] else 0,
+    )
 
-        flush_bullets()
-        story.append(Paragraph(clean, normal_style))
+    styles, title_style = _stylesheet()
 
-    flush_bullets()
+    story = []
+    # Title
+    story.append(Paragraph(escape(f"{company_name} — Business Plan"), title_style))
+    story.append(Spacer(1, 0.2 * inch))
+    story.extend(build_story(document, styles, simple_lists=settings["simple_lists"]))
 
     doc.build(story)
     pdf_bytes = buffer.getvalue()
@@ -97,3 +118,88 @@ def generate_pdf(markdown_text: str, company_name: str) -> bytes:
     return pdf_bytes
 
 
+def build_story(document: Document, styles, simple_lists: bool = False) -> List:
+    """Convert document blocks into ReportLab flowables.
+
+    Args:
+        document: Parsed business plan.
+        styles: Stylesheet providing Heading1-3, BodyText and Code.
+        simple_lists: Render lists as bulleted paragraphs instead of
+            ListFlowables, which measure every item twice while wrapping.
+
+    Returns:
+        List of flowables in document order.
+    """
+    heading_styles = {1: styles["Heading1"], 2: styles["Heading2"]}
+    normal_style = styles["BodyText"]
+    story = []
+    for block in document.blocks:
+        if isinstance(block, md.Heading):
+            story.append(Paragraph(inline_markup(block.spans), heading_styles.get(block.level, styles["Heading3"])))
+            story.append(Spacer(1, 4))
+        elif isinstance(block, md.Paragraph):
+            story.append(Paragraph(inline_markup(block.spans), normal_style))
+            story.append(Spacer(1, 6))
+        elif isinstance(block, md.ListBlock):
+            if simple_lists:
+                story.extend(_list_paragraphs(block, 0))
+            else:
+                story.append(_list_flowable(block, normal_style))
+            story.append(Spacer(1, 6))
+        elif isinstance(block, md.Rule):
+            story.append(HRFlowable(width="100%", thickness=0.5, color=colors.grey, spaceBefore=4, spaceAfter=8))
+        elif isinstance(block, md.Table):
+            story.append(_table_flowable(block, normal_style))
+            story.append(Spacer(1, 6))
+        elif isinstance(block, md.CodeBlock):
+            story.append(Preformatted("\n".join(block.lines), styles["Code"]))
+            story.append(Spacer(1, 6))
+    return story
+
+
+def inline_markup(spans: List[md.Span]) -> str:
+    """Convert styled spans into ReportLab paragraph markup, escaping the text."""
+    parts = []
+    for text, style in spans:
+        markup = escape(text).replace("\n", "<br/>")
+        if style & ITALIC:
+            markup = f"<i>{markup}</i>"
+        if style & BOLD:
+            markup = f"<b>{markup}</b>"
+        parts.append(markup)
+    return "".join(parts)
+
+
+def _list_flowable(block: md.ListBlock, style) -> ListFlowable:
+    items = []
+    for item in block.items:
+        flowables = [Paragraph(inline_markup(item.spans), style)]
+        flowables.extend(_list_flowable(child, style) for child in item.children)
+        items.append(ListItem(flowables if len(flowables) > 1 else flowables[0]))
+    if block.ordered:
+        return ListFlowable(items, bulletType="1", start=block.start)
+    return ListFlowable(items, bulletType="bullet")
+
+
+def _list_paragraphs(block: md.ListBlock, depth: int) -> List:
+    style = _bullet_style(depth)
+    paragraphs = []
+    for number, item in enumerate(block.items, block.start):
+        bullet = f"{number}." if block.ordered else "•"
+        paragraphs.append(Paragraph(inline_markup(item.spans), style, bulletText=bullet))
+        for child in item.children:
+            paragraphs.extend(_list_paragraphs(child, depth + 1))
+    return paragraphs
+
+
+def _table_flowable(block: md.Table, style) -> Table:
+    rows = [[Paragraph(inline_markup(cell), style) for cell in row] for row in block.rows]
+    width = max(len(row) for row in rows)
+    rows = [row + [""] * (width - len(row)) for row in rows]
+    table = Table(rows, colWidths=[FRAME_WIDTH / width] * width, repeatRows=1)
+    table.setStyle(TableStyle([
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+        ("BACKGROUND", (0, 0), (-1, 0), colors.whitesmoke),
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+    ]))
+    return table
@@ -0,0 +1,243 @@
+"""
+Warm process pool for PDF rendering
+
+ReportLab's ``doc.build`` is pure Python and CPU-bound, so rendering on the
+Streamlit script thread holds the GIL and stalls every other session on the
+server while an export is built. The pool renders in worker processes that
+import ReportLab and render a small warm-up document (loading the stylesheet
+and font metrics) when they start. Documents are sent as marshalled tuples
+(see markdown_parser.pack_document) rather than as parsed objects, and the
+number of renders waiting for a worker is bounded.
+
+ReportLab is never imported in the calling process unless the pool is
+disabled or cannot start, in which case rendering falls back to the calling
+thread.
+"""
+import atexit
+import logging
+import marshal
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, Optional
+from config import PDF_EXPORT_PROFILE, PDF_POOL_MAX_PENDING, PDF_POOL_WORKERS, PDF_PROFILES, PDF_RENDER_TIMEOUT_SECONDS
+from .markdown_parser import Document, pack_document, unpack_document
+from .metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class PDFPoolBusy(Exception):
+    """Raised when too many PDFs are already waiting for a render worker"""
+
+
+def _warm_worker():
+    """Worker initializer: load ReportLab and render once per profile so styles and fonts are ready"""
+    from .markdown_parser import parse_markdown
+    from .pdf_generator import _render_pdf
+
+    document = parse_markdown("# Warm-up\n\nLoads **styles** and *fonts*.\n\n- one\n   - nested\n- two")
+    for profile in PDF_PROFILES:
+        _render_pdf(document, "Warm-up", profile)
+
+
+def _ping() -> bool:
+    return True
+
+
+def _render_packed(payload: bytes, company_name: str, profile: str) -> bytes:
+    """Worker entry point: rebuild the document and render it"""
+    from .pdf_generator import _render_pdf
+
+    return _render_pdf(unpack_document(marshal.loads(payload)), company_name, profile)
+
+
+class PDFRenderPool:
+    """Bounded queue of PDF renders served by pre-warmed worker processes"""
+
+    def __init__(
+        self,
+        workers: int = PDF_POOL_WORKERS,
+        max_pending: int = PDF_POOL_MAX_PENDING,
+        timeout_seconds: float = PDF_RENDER_TIMEOUT_SECONDS,
+    ):
+        """
+        Args:
+            workers: Number of render processes; 0 renders in the calling thread
+            max_pending: Renders allowed to wait for a worker beyond those running
+            timeout_seconds: Longest a caller waits for its PDF
+        """
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout_seconds = timeout_seconds
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+
+        self.rendered = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.failures = 0
+        self.restarts = 0
+        self.in_process = 0
+
+        if workers > 0:
+            self._start()
+
+    def render(self, document: Document, company_name: str, profile: str = PDF_EXPORT_PROFILE) -> bytes:
+        """
+        Render a parsed plan document to PDF in a worker process
+
+        Args:
+            document: Parsed business plan
+            company_name: Company name for the title header
+            profile: Render profile name from config.PDF_PROFILES
+
+        Returns:
+            PDF bytes
+
+        Raises:
+            PDFPoolBusy: If the pool and its queue are both full
+            ValueError: If the profile is unknown
+            TimeoutError: If the PDF is not ready within the timeout
+            Exception: Whatever rendering raised in the worker
+        """
+        if profile not in PDF_PROFILES:
+            raise ValueError(f"Unknown PDF profile {profile!r} (expected one of {', '.join(PDF_PROFILES)})")
+        with get_metrics().span("pdf"):
+            executor = self._reserve()
+            if executor is None:
+                from .pdf_generator import _render_pdf
+
+                with self._lock:
+                    self.in_process += 1
+                return _render_pdf(document, company_name, profile)
+
+            payload = marshal.dumps(pack_document(document))
+            try:
+                future = executor.submit(_render_packed, payload, company_name, profile)
+            except BrokenProcessPool:
+                # A worker died since the last render; nothing was sent, so retry once on a new pool
+                self._release()
+                self._restart(executor)
+                executor = self._reserve()
+                if executor is None:
+                    raise
+                try:
+                    future = executor.submit(_render_packed, payload, company_name, profile)
+                except BaseException:
+                    self._release()
+                    raise
+            except BaseException:
+                self._release()
+                raise
+            future.add_done_callback(lambda _: self._release())
+            try:
+                pdf_bytes = future.result(timeout=self.timeout_seconds)
+            except FutureTimeoutError:
+                # A render already running cannot be interrupted; its slot frees when it ends
+                future.cancel()
+                with self._lock:
+                    self.timeouts += 1
+                raise TimeoutError(f"PDF rendering took longer than {self.timeout_seconds}s") from None
+            except BrokenProcessPool:
+                self._restart(executor)
+                raise
+            except Exception:
+                with self._lock:
+                    self.failures += 1
+                raise
+            with self._lock:
+                self.rendered += 1
+            return pdf_bytes
+
+    def shutdown(self):
+        """Stop the worker processes, letting running renders finish"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Pool counters for monitoring
+
+        Returns:
+            Dictionary with workers, queued and running renders, and lifetime counters
+        """
+        with self._lock:
+            return {
+                "workers": self.workers if self._executor is not None else 0,
+                "pending": self._pending,
+                "rendered": self.rendered,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "failures": self.failures,
+                "restarts": self.restarts,
+                "in_process": self.in_process,
+            }
+
+    def _start(self):
+        """Create the executor and start every worker, so their warm-up runs now"""
+        # Forking a process that runs Streamlit's threads can copy held locks; spawn starts clean
+        context = multiprocessing.get_context("spawn")
+        try:
+            executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context, initializer=_warm_worker)
+            # Workers are spawned on demand; one task per worker starts them all
+            for _ in range(self.workers):
+                executor.submit(_ping)
+        except (OSError, RuntimeError) as e:
+            logger.warning("PDF render pool unavailable, rendering in-process: %s", e)
+            executor = None
+        self._executor = executor
+
+    def _restart(self, broken: ProcessPoolExecutor):
+        """Replace a pool whose worker died, unless another caller already did"""
+        with self._lock:
+            if self._executor is not broken:
+                return
+            self.restarts += 1
+            self._start()
+        logger.warning("PDF render worker died; pool restarted")
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _reserve(self) -> Optional[ProcessPoolExecutor]:
+        """Claim a queue slot, returning the executor, or None to render in-process"""
+        with self._lock:
+            if self._executor is None:
+                return None
+            if self._pending >= self.workers + self.max_pending:
+                self.rejected += 1
+                raise PDFPoolBusy(f"{self._pending} PDFs are already being rendered or queued")
+            self._pending += 1
+            return self._executor
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+
+
+_pool: Optional[PDFRenderPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pdf_pool() -> PDFRenderPool:
+    """
+    Return the process-wide PDF render pool, starting its workers on first call
+
+    Calling this early (e.g. when the generate step opens) lets the workers
+    finish warming up before the first export is requested.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PDFRenderPool()
+            get_metrics().register_collector("pdf_pool", _pool.stats)
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def render_pdf(document: Document, company_name: str, profile: str = PDF_EXPORT_PROFILE) -> bytes:
+    """Render a parsed plan document with the shared pool; see PDFRenderPool.render"""
+    return get_pdf_pool().render(document, company_name, profile)
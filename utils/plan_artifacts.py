@@ -0,0 +1,74 @@
+"""
+Lazily built, memoized export artifacts for a generated business plan
+"""
+import hashlib
+from typing import Dict, Optional
+from config import PDF_EXPORT_PROFILE
+from .business_plan_formatter import BusinessPlanFormatter
+from .markdown_parser import Document, parse_markdown
+
+
+def plan_content_hash(plan_content: str, company_name: str) -> str:
+    """Content hash identifying a plan and everything derived from it"""
+    payload = f"{company_name}\0{plan_content}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+class PlanArtifacts:
+    """A generated plan and its derived artifacts, each built once on first request"""
+
+    def __init__(self, plan_content: str, company_name: str):
+        """
+        Args:
+            plan_content: Raw business plan content from AI
+            company_name: Name of the company
+        """
+        self.plan_content = plan_content
+        self.company_name = company_name
+        self.content_hash = plan_content_hash(plan_content, company_name)
+        self._document: Optional[Document] = None
+        self._header: Optional[str] = None
+        self._formatted_markdown: Optional[str] = None
+        self._pdf_bytes: Dict[str, bytes] = {}
+
+    def document(self) -> Document:
+        """Parsed plan content shared by every renderer, parsed on first call"""
+        if self._document is None:
+            self._document = parse_markdown(self.plan_content)
+        return self._document
+
+    def header(self) -> str:
+        """Plan header, fixed on first call so Markdown and PDF show the same date"""
+        if self._header is None:
+            self._header = BusinessPlanFormatter().format_header(self.company_name)
+        return self._header
+
+    def formatted_markdown(self) -> str:
+        """Formatted Markdown with the plan header, built on first call"""
+        if self._formatted_markdown is None:
+            self._formatted_markdown = BusinessPlanFormatter().format_document(
+                self.document(), self.company_name, self.header()
+            )
+        return self._formatted_markdown
+
+    def pdf_bytes(self, profile: str = PDF_EXPORT_PROFILE) -> bytes:
+        """
+        PDF rendering of the formatted plan, built on first call per profile
+
+        Args:
+            profile: Render profile name from config.PDF_PROFILES
+
+        Raises:
+            PDFPoolBusy: If too many PDFs are already queued for rendering
+            Exception: If PDF generation fails; the failure is not cached, so a
+                later call tries again
+        """
+        if profile not in self._pdf_bytes:
+            # Rendered in the warm worker pool, off this process's GIL
+            from .pdf_pool import render_pdf
+
+            # Only the short header is parsed here; the plan body reuses the shared document
+            header = parse_markdown(self.header())
+            document = Document(header.blocks + self.document().blocks)
+            self._pdf_bytes[profile] = render_pdf(document, self.company_name, profile)
+        return self._pdf_bytes[profile]
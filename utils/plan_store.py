@@ -0,0 +1,348 @@
+"""
+Durable store for generated business plans
+
+Plans are saved to a SQLite file together with the form data they were
+generated from. Plan bodies are zlib-compressed and deduplicated by content
+hash, and a full-text index over the plan text, company name and target
+market supports search.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from typing import Dict, Any, Iterator, List, Optional, Sequence, Tuple
+from config import PLAN_STORE_ENABLED, PLAN_STORE_PATH
+from utils.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# Columns of the full-text index that a search can be restricted to
+SEARCH_FIELDS = ("company_name", "target_market", "body")
+
+# plans.seq is an explicit rowid so that VACUUM cannot renumber it; it is
+# also the rowid of the plan's row in the contentless full-text index
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS plan_bodies (
+    hash TEXT PRIMARY KEY,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS plans (
+    seq INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    created_at REAL NOT NULL,
+    company_name TEXT NOT NULL,
+    target_market TEXT NOT NULL,
+    form_data BLOB NOT NULL,
+    body_hash TEXT NOT NULL REFERENCES plan_bodies (hash),
+    source TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS plans_created ON plans (created_at);
+CREATE INDEX IF NOT EXISTS plans_body ON plans (body_hash);
+CREATE VIRTUAL TABLE IF NOT EXISTS plans_fts USING fts5 (
+    company_name, target_market, body,
+    content='', tokenize='porter unicode61'
+);
+"""
+
+
+def _compress(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"), 6)
+
+
+def _decompress(blob: bytes) -> str:
+    return zlib.decompress(blob).decode("utf-8")
+
+
+def body_hash(plan_content: str) -> str:
+    """Content hash under which a plan body is stored once"""
+    return hashlib.sha256(plan_content.encode("utf-8")).hexdigest()
+
+
+class PlanStore:
+    """SQLite-backed plan history with compressed, deduplicated bodies and full-text search"""
+
+    def __init__(self, db_path: str = PLAN_STORE_PATH):
+        """
+        Args:
+            db_path: Path of the SQLite file, created if needed
+
+        Raises:
+            sqlite3.Error: If the database cannot be opened
+        """
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def save(self, form_data: Dict[str, Any], plan_content: str, source: str = "app") -> str:
+        """
+        Store a generated plan with the form data it was generated from
+
+        Args:
+            form_data: Form inputs the plan was generated from
+            plan_content: Raw plan text
+            source: Where the plan came from, e.g. "app" or "batch"
+
+        Returns:
+            ID of the stored plan
+        """
+        plan_id = uuid.uuid4().hex
+        content_hash = body_hash(plan_content)
+        company_name = str(form_data.get("company_name", ""))
+        target_market = str(form_data.get("target_market", ""))
+        form_blob = _compress(json.dumps(form_data, sort_keys=True, separators=(",", ":")))
+
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                exists = conn.execute("SELECT 1 FROM plan_bodies WHERE hash = ?", (content_hash,)).fetchone()
+                if not exists:
+                    conn.execute(
+                        "INSERT INTO plan_bodies (hash, body, size) VALUES (?, ?, ?)",
+                        (content_hash, _compress(plan_content), len(plan_content.encode("utf-8"))),
+                    )
+                cursor = conn.execute(
+                    "INSERT INTO plans (id, created_at, company_name, target_market, form_data, body_hash, source) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (plan_id, time.time(), company_name, target_market, form_blob, content_hash, source),
+                )
+                conn.execute(
+                    "INSERT INTO plans_fts (rowid, company_name, target_market, body) VALUES (?, ?, ?, ?)",
+                    (cursor.lastrowid, company_name, target_market, plan_content),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return plan_id
+
+    def get(self, plan_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Load a stored plan by ID
+
+        Returns:
+            Dictionary with id, created_at, company_name, target_market,
+            source, form_data and content, or None if there is no such plan
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT p.id, p.created_at, p.company_name, p.target_market, p.source, p.form_data, b.body "
+                "FROM plans p JOIN plan_bodies b ON b.hash = p.body_hash WHERE p.id = ?",
+                (plan_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        summary = self._summary(row[:5])
+        summary["form_data"] = json.loads(_decompress(row[5]))
+        summary["content"] = _decompress(row[6])
+        return summary
+
+    def search(
+        self,
+        query: str,
+        limit: int = 20,
+        fields: Optional[Sequence[str]] = None,
+        by_relevance: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Full-text search over stored plans
+
+        Every word of the query must match; the last word also matches as a
+        prefix, so partially typed searches work.
+
+        Args:
+            query: Free-text query
+            limit: Maximum number of results
+            fields: Restrict matching to these of SEARCH_FIELDS
+            by_relevance: Rank by BM25 instead of newest first. Ranking has to
+                score every match, so it is slower for very common words
+
+        Returns:
+            Plan summaries (id, created_at, company_name, target_market, source)
+        """
+        match = self._match_expression(query, fields)
+        if not match:
+            return []
+        order = "ORDER BY plans_fts.rank" if by_relevance else "ORDER BY plans_fts.rowid DESC"
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT p.id, p.created_at, p.company_name, p.target_market, p.source "
+                f"FROM plans_fts JOIN plans p ON p.rowid = plans_fts.rowid "
+                f"WHERE plans_fts MATCH ? {order} LIMIT ?",
+                (match, limit),
+            ).fetchall()
+        return [self._summary(row) for row in rows]
+
+    def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Summaries of the most recently stored plans, newest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, created_at, company_name, target_market, source FROM plans ORDER BY created_at DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [self._summary(row) for row in rows]
+
+    def iter_forms(self, batch_size: int = 1000) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Iterate over (plan_id, form_data) for every stored plan, oldest first
+
+        Rows are read in batches so the whole table is never held in memory.
+        """
+        last_rowid = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT rowid, id, form_data FROM plans WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (last_rowid, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            for rowid, plan_id, form_blob in rows:
+                yield plan_id, json.loads(_decompress(form_blob))
+            last_rowid = rows[-1][0]
+
+    def delete(self, plan_id: str) -> bool:
+        """
+        Delete a plan; its body is removed once no other plan shares it
+
+        Returns:
+            True if the plan existed
+        """
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT p.rowid, p.company_name, p.target_market, p.body_hash, b.body "
+                    "FROM plans p JOIN plan_bodies b ON b.hash = p.body_hash WHERE p.id = ?",
+                    (plan_id,),
+                ).fetchone()
+                if row is None:
+                    conn.execute("ROLLBACK")
+                    return False
+                rowid, company_name, target_market, content_hash, body = row
+                # A contentless index is updated by replaying the indexed values
+                conn.execute(
+                    "INSERT INTO plans_fts (plans_fts, rowid, company_name, target_market, body) "
+                    "VALUES ('delete', ?, ?, ?, ?)",
+                    (rowid, company_name, target_market, _decompress(body)),
+                )
+                conn.execute("DELETE FROM plans WHERE rowid = ?", (rowid,))
+                conn.execute(
+                    "DELETE FROM plan_bodies WHERE hash = ? AND NOT EXISTS "
+                    "(SELECT 1 FROM plans WHERE body_hash = ?)",
+                    (content_hash, content_hash),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Storage figures for monitoring
+
+        Returns:
+            Dictionary with plan and distinct body counts, and the raw and
+            compressed size of the stored bodies
+        """
+        with self._lock:
+            plans = self._conn.execute("SELECT COUNT(*) FROM plans").fetchone()[0]
+            bodies, raw_bytes, stored_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(body)), 0) FROM plan_bodies"
+            ).fetchone()
+        return {
+            "plans": plans,
+            "bodies": bodies,
+            "raw_bytes": raw_bytes,
+            "stored_bytes": stored_bytes,
+        }
+
+    @staticmethod
+    def _match_expression(query: str, fields: Optional[Sequence[str]]) -> str:
+        """Turn free text into an FTS5 query of quoted terms, so user input is never parsed as syntax"""
+        terms = ['"' + term.replace('"', '""') + '"' for term in query.split()]
+        if not terms:
+            return ""
+        terms[-1] += "*"
+        expression = " ".join(terms)
+        if fields:
+            unknown = set(fields) - set(SEARCH_FIELDS)
+            if unknown:
+                raise ValueError(f"Unknown search fields: {', '.join(sorted(unknown))}")
+            expression = "{" + " ".join(fields) + "} : (" + expression + ")"
+        return expression
+
+    @staticmethod
+    def _summary(row: Sequence[Any]) -> Dict[str, Any]:
+        plan_id, created_at, company_name, target_market, source = row
+        return {
+            "id": plan_id,
+            "created_at": created_at,
+            "company_name": company_name,
+            "target_market": target_market,
+            "source": source,
+        }
+
+
+_store: Optional[PlanStore] = None
+_store_lock = threading.Lock()
+
+
+def get_plan_store() -> Optional[PlanStore]:
+    """
+    Return the process-wide plan store
+
+    Returns:
+        The shared PlanStore, or None when storage is disabled or the database
+        cannot be opened
+    """
+    global _store
+    if not PLAN_STORE_ENABLED:
+        return None
+    with _store_lock:
+        if _store is None:
+            try:
+                _store = PlanStore()
+                get_metrics().register_collector("plan_store", _store.stats)
+            except sqlite3.Error as e:
+                logger.warning("Plan store disabled (%s): %s", PLAN_STORE_PATH, e)
+                return None
+        return _store
+
+
+def save_plan(form_data: Dict[str, Any], plan_content: str, source: str) -> Optional[str]:
+    """
+    Save a plan to the shared store if storage is enabled
+
+    Storage problems are logged rather than raised, so a generated plan is
+    never lost to the user because it could not be archived.
+
+    Returns:
+        ID of the stored plan, or None if it was not stored
+    """
+    store = get_plan_store()
+    if store is None:
+        return None
+    try:
+        plan_id = store.save(form_data, plan_content, source)
+    except sqlite3.Error as e:
+        logger.warning("Could not store generated plan: %s", e)
+        return None
+    # Imported here because the index is rebuilt from this module's store
+    from .near_duplicate import index_plan
+    index_plan(plan_id, form_data)
+    return plan_id
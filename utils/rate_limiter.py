@@ -0,0 +1,420 @@
+"""
+Shared rate limiting, retry classification and circuit breaking for Gemini calls
+
+Every API client in the process goes through the same limiter and breaker, so
+sessions back off together instead of hammering a degraded upstream in
+lockstep.
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Any, AsyncIterator, Iterator, Optional
+from config import (
+    RATE_LIMIT_REQUESTS_PER_MINUTE,
+    RATE_LIMIT_BURST,
+    RATE_LIMIT_MAX_WAIT_SECONDS,
+    MAX_CONCURRENT_REQUESTS,
+    BACKOFF_BASE_SECONDS,
+    BACKOFF_MAX_SECONDS,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_SECONDS,
+)
+from utils.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# Upstream status codes worth retrying; anything else in the 4xx range is fatal
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a request would have to wait longer than allowed for a slot"""
+
+
+class CircuitOpenError(Exception):
+    """Raised while the circuit breaker is failing fast"""
+
+
+class ErrorClassification:
+    """Whether an error is worth retrying and how long the server asked us to wait"""
+
+    def __init__(self, retryable: bool, kind: str, retry_after: Optional[float] = None):
+        self.retryable = retryable
+        self.kind = kind
+        self.retry_after = retry_after
+
+
+def classify_error(error: Exception) -> ErrorClassification:
+    """
+    Classify an exception raised by a generation call
+
+    Args:
+        error: Exception raised by the SDK or by the client itself
+
+    Returns:
+        ErrorClassification describing how the caller should react
+    """
+    if isinstance(error, (CircuitOpenError, RateLimitExceeded)):
+        return ErrorClassification(False, type(error).__name__)
+
+    # Errors of this package that can never succeed on retry say so themselves
+    if getattr(error, "retryable", None) is False:
+        return ErrorClassification(False, type(error).__name__)
+
+    retry_after = _retry_after(error)
+    status = _status_code(error)
+    if status is not None:
+        kind = "rate_limited" if status == 429 else f"http_{status}"
+        return ErrorClassification(status in RETRYABLE_STATUS_CODES, kind, retry_after)
+
+    # Prompt/safety blocks and bad arguments will fail the same way every time
+    if type(error).__name__ in ("BlockedPromptException", "StopCandidateException") or isinstance(error, (ValueError, TypeError)):
+        return ErrorClassification(False, type(error).__name__)
+
+    # Network hiccups, timeouts and empty responses are transient
+    return ErrorClassification(True, type(error).__name__, retry_after)
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    """HTTP status of an API error, if it carries one"""
+    # google.api_core errors expose the HTTP equivalent of their status as ``code``
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return int(code)
+    return None
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Server-provided retry delay from a Retry-After header or a RetryInfo detail"""
+    explicit = getattr(error, "retry_after", None)
+    if isinstance(explicit, (int, float)):
+        return float(explicit)
+
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    header = headers.get("Retry-After") if hasattr(headers, "get") else None
+    if header:
+        try:
+            return float(header)
+        except ValueError:
+            pass
+
+    for detail in getattr(error, "details", None) or []:
+        delay = getattr(detail, "retry_delay", None)
+        if delay is not None:
+            return getattr(delay, "seconds", 0) + getattr(delay, "nanos", 0) / 1e9
+    return None
+
+
+class Backoff:
+    """Decorrelated-jitter backoff that defers to server hints when they are given"""
+
+    def __init__(self, base: float = BACKOFF_BASE_SECONDS, cap: float = BACKOFF_MAX_SECONDS):
+        self.base = base
+        self.cap = cap
+        self._previous = base
+
+    def next_delay(self, retry_after: Optional[float] = None) -> float:
+        """
+        Delay before the next attempt
+
+        Args:
+            retry_after: Delay requested by the server, if any
+
+        Returns:
+            Seconds to wait
+
+        Raises:
+            RateLimitExceeded: If the server asks for a longer wait than the cap
+        """
+        if retry_after is not None:
+            if retry_after > self.cap:
+                raise RateLimitExceeded(f"Upstream asked to retry after {retry_after:.0f}s")
+            delay = retry_after
+        else:
+            delay = min(self.cap, random.uniform(self.base, self._previous * 3))
+        self._previous = max(delay, self.base)
+        return delay
+
+
+class TokenBucket:
+    """Classic token bucket; acquisition never blocks, it reports the wait instead"""
+
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def try_acquire(self) -> float:
+        """
+        Take a token if one is available
+
+        Returns:
+            0.0 if a token was taken, otherwise the seconds until one will be
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Per-key token buckets plus a process-wide cap on concurrent upstream calls"""
+
+    def __init__(
+        self,
+        requests_per_minute: float = RATE_LIMIT_REQUESTS_PER_MINUTE,
+        burst: int = RATE_LIMIT_BURST,
+        max_concurrent: int = MAX_CONCURRENT_REQUESTS,
+        max_wait_seconds: float = RATE_LIMIT_MAX_WAIT_SECONDS,
+    ):
+        self.rate_per_second = requests_per_minute / 60.0
+        self.burst = burst
+        self.max_concurrent = max_concurrent
+        self.max_wait_seconds = max_wait_seconds
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._concurrency = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+
+        self.in_flight = 0
+        self.throttled = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+
+    def reserve(self, key_id: str) -> float:
+        """
+        Non-blocking check of a key's request budget
+
+        Args:
+            key_id: Fingerprint of the API key
+
+        Returns:
+            0.0 if the request may proceed now, otherwise the seconds to wait
+        """
+        with self._lock:
+            bucket = self._buckets.get(key_id)
+            if bucket is None:
+                bucket = self._buckets[key_id] = TokenBucket(self.rate_per_second, self.burst)
+            return bucket.try_acquire()
+
+    @contextmanager
+    def slot(self, key_id: str) -> Iterator[None]:
+        """
+        Hold a request slot for the duration of an upstream call
+
+        Waits for the key's token bucket and the global concurrency limit, but
+        never longer than ``max_wait_seconds`` in total.
+
+        Args:
+            key_id: Fingerprint of the API key
+
+        Raises:
+            RateLimitExceeded: If no slot becomes available in time
+        """
+        started = time.monotonic()
+        deadline = started + self.max_wait_seconds
+        waited = False
+        while True:
+            wait = self.reserve(key_id)
+            if wait == 0.0:
+                break
+            if time.monotonic() + wait > deadline:
+                self._reject()
+                raise RateLimitExceeded("Too many requests for this API key; please wait a moment and try again")
+            waited = True
+            time.sleep(wait)
+
+        if not self._concurrency.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            self._reject()
+            raise RateLimitExceeded("The server is at capacity; please try again shortly")
+
+        self._enter(started, waited)
+        try:
+            yield
+        finally:
+            self._exit()
+
+    @asynccontextmanager
+    async def aslot(self, key_id: str) -> AsyncIterator[None]:
+        """
+        Async variant of slot, sharing the same buckets and concurrency limit
+
+        Waiting happens on the event loop, so many callers can queue for a
+        slot without each holding a thread.
+
+        Args:
+            key_id: Fingerprint of the API key
+
+        Raises:
+            RateLimitExceeded: If no slot becomes available in time
+        """
+        started = time.monotonic()
+        deadline = started + self.max_wait_seconds
+        waited = False
+        while True:
+            wait = self.reserve(key_id)
+            if wait == 0.0:
+                break
+            if time.monotonic() + wait > deadline:
+                self._reject()
+                raise RateLimitExceeded("Too many requests for this API key; please wait a moment and try again")
+            waited = True
+            await asyncio.sleep(wait)
+
+        # The semaphore is shared with threaded callers, so poll it without blocking the loop
+        poll = 0.005
+        while not self._concurrency.acquire(blocking=False):
+            if time.monotonic() + poll > deadline:
+                self._reject()
+                raise RateLimitExceeded("The server is at capacity; please try again shortly")
+            await asyncio.sleep(poll)
+            poll = min(poll * 2, 0.1)
+
+        self._enter(started, waited)
+        try:
+            yield
+        finally:
+            self._exit()
+
+    def _enter(self, started: float, waited: bool):
+        with self._lock:
+            if waited:
+                self.throttled += 1
+            self.wait_seconds_total += time.monotonic() - started
+            self.in_flight += 1
+
+    def _exit(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._concurrency.release()
+
+    def _reject(self):
+        with self._lock:
+            self.rejected += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Limiter counters for monitoring
+
+        Returns:
+            Dictionary with in-flight calls, throttled and rejected requests
+        """
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "max_concurrent": self.max_concurrent,
+                "tracked_keys": len(self._buckets),
+                "throttled": self.throttled,
+                "rejected": self.rejected,
+                "wait_seconds_total": self.wait_seconds_total,
+            }
+
+
+class CircuitBreaker:
+    """Fails fast after repeated upstream failures, probing again after a cool-down"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_seconds: float = CIRCUIT_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """
+        Check whether a call may go upstream
+
+        Raises:
+            CircuitOpenError: While the breaker is open, or while a half-open
+                probe is already in flight
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_seconds:
+                    raise CircuitOpenError("The AI service is temporarily unavailable; please try again shortly")
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    raise CircuitOpenError("The AI service is recovering; please try again shortly")
+                self._probe_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.trips += 1
+                    logger.warning("Circuit breaker opened after %d consecutive failures", self.consecutive_failures)
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        """Forget an in-flight probe that ended without a success or an upstream failure"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Breaker state for monitoring
+
+        Returns:
+            Dictionary with the current state, failure streak and trip count
+        """
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "trips": self.trips,
+            }
+
+
+_limiter: Optional[RateLimiter] = None
+_breaker: Optional[CircuitBreaker] = None
+_singleton_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Return the process-wide rate limiter"""
+    global _limiter
+    with _singleton_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+            get_metrics().register_collector("rate_limiter", _limiter.stats)
+        return _limiter
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """Return the process-wide circuit breaker for the Gemini upstream"""
+    global _breaker
+    with _singleton_lock:
+        if _breaker is None:
+            _breaker = CircuitBreaker()
+            get_metrics().register_collector("circuit_breaker", _breaker.stats)
+        return _breaker
+
+
+def rate_limit_stats() -> Dict[str, Any]:
+    """Combined limiter and breaker state, for metrics and debugging"""
+    return {"limiter": get_rate_limiter().stats(), "circuit_breaker": get_circuit_breaker().stats()}
@@ -0,0 +1,245 @@
+"""
+Two-tier response cache for generated business plans
+
+Responses are kept in an in-process LRU and mirrored to a SQLite file so they
+survive restarts and are shared between worker processes on the same host.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from config import (
+    CACHE_ENABLED,
+    CACHE_MEMORY_SIZE,
+    CACHE_DB_PATH,
+    CACHE_TTL_SECONDS,
+    CACHE_MAX_DISK_BYTES,
+)
+from utils.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# Least recently used rows read per query while evicting for size
+_EVICT_BATCH = 32
+
+
+class ResponseCache:
+    """In-memory LRU backed by a SQLite table with TTL and size-based eviction"""
+
+    def __init__(
+        self,
+        db_path: Optional[str] = CACHE_DB_PATH,
+        memory_size: int = CACHE_MEMORY_SIZE,
+        ttl_seconds: int = CACHE_TTL_SECONDS,
+        max_disk_bytes: int = CACHE_MAX_DISK_BYTES,
+    ):
+        """
+        Args:
+            db_path: Path of the SQLite file, or None for a memory-only cache
+            memory_size: Maximum number of entries kept in the in-process LRU
+            ttl_seconds: Age after which an entry is treated as missing
+            max_disk_bytes: Upper bound on the total size of cached values on disk
+        """
+        self.memory_size = memory_size
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_bytes = max_disk_bytes
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Bytes of cached values on disk, kept up to date so writes never have to sum the table
+        self._disk_bytes = 0
+        self._conn = self._open_disk(db_path) if db_path else None
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _open_disk(self, db_path: str) -> Optional[sqlite3.Connection]:
+        """Open (and create if needed) the disk tier, falling back to memory-only"""
+        try:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses (created_at)")
+            self._disk_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            return conn
+        except sqlite3.Error as e:
+            logger.warning("Response cache disk tier disabled (%s): %s", db_path, e)
+            return None
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response
+
+        Args:
+            key: Cache key produced by the API client
+
+        Returns:
+            Cached response text, or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return value
+                del self._memory[key]
+
+            if self._conn is not None:
+                try:
+                    row = self._conn.execute(
+                        "SELECT value, size, created_at FROM responses WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row is not None:
+                        value, size, created_at = row
+                        if now - created_at <= self.ttl_seconds:
+                            self._conn.execute(
+                                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+                            )
+                            self._remember(key, value, created_at)
+                            self.disk_hits += 1
+                            return value
+                        self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                        self._disk_bytes -= size
+                except sqlite3.Error as e:
+                    logger.warning("Response cache read failed: %s", e)
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: str):
+        """
+        Store a response in both tiers
+
+        Args:
+            key: Cache key produced by the API client
+            value: Response text to cache
+        """
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+
+            if self._conn is None:
+                return
+            size = len(value.encode("utf-8"))
+            try:
+                replaced = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, size, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, value, size, now, now),
+                )
+                self._disk_bytes += size - (replaced[0] if replaced else 0)
+                self._evict_disk(now)
+            except sqlite3.Error as e:
+                logger.warning("Response cache write failed: %s", e)
+
+    def _remember(self, key: str, value: str, created_at: float):
+        """Insert into the LRU tier, dropping the least recently used entries"""
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self, now: float):
+        """
+        Drop expired rows, then least recently used rows until under the size limit
+
+        Both steps read only the rows they remove, through the created_at and
+        accessed_at indexes, so a write costs the same however large the cache
+        is. The byte total only sees this process's writes; rows written by
+        other processes are counted when the cache is next opened.
+        """
+        cutoff = now - self.ttl_seconds
+        count, expired = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses WHERE created_at < ?", (cutoff,)
+        ).fetchone()
+        if count:
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (cutoff,))
+            self._disk_bytes -= expired
+
+        while self._disk_bytes > self.max_disk_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY accessed_at LIMIT ?", (_EVICT_BATCH,)
+            ).fetchall()
+            if not rows:
+                # Rows removed by another process; the table is empty, so the total is too
+                self._disk_bytes = 0
+                break
+            stale = []
+            for key, size in rows:
+                if self._disk_bytes <= self.max_disk_bytes:
+                    break
+                stale.append((key,))
+                self._disk_bytes -= size
+            self._conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+
+    def clear(self):
+        """Remove every entry from both tiers"""
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM responses")
+                self._disk_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Hit/miss counters for monitoring
+
+        Returns:
+            Dictionary with per-tier hits, misses and the overall hit rate
+        """
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+            }
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """
+    Return the process-wide response cache
+
+    The cache is shared by every session served by this process, so identical
+    forms submitted by different users are only generated once.
+
+    Returns:
+        The shared ResponseCache, or None when caching is disabled
+    """
+    global _cache
+    if not CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+            get_metrics().register_collector("response_cache", _cache.stats)
+        return _cache
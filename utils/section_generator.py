@@ -0,0 +1,246 @@
+"""
+Concurrent per-section business plan generation
+"""
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Any, Optional, Set, Tuple
+from config import (
+    PLAN_SECTIONS,
+    SECTION_DEPENDENCIES,
+    SECTION_PROMPT,
+    EXECUTIVE_SUMMARY_PROMPT,
+    EXECUTIVE_SUMMARY_SECTION,
+    SECTION_MAX_WORKERS,
+    SECTION_MAX_OUTPUT_TOKENS,
+)
+from utils.api_client import GeminiAPIClient
+from utils.markdown_parser import BOLD, Heading, Paragraph, parse_markdown, plain_text
+
+
+class SectionedPlanGenerator:
+    """Generates each plan section from its own prompt and assembles them in canonical order"""
+
+    def __init__(self, api_client: GeminiAPIClient, max_workers: int = SECTION_MAX_WORKERS):
+        self.api_client = api_client
+        self.max_workers = max_workers
+
+    def generate(
+        self,
+        form_data: Dict[str, Any],
+        completed: Optional[Dict[str, str]] = None,
+        on_section_done: Optional[Callable[[str, bool], None]] = None,
+        cancel_event: Optional[threading.Event] = None,
+    ) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """
+        Generate every section that is not already completed
+
+        Body sections are generated concurrently. The Executive Summary is
+        written last from the finished body sections, so it is skipped while
+        any of them is still missing.
+
+        Args:
+            form_data: Dictionary containing all form inputs
+            completed: Sections from an earlier attempt to keep as they are
+            on_section_done: Called with (section_title, succeeded) as each
+                section finishes, from the calling thread
+            cancel_event: When set, queued sections are dropped and no further
+                sections are started; sections finished so far are returned
+
+        Returns:
+            Tuple of (sections, failures), mapping section titles to generated
+            text and to error messages respectively
+        """
+        sections = dict(completed or {})
+        failures: Dict[str, str] = {}
+        fields = self.api_client.prepare_fields(form_data)
+
+        pending = [
+            title for title in PLAN_SECTIONS
+            if title != EXECUTIVE_SUMMARY_SECTION and title not in sections
+        ]
+        if pending:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {
+                    executor.submit(self._generate_body_section, title, fields): title
+                    for title in pending
+                }
+                for future in as_completed(futures):
+                    title = futures[future]
+                    try:
+                        sections[title] = future.result()
+                    except Exception as e:
+                        failures[title] = str(e)
+                    if on_section_done:
+                        on_section_done(title, title in sections)
+                    if cancel_event is not None and cancel_event.is_set():
+                        # Sections already running finish as the executor shuts down
+                        for queued in futures:
+                            queued.cancel()
+                        break
+
+        if cancel_event is not None and cancel_event.is_set():
+            return sections, failures
+
+        if EXECUTIVE_SUMMARY_SECTION not in sections:
+            if failures:
+                failures[EXECUTIVE_SUMMARY_SECTION] = "Waiting for the other sections to complete"
+            else:
+                try:
+                    sections[EXECUTIVE_SUMMARY_SECTION] = self._generate_executive_summary(sections, fields)
+                except Exception as e:
+                    failures[EXECUTIVE_SUMMARY_SECTION] = str(e)
+                if on_section_done:
+                    on_section_done(EXECUTIVE_SUMMARY_SECTION, EXECUTIVE_SUMMARY_SECTION in sections)
+
+        return sections, failures
+
+    def _generate_body_section(self, title: str, fields: Dict[str, Any]) -> str:
+        """Generate a single section from its section-specific prompt"""
+        prompt = SECTION_PROMPT.format(
+            section_title=title,
+            section_guidance=PLAN_SECTIONS[title],
+            **fields
+        )
+        return self.api_client.generate_text(prompt, max_output_tokens=SECTION_MAX_OUTPUT_TOKENS)
+
+    def _generate_executive_summary(self, sections: Dict[str, str], fields: Dict[str, Any]) -> str:
+        """Summarize the finished body sections into the Executive Summary"""
+        body = {title: text for title, text in sections.items() if title != EXECUTIVE_SUMMARY_SECTION}
+        prompt = EXECUTIVE_SUMMARY_PROMPT.format(
+            company_name=fields["company_name"],
+            plan_sections=self.assemble(body),
+            section_guidance=PLAN_SECTIONS[EXECUTIVE_SUMMARY_SECTION],
+        )
+        return self.api_client.generate_text(prompt, max_output_tokens=SECTION_MAX_OUTPUT_TOKENS)
+
+    @staticmethod
+    def assemble(sections: Dict[str, str]) -> str:
+        """
+        Join sections into a single plan in canonical order
+
+        Args:
+            sections: Mapping of section title to generated text
+
+        Returns:
+            The plan as Markdown with a numbered heading per section
+        """
+        parts = []
+        for number, title in enumerate(PLAN_SECTIONS, 1):
+            if title in sections:
+                parts.append(f"## {number}. {title}\n\n{_strip_heading(sections[title], title)}")
+        return "\n\n".join(parts)
+
+
+def _strip_heading(text: str, title: str) -> str:
+    """Drop a leading heading repeating the section title, if the model added one anyway"""
+    text = text.strip()
+    first_line, _, rest = text.partition("\n")
+    if title.lower() in first_line.lower() and (first_line.startswith("#") or first_line.startswith("**")):
+        return rest.strip()
+    return text
+
+
+def affected_sections(previous_form: Dict[str, Any], form_data: Dict[str, Any]) -> Set[str]:
+    """
+    Sections whose inputs differ between two versions of the form
+
+    Args:
+        previous_form: Form data the existing sections were generated from
+        form_data: Current form data
+
+    Returns:
+        Titles of the sections to regenerate. The Executive Summary is
+        included whenever any other section is, since it summarizes them all.
+    """
+    affected: Set[str] = set()
+    for field in set(previous_form) | set(form_data):
+        if previous_form.get(field, "") != form_data.get(field, ""):
+            affected.update(SECTION_DEPENDENCIES.get(field, PLAN_SECTIONS))
+    if affected:
+        affected.add(EXECUTIVE_SUMMARY_SECTION)
+    return affected
+
+
+def reusable_sections(previous: Optional[Dict[str, Any]], form_data: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Sections of an earlier plan that can be kept as they are
+
+    Args:
+        previous: Earlier result as {"form_data": ..., "sections": ...}, or None
+        form_data: Current form data
+
+    Returns:
+        Mapping of section title to text for every section whose inputs are
+        unchanged. The Executive Summary is only kept if every other section is.
+    """
+    if not previous:
+        return {}
+    affected = affected_sections(previous["form_data"], form_data)
+    kept = {title: text for title, text in previous["sections"].items() if title not in affected}
+    if any(title not in kept for title in PLAN_SECTIONS if title != EXECUTIVE_SUMMARY_SECTION):
+        kept.pop(EXECUTIVE_SUMMARY_SECTION, None)
+    return kept
+
+
+def split_plan_sections(plan_content: str) -> Dict[str, str]:
+    """
+    Split a plan generated in one piece into its sections
+
+    Section starts are headings, or paragraphs that are entirely bold, whose
+    text names a section in PLAN_SECTIONS, with or without numbering. The text
+    under each heading is returned verbatim; sections that cannot be found are
+    left out and so get regenerated. A section whose text contains another
+    numbered heading that names no known section is left out as well, since
+    it may hold part of a section that was not recognised.
+
+    Args:
+        plan_content: Plan text as produced by the model
+
+    Returns:
+        Mapping of section title to the text under its heading
+    """
+    lines = plan_content.splitlines()
+    starts = []
+    unknown = []
+    seen: Set[str] = set()
+    for block in parse_markdown(plan_content).blocks:
+        if isinstance(block, Heading):
+            text = plain_text(block.spans)
+            title = _SECTION_TITLES.get(_normalize_title(text))
+            if title is None and block.level <= 2 and _NUMBERED.match(text):
+                unknown.append(block.line)
+        elif isinstance(block, Paragraph) and len(block.spans) == 1 and block.spans[0][1] & BOLD:
+            title = _SECTION_TITLES.get(_normalize_title(block.spans[0][0]))
+        else:
+            continue
+        if title and title not in seen:
+            seen.add(title)
+            starts.append((block.line, title))
+
+    sections = {}
+    for index, (line, title) in enumerate(starts):
+        end = starts[index + 1][0] if index + 1 < len(starts) else len(lines)
+        if any(line < other < end for other in unknown):
+            continue
+        text = "\n".join(lines[line + 1:end]).strip()
+        if text:
+            sections[title] = text
+    return sections
+
+
+def _normalize_title(text: str) -> str:
+    """
+    Heading text reduced for comparison: no numbering, trailing parenthetical
+    such as "(if applicable)", punctuation, case or "&" vs "and" differences
+    """
+    text = re.sub(r"^\s*\d+[.)]\s*", "", text.lower()).replace("&", "and")
+    text = re.sub(r"\s*\([^)]*\)\s*$", "", text)
+    return re.sub(r"[^a-z0-9]", "", text)
+
+
+# Numbered headings look like plan sections even when their title is not known
+_NUMBERED = re.compile(r"^\s*\d+[.)]\s")
+
+
+_SECTION_TITLES = {_normalize_title(title): title for title in PLAN_SECTIONS}
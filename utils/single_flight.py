@@ -0,0 +1,345 @@
+"""
+Single-flight coalescing of identical in-flight upstream calls
+
+When identical requests arrive while one is already being generated (cohort
+templates, demo accounts, repeated submissions), only the first one calls the
+model. The others wait for it and receive the same result or error; for
+streamed calls they receive the same chunks as they arrive. Unlike the
+response cache this only covers calls that overlap in time, so it also
+protects the upstream before anything has been cached.
+
+Threads and asyncio tasks share the same flights: an async duplicate can wait
+on a threaded call and the other way round.
+"""
+import asyncio
+import logging
+import threading
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+from config import SINGLE_FLIGHT_ENABLED, SINGLE_FLIGHT_WAIT_SECONDS
+from utils.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class FlightAbandoned(Exception):
+    """Raised to waiting callers when the leading call stopped before finishing"""
+
+
+class _Flight:
+    """One in-flight call and everything it has produced so far"""
+
+    def __init__(self):
+        self.chunks: List[Any] = []
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.done = False
+        self.followers = 0
+        self.cond = threading.Condition()
+        # Event loops of async followers, woken from whichever thread publishes
+        self.async_waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+
+    def publish(self):
+        """Wake every follower; the caller holds ``cond``"""
+        self.cond.notify_all()
+        for loop, event in self.async_waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The follower's loop has closed; nobody is left to wake
+                pass
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one execution"""
+
+    def __init__(self, wait_seconds: float = SINGLE_FLIGHT_WAIT_SECONDS):
+        """
+        Args:
+            wait_seconds: Longest a duplicate waits for the leading call to
+                make progress before giving up
+        """
+        self.wait_seconds = wait_seconds
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key: str, call: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run ``call`` unless an identical call is already running, then share its outcome
+
+        Args:
+            key: Identity of the call; equal keys must mean equal results
+            call: Produces the result when this caller leads
+
+        Returns:
+            Tuple of (result, shared), where shared is True if the result came
+            from another caller's call
+
+        Raises:
+            Exception: Whatever the leading call raised
+            TimeoutError: If the leading call did not finish in time
+        """
+        flight, leader = self._join(key)
+        if not leader:
+            self._wait(flight, lambda: flight.done)
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            result = call()
+        except BaseException as e:
+            self._finish(key, flight, error=e)
+            raise
+        self._finish(key, flight, result=result)
+        return result, False
+
+    def stream(self, key: str, produce: Callable[[], Iterator[Any]]) -> Tuple[Iterator[Any], bool]:
+        """
+        Share the chunks of ``produce()`` with identical concurrent streams
+
+        Callers that join late still receive every chunk from the start. If
+        the leading consumer stops reading while others are waiting, the
+        leader keeps draining the upstream so they still get the full text;
+        closing the leader's iterator then returns once the stream is done.
+        The returned iterator must be consumed, or the duplicates waiting on
+        it time out.
+
+        Args:
+            key: Identity of the stream; equal keys must mean equal output
+            produce: Returns the upstream iterator when this caller leads
+
+        Returns:
+            Tuple of (chunks, shared), where shared is True if the chunks come
+            from another caller's stream. Iterating raises whatever the
+            leading stream raised, after the chunks produced before it failed.
+        """
+        flight, leader = self._join(key)
+        if leader:
+            return self._lead(key, flight, produce), False
+        return self._follow(flight), True
+
+    async def ado(self, key: str, call: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Async variant of do; ``call`` returns an awaitable
+
+        Returns:
+            Tuple of (result, shared)
+
+        Raises:
+            Exception: Whatever the leading call raised
+            TimeoutError: If the leading call did not finish in time
+        """
+        flight, leader = self._join(key)
+        if not leader:
+            await self._await(flight, lambda: flight.done)
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            result = await call()
+        except BaseException as e:
+            abandoned = isinstance(e, asyncio.CancelledError)
+            self._finish(key, flight, error=FlightAbandoned("The identical request being shared was cancelled") if abandoned else e)
+            raise
+        self._finish(key, flight, result=result)
+        return result, False
+
+    def astream(self, key: str, produce: Callable[[], AsyncIterator[Any]]) -> Tuple[AsyncIterator[Any], bool]:
+        """
+        Async variant of stream; ``produce`` returns an async iterator
+
+        Returns:
+            Tuple of (chunks, shared) as for stream
+        """
+        flight, leader = self._join(key)
+        if leader:
+            return self._alead(key, flight, produce), False
+        return self._afollow(flight), True
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Counters for monitoring
+
+        Returns:
+            Dictionary with calls in flight, leading calls and coalesced duplicates
+        """
+        with self._lock:
+            return {"in_flight": len(self._flights), "leaders": self.leaders, "coalesced": self.coalesced}
+
+    def _join(self, key: str) -> Tuple[_Flight, bool]:
+        """Attach to the flight for a key, starting one if there is none"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                with flight.cond:
+                    flight.followers += 1
+                self.coalesced += 1
+                return flight, False
+            flight = _Flight()
+            self._flights[key] = flight
+            self.leaders += 1
+            return flight, True
+
+    def _finish(self, key: str, flight: _Flight, result: Any = None, error: Optional[BaseException] = None):
+        """Publish the outcome; later callers with the same key start a new flight"""
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            with flight.cond:
+                flight.result = result
+                flight.error = error
+                flight.done = True
+                flight.publish()
+
+    def _wait(self, flight: _Flight, ready: Callable[[], bool]):
+        with flight.cond:
+            if not flight.cond.wait_for(ready, timeout=self.wait_seconds):
+                raise TimeoutError(f"Identical request still running after {self.wait_seconds}s")
+
+    def _lead(self, key: str, flight: _Flight, produce: Callable[[], Iterator[Any]]) -> Iterator[Any]:
+        iterator = produce()
+        consumer_gone = False
+        try:
+            for chunk in iterator:
+                with flight.cond:
+                    flight.chunks.append(chunk)
+                    flight.publish()
+                if consumer_gone:
+                    continue
+                try:
+                    yield chunk
+                except GeneratorExit:
+                    with flight.cond:
+                        waiting = flight.followers
+                    if not waiting:
+                        raise
+                    # Keep reading for the callers sharing this stream; yielding
+                    # again after GeneratorExit is not allowed
+                    consumer_gone = True
+                    logger.info("Stream consumer left; finishing it for %d waiting duplicate(s)", waiting)
+        except BaseException as e:
+            error = FlightAbandoned("The identical request being shared was stopped") if isinstance(e, GeneratorExit) else e
+            self._finish(key, flight, error=error)
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+            if consumer_gone:
+                # Nobody is reading this generator any more; the error reached the duplicates
+                return
+            raise
+        self._finish(key, flight)
+
+    def _follow(self, flight: _Flight) -> Iterator[Any]:
+        index = 0
+        try:
+            while True:
+                self._wait(flight, lambda: flight.done or len(flight.chunks) > index)
+                with flight.cond:
+                    chunks = flight.chunks[index:]
+                    finished = flight.done
+                index += len(chunks)
+                for chunk in chunks:
+                    yield chunk
+                # Nothing is appended once a flight is done, so the read above was the last
+                if finished:
+                    break
+        finally:
+            with flight.cond:
+                flight.followers -= 1
+        if flight.error is not None:
+            raise flight.error
+
+    async def _await(self, flight: _Flight, ready: Callable[[], bool]):
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        waiter = (loop, event)
+        with flight.cond:
+            flight.async_waiters.append(waiter)
+        try:
+            deadline = loop.time() + self.wait_seconds
+            while True:
+                with flight.cond:
+                    if ready():
+                        return
+                    # Cleared under the lock, so a publish after this check still wakes us
+                    event.clear()
+                try:
+                    await asyncio.wait_for(event.wait(), max(0.0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"Identical request still running after {self.wait_seconds}s") from None
+        finally:
+            with flight.cond:
+                flight.async_waiters.remove(waiter)
+
+    async def _alead(self, key: str, flight: _Flight, produce: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        iterator = produce()
+        consumer_gone = False
+        try:
+            async for chunk in iterator:
+                with flight.cond:
+                    flight.chunks.append(chunk)
+                    flight.publish()
+                if consumer_gone:
+                    continue
+                try:
+                    yield chunk
+                except GeneratorExit:
+                    with flight.cond:
+                        waiting = flight.followers
+                    if not waiting:
+                        raise
+                    consumer_gone = True
+                    logger.info("Stream consumer left; finishing it for %d waiting duplicate(s)", waiting)
+        except BaseException as e:
+            abandoned = isinstance(e, (GeneratorExit, asyncio.CancelledError))
+            self._finish(key, flight, error=FlightAbandoned("The identical request being shared was stopped") if abandoned else e)
+            aclose = getattr(iterator, "aclose", None)
+            if aclose is not None:
+                await aclose()
+            if consumer_gone:
+                return
+            raise
+        self._finish(key, flight)
+
+    async def _afollow(self, flight: _Flight) -> AsyncIterator[Any]:
+        index = 0
+        try:
+            while True:
+                await self._await(flight, lambda: flight.done or len(flight.chunks) > index)
+                with flight.cond:
+                    chunks = flight.chunks[index:]
+                    finished = flight.done
+                index += len(chunks)
+                for chunk in chunks:
+                    yield chunk
+                if finished:
+                    break
+        finally:
+            with flight.cond:
+                flight.followers -= 1
+        if flight.error is not None:
+            raise flight.error
+
+
+_single_flight: Optional[SingleFlight] = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight() -> Optional[SingleFlight]:
+    """
+    Return the process-wide single-flight group
+
+    Returns:
+        The shared SingleFlight, or None when coalescing is disabled
+    """
+    global _single_flight
+    if not SINGLE_FLIGHT_ENABLED:
+        return None
+    with _single_flight_lock:
+        if _single_flight is None:
+            _single_flight = SingleFlight()
+            get_metrics().register_collector("single_flight", _single_flight.stats)
+        return _single_flight
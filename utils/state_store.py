@@ -0,0 +1,332 @@
+"""
+Pluggable store for wizard session state shared between app replicas
+
+Streamlit keeps session state in the memory of the process serving the
+websocket, so a session is lost when that replica restarts or the load
+balancer moves the user elsewhere. The app mirrors the durable part of its
+session (form data, current step, the generated plan) into one of these
+stores, keyed by a session ID kept in the page URL. Each session is one
+zlib-compressed JSON blob, read once when a replica first sees the session
+and written at most once per rerun.
+
+Backends are local stand-ins for a shared store: "memory" (per process),
+"sqlite" (a file shared by processes on one host or on a shared volume) and
+"file" (one file per session in a directory).
+"""
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from config import (
+    STATE_BACKEND,
+    STATE_DB_PATH,
+    STATE_DIR,
+    STATE_MEMORY_MAX_SESSIONS,
+    STATE_TTL_SECONDS,
+)
+from utils.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# Session IDs come from the URL; anything else is rejected before it reaches a backend
+_SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+
+
+def encode_state(state: Dict[str, Any]) -> bytes:
+    """Serialize session state as compact, zlib-compressed JSON"""
+    payload = json.dumps(state, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return zlib.compress(payload.encode("utf-8"), 6)
+
+
+def decode_state(blob: bytes) -> Dict[str, Any]:
+    """Inverse of encode_state"""
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+def valid_session_id(session_id: Optional[str]) -> bool:
+    """Whether a value from the URL can be used as a session ID"""
+    return bool(session_id) and bool(_SESSION_ID_RE.match(session_id))
+
+
+class StateStore(ABC):
+    """Interface of a session state backend; values are encoded blobs"""
+
+    def __init__(self, ttl_seconds: int = STATE_TTL_SECONDS):
+        """
+        Args:
+            ttl_seconds: Sessions not saved for longer than this are treated as missing
+        """
+        self.ttl_seconds = ttl_seconds
+        self.loads = 0
+        self.saves = 0
+        self.misses = 0
+
+    @abstractmethod
+    def load(self, session_id: str) -> Optional[bytes]:
+        """
+        Read a session's state
+
+        Returns:
+            The encoded state, or None if the session is unknown or expired
+        """
+
+    @abstractmethod
+    def save(self, session_id: str, blob: bytes):
+        """Replace a session's state with an encoded blob"""
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        """Forget a session"""
+
+    def prune(self) -> int:
+        """
+        Remove expired sessions
+
+        Returns:
+            Number of sessions removed
+        """
+        return 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Counters for monitoring
+
+        Returns:
+            Dictionary with lifetime loads, misses and saves
+        """
+        return {"loads": self.loads, "misses": self.misses, "saves": self.saves}
+
+
+class MemoryStateStore(StateStore):
+    """Per-process LRU of sessions; survives reconnects, not restarts"""
+
+    def __init__(self, max_sessions: int = STATE_MEMORY_MAX_SESSIONS, ttl_seconds: int = STATE_TTL_SECONDS):
+        super().__init__(ttl_seconds)
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, session_id: str) -> Optional[bytes]:
+        with self._lock:
+            self.loads += 1
+            entry = self._sessions.get(session_id)
+            if entry is None or time.time() - entry[1] > self.ttl_seconds:
+                self._sessions.pop(session_id, None)
+                self.misses += 1
+                return None
+            self._sessions.move_to_end(session_id)
+            return entry[0]
+
+    def save(self, session_id: str, blob: bytes):
+        with self._lock:
+            self.saves += 1
+            self._sessions[session_id] = (blob, time.time())
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def prune(self) -> int:
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [key for key, (_, saved_at) in self._sessions.items() if saved_at < cutoff]
+            for key in expired:
+                del self._sessions[key]
+        return len(expired)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**super().stats(), "sessions": len(self._sessions)}
+
+
+class SQLiteStateStore(StateStore):
+    """Sessions in a SQLite table, shared by every process that opens the file"""
+
+    def __init__(self, db_path: str = STATE_DB_PATH, ttl_seconds: int = STATE_TTL_SECONDS):
+        """
+        Args:
+            db_path: Path of the SQLite file, created if needed
+            ttl_seconds: Sessions not saved for longer than this are treated as missing
+
+        Raises:
+            sqlite3.Error: If the database cannot be opened
+        """
+        super().__init__(ttl_seconds)
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY,
+                state BLOB NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated_at)")
+
+    def load(self, session_id: str) -> Optional[bytes]:
+        with self._lock:
+            self.loads += 1
+            row = self._conn.execute(
+                "SELECT state FROM sessions WHERE id = ? AND updated_at >= ?",
+                (session_id, time.time() - self.ttl_seconds),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            return row[0]
+
+    def save(self, session_id: str, blob: bytes):
+        with self._lock:
+            self.saves += 1
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (id, state, updated_at) VALUES (?, ?, ?)",
+                (session_id, blob, time.time()),
+            )
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def prune(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.ttl_seconds,)
+            )
+            return cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sessions = self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        return {**super().stats(), "sessions": sessions}
+
+
+class FileStateStore(StateStore):
+    """One file per session in a directory, e.g. on a volume shared by replicas"""
+
+    def __init__(self, directory: str = STATE_DIR, ttl_seconds: int = STATE_TTL_SECONDS):
+        """
+        Args:
+            directory: Directory holding the session files, created if needed
+            ttl_seconds: Sessions not saved for longer than this are treated as missing
+        """
+        super().__init__(ttl_seconds)
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+    def _path(self, session_id: str) -> str:
+        return os.path.join(self.directory, f"{session_id}.state")
+
+    def load(self, session_id: str) -> Optional[bytes]:
+        self.loads += 1
+        path = self._path(session_id)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl_seconds:
+                self.misses += 1
+                return None
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+
+    def save(self, session_id: str, blob: bytes):
+        self.saves += 1
+        path = self._path(session_id)
+        # Write then rename, so a reader on another replica never sees half a file
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(blob)
+        os.replace(tmp_path, path)
+
+    def delete(self, session_id: str):
+        try:
+            os.remove(self._path(session_id))
+        except FileNotFoundError:
+            pass
+
+    def prune(self) -> int:
+        cutoff = time.time() - self.ttl_seconds
+        removed = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".state") and entry.stat().st_mtime < cutoff:
+                try:
+                    os.remove(entry.path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+
+def create_state_store(backend: str = STATE_BACKEND) -> Optional[StateStore]:
+    """
+    Build the state store for a backend name
+
+    Args:
+        backend: "memory", "sqlite", "file", or "" to keep state only in
+            Streamlit's session
+
+    Returns:
+        A new store, or None when externalized state is disabled
+
+    Raises:
+        ValueError: If the backend name is unknown
+    """
+    if not backend:
+        return None
+    if backend == "memory":
+        return MemoryStateStore()
+    if backend == "sqlite":
+        return SQLiteStateStore()
+    if backend == "file":
+        return FileStateStore()
+    raise ValueError(f"Unknown STATE_BACKEND: {backend!r} (expected 'memory', 'sqlite' or 'file')")
+
+
+_store: Optional[StateStore] = None
+_store_created = False
+_store_lock = threading.Lock()
+
+
+def get_state_store() -> Optional[StateStore]:
+    """
+    Return the process-wide state store
+
+    Expired sessions are pruned when the store is opened.
+
+    Returns:
+        The shared StateStore, or None when externalized state is disabled or
+        the store cannot be opened
+    """
+    global _store, _store_created
+    with _store_lock:
+        if not _store_created:
+            _store_created = True
+            try:
+                _store = create_state_store()
+            except (OSError, sqlite3.Error) as e:
+                logger.warning("Session state store disabled (%s): %s", STATE_BACKEND, e)
+                _store = None
+            if _store is not None:
+                removed = _store.prune()
+                if removed:
+                    logger.info("Pruned %d expired sessions", removed)
+                get_metrics().register_collector("state_store", _store.stats)
+        return _store
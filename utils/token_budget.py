@@ -0,0 +1,259 @@
+"""
+Local token estimation and prompt budgeting
+
+Form fields are compacted before they are put into a prompt: whitespace,
+separators and filler phrases are stripped, sentences repeated across fields
+are kept once, and fields that are still too long are shortened by extractive
+summarization. The output token limit does not track prompt size: it is
+MAX_OUTPUT_TOKENS for any prompt the compactor can produce, and is only
+lowered when MODEL_CONTEXT_TOKENS is configured too small to hold both
+PROMPT_TOKEN_BUDGET and MAX_OUTPUT_TOKENS. Everything runs locally, without
+a tokenizer download or an API call.
+"""
+import logging
+import re
+from collections import Counter
+from typing import Dict, Any, List, Tuple
+from config import (
+    FIELD_TOKEN_LIMIT,
+    PROMPT_TOKEN_BUDGET,
+    MAX_OUTPUT_TOKENS,
+    MODEL_CONTEXT_TOKENS,
+)
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Separator lines carry no content wherever they appear
+_SEPARATOR_LINE_RE = re.compile(r"^\s*[-=*_#~]{3,}\s*$", re.MULTILINE)
+# A salutation or sign-off is only dropped as the first or last line of a
+# letter-shaped value, so answers like "Hello Fresh, Blue Apron" are kept
+_SALUTATION_RE = re.compile(r"^(?:hi|hello|dear)\b[^.!?]{0,40}[,:]$", re.IGNORECASE)
+_SIGN_OFF_RE = re.compile(
+    r"^(?:thanks|thank you|many thanks|regards|best regards|kind regards|best wishes|cheers)[,.!]?$",
+    re.IGNORECASE,
+)
+# Filler phrases that can be dropped without changing the meaning
+_FILLER_RE = re.compile(
+    r"\b(?:as (?:mentioned|stated|noted) (?:above|before|earlier),?\s*|please note that\s+|"
+    r"it is (?:important|worth) (?:to note|noting) that\s+|needless to say,?\s*|to be honest,?\s*)",
+    re.IGNORECASE,
+)
+
+# Sentences shorter than this are never treated as cross-field duplicates
+_MIN_DUPLICATE_WORDS = 5
+
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have in is it its of on or our that the their "
+    "this to was we will with you your they them which who what than then so such into over".split()
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of model tokens in a text
+
+    Counts words and punctuation marks, with long words and non-Latin runs
+    counted as several sub-word tokens. For English prose this lands close to
+    the usual four characters per token.
+
+    Args:
+        text: Any text
+
+    Returns:
+        Estimated token count
+    """
+    tokens = 0
+    for match in _TOKEN_RE.finditer(text):
+        piece = match.group()
+        if piece.isascii():
+            tokens += 1 + len(piece) // 8
+        else:
+            tokens += 1 + len(piece) // 2
+    return tokens
+
+
+def output_token_budget(input_tokens: int) -> int:
+    """
+    Output token limit for a prompt of the given size
+
+    Every prompt the compactor produces gets MAX_OUTPUT_TOKENS, so plans are
+    never cut short to save tokens; the limit is only lowered when prompt and
+    output together would not fit in MODEL_CONTEXT_TOKENS, which the default
+    context window never triggers.
+
+    Args:
+        input_tokens: Estimated size of the prompt
+
+    Returns:
+        Value for max_output_tokens
+    """
+    return max(1, min(MAX_OUTPUT_TOKENS, MODEL_CONTEXT_TOKENS - input_tokens))
+
+
+def compact_fields(
+    fields: Dict[str, Any],
+    field_token_limit: int = FIELD_TOKEN_LIMIT,
+    total_token_limit: int = PROMPT_TOKEN_BUDGET,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Compact prompt fields to fit the token budget
+
+    Args:
+        fields: Prompt placeholders mapped to form values
+        field_token_limit: Maximum estimated tokens per field
+        total_token_limit: Maximum estimated tokens across all fields
+
+    Returns:
+        Tuple of (compacted fields, report). The report has the estimated
+        tokens before and after, and the fields that were summarized.
+    """
+    original_tokens = sum(estimate_tokens(str(value)) for value in fields.values())
+    compacted: Dict[str, Any] = {}
+    seen_sentences = set()
+    for name, value in fields.items():
+        if not isinstance(value, str):
+            compacted[name] = value
+            continue
+        text = _strip_boilerplate(value)
+        compacted[name] = _drop_repeated_sentences(text, seen_sentences)
+
+    sizes = {name: estimate_tokens(value) for name, value in compacted.items() if isinstance(value, str)}
+    limit = min(field_token_limit, _fair_share(list(sizes.values()), total_token_limit))
+    summarized: List[str] = []
+    for name, size in sizes.items():
+        if size > limit:
+            compacted[name] = summarize(compacted[name], limit)
+            summarized.append(name)
+
+    report = {
+        "original_tokens": original_tokens,
+        "compacted_tokens": sum(estimate_tokens(str(value)) for value in compacted.values()),
+        "summarized_fields": summarized,
+    }
+    if summarized:
+        logger.info(
+            "Compacted prompt fields from ~%d to ~%d tokens (summarized: %s)",
+            report["original_tokens"],
+            report["compacted_tokens"],
+            ", ".join(summarized),
+        )
+    return compacted, report
+
+
+def summarize(text: str, max_tokens: int) -> str:
+    """
+    Shorten a text to about ``max_tokens`` by keeping its most informative sentences
+
+    Sentences are scored by the frequency of their content words across the
+    whole text, with a bonus for the opening sentence, and the best ones are
+    kept in their original order.
+
+    Args:
+        text: Text to shorten
+        max_tokens: Estimated token budget for the result
+
+    Returns:
+        The shortened text
+    """
+    sentences = [s.strip() for s in _SENTENCE_SPLIT_RE.split(text) if s.strip()]
+    if not sentences:
+        return ""
+
+    frequencies = Counter(w for w in _WORD_RE.findall(text.lower()) if w not in _STOPWORDS)
+    scored = []
+    for index, sentence in enumerate(sentences):
+        words = [w for w in _WORD_RE.findall(sentence.lower()) if w not in _STOPWORDS]
+        score = sum(frequencies[w] for w in words) / (len(words) + 1)
+        if index == 0:
+            score *= 1.2
+        scored.append((score, index, sentence))
+
+    chosen = []
+    used = 0
+    for score, index, sentence in sorted(scored, key=lambda item: (-item[0], item[1])):
+        size = estimate_tokens(sentence)
+        if used + size <= max_tokens:
+            chosen.append((index, sentence))
+            used += size
+
+    if not chosen:
+        # Even the best sentence is over budget; keep its opening words
+        best = max(scored, key=lambda item: item[0])[2]
+        return _truncate_words(best, max_tokens)
+    return " ".join(sentence for _, sentence in sorted(chosen))
+
+
+def _strip_boilerplate(text: str) -> str:
+    """Normalize whitespace and drop separator lines, a letter's salutation and sign-off, and filler phrases"""
+    text = _SEPARATOR_LINE_RE.sub("", text)
+    text = _FILLER_RE.sub("", text)
+    lines = [" ".join(line.split()) for line in text.splitlines()]
+    lines = [line for line in lines if line]
+    if len(lines) > 1 and _SALUTATION_RE.match(lines[0]):
+        lines = lines[1:]
+    if len(lines) > 1 and _SIGN_OFF_RE.match(lines[-1]):
+        lines = lines[:-1]
+    return "\n".join(lines).strip()
+
+
+def _drop_repeated_sentences(text: str, seen: set) -> str:
+    """
+    Remove repeated sentences, recording new ones in ``seen``
+
+    Any sentence repeated within the field is dropped; across fields only
+    sentences of at least _MIN_DUPLICATE_WORDS words are, since short
+    answers like "None yet." legitimately recur.
+    """
+    lines = []
+    in_field = set()
+    for line in text.splitlines():
+        kept = []
+        for sentence in _SENTENCE_SPLIT_RE.split(line):
+            words = _WORD_RE.findall(sentence.lower())
+            if not words:
+                continue
+            key = " ".join(words)
+            if key in in_field or (len(words) >= _MIN_DUPLICATE_WORDS and key in seen):
+                continue
+            in_field.add(key)
+            if len(words) >= _MIN_DUPLICATE_WORDS:
+                seen.add(key)
+            kept.append(sentence.strip())
+        if kept:
+            lines.append(" ".join(kept))
+    return "\n".join(lines)
+
+
+def _fair_share(sizes: List[int], budget: int) -> int:
+    """
+    Largest per-field cap that keeps the total within the budget
+
+    Fields under the cap keep their size, so short fields are never shortened
+    to make room for long ones.
+    """
+    if sum(sizes) <= budget:
+        return max(sizes, default=0)
+    remaining = budget
+    ordered = sorted(sizes)
+    for position, size in enumerate(ordered):
+        share = remaining // (len(ordered) - position)
+        if size > share:
+            return max(share, 1)
+        remaining -= size
+    return max(ordered)
+
+
+def _truncate_words(text: str, max_tokens: int) -> str:
+    words = text.split()
+    kept = []
+    used = 0
+    for word in words:
+        used += estimate_tokens(word)
+        if used > max_tokens:
+            break
+        kept.append(word)
+    return " ".join(kept) + " …"